@@ -0,0 +1,101 @@
+"""
+bench_bronze.py — Bronce en raw_ventas (SQLite) frente al bronce compacto en Parquet por batch.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_bronze                         # 1M filas en 4 drops
+  python -m project.bench.bench_bronze --rows 5000000 --shards 8 --compression zstd snappy
+
+Lee los drops de get_data.generar_muestra_rapida con run.read_drop y escribe
+el bronce de cada uno con run.write_raw en un ut1.db vacío: en raw_ventas
+(todo TEXT, con el linaje repetido en cada fila) y en bronze_store.BronzeStore
+con cada códec. Mide el tiempo de escritura, los bytes en disco por fila
+(fichero SQLite tras VACUUM frente al de un esquema vacío, o Parquet más el
+índice) y el tiempo de releer todo el bronce. Comprueba que las filas
+releídas coinciden con raw_ventas.
+"""
+from __future__ import annotations
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from project.ingest import bronze_store, get_data, run
+
+SQL = Path(run.__file__).resolve().parents[1] / "sql"
+COLS = ["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_source_file"]
+
+
+def nuevo_db(db: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(db)
+    con.executescript((SQL / "00_schema.sql").read_text(encoding="utf-8"))
+    con.commit()
+    return con
+
+
+def bytes_db(con: sqlite3.Connection, db: Path) -> int:
+    con.execute("VACUUM")
+    return db.stat().st_size
+
+
+def comparable(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[COLS].astype(object)
+    return df.where(df.notna(), None).astype(str).sort_values(COLS).reset_index(drop=True)
+
+
+def medir(drops: list[Path], tmp: Path, store) -> tuple[float, int, float, pd.DataFrame]:
+    """Escritura (s), bytes del bronce y relectura (s) en raw_ventas (`store` None) o en `store`."""
+    db = tmp / "ut1.db"
+    for f in tmp.glob("ut1.db*"):
+        f.unlink()
+    con = nuevo_db(db)
+    vacio = bytes_db(con, db)
+    if store is not None:
+        store.reset()
+    t_write = 0.0
+    for f in drops:
+        df = next(run.read_drop(f))
+        t0 = time.perf_counter()
+        run.write_raw(df, con, "bench", store)
+        con.commit()
+        t_write += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    releido = pd.read_sql("SELECT * FROM raw_ventas", con) if store is None else store.read(con)
+    t_read = time.perf_counter() - t0
+    total = bytes_db(con, db) - vacio
+    if store is not None:
+        total += sum(p.stat().st_size for p in store.root.rglob("*.parquet"))
+    con.close()
+    return t_write, total, t_read, releido
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del bronce en raw_ventas frente a Parquet por batch")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--shards", type=int, default=4)
+    ap.add_argument("--compression", nargs="*", default=["zstd", "snappy", "none"])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        drops = get_data.generar_muestra_rapida(directorio_drops=tmp / "drops", forzar=True, n_filas=args.rows,
+                                               shards=args.shards)
+        print(f"{args.rows} filas en {len(drops)} drops")
+        print(f"{'bronce':>16} | {'escritura (s)':>13} | {'MiB':>7} | {'bytes/fila':>10} | {'relectura (s)':>13}")
+        t_write, total, t_read, raw = medir(drops, tmp, None)
+        referencia = comparable(raw)
+        print(f"{'raw_ventas':>16} | {t_write:>13.2f} | {total / 2**20:>7.1f} | {total / len(raw):>10.1f} | "
+              f"{t_read:>13.2f}")
+        for codec in args.compression:
+            store = bronze_store.BronzeStore(tmp / "bronze", codec)
+            t_write, total, t_read, releido = medir(drops, tmp, store)
+            if not comparable(releido).equals(referencia):
+                raise SystemExit(f"el bronce Parquet ({codec}) no coincide con raw_ventas")
+            print(f"{'parquet ' + codec:>16} | {t_write:>13.2f} | {total / 2**20:>7.1f} | "
+                  f"{total / len(releido):>10.1f} | {t_read:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
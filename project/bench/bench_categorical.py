@@ -0,0 +1,90 @@
+"""
+bench_categorical.py — ids y nombre de producto como texto frente a category.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_categorical                   # 1M filas
+  python -m project.bench.bench_categorical --rows 5000000
+
+Construye el mismo frame limpio (500 clientes y 200 productos, como
+get_data.generar_muestra) con id_cliente, id_producto y nombre_producto como
+object, como str y como category (run.CATEGORY_COLS), y mide la memoria, la
+deduplicación (run.dedup_last_wins), el groupby del top de productos, la
+escritura Parquet y kpis.compute sobre la tabla Arrow correspondiente.
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from project.ingest import kpis, run
+
+
+def build_clean(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    clientes = np.array([f"C{c:03d}" for c in range(1, 501)], dtype=object)
+    productos = np.array([f"P{p:03d}" for p in range(1, 201)], dtype=object)
+    nombres = np.array([f"Prod {p}" for p in productos], dtype=object)
+    p = rng.integers(0, 200, n)
+    inicio = date(2025, 1, 1)
+    dias = np.array([inicio + timedelta(days=d) for d in range(365)], dtype=object)
+    unidades = rng.integers(1, 10, n).astype(float)
+    precio = rng.uniform(1, 150, n).round(2)
+    return pd.DataFrame({
+        "fecha": dias[rng.integers(0, 365, n)],
+        "id_cliente": clientes[rng.integers(0, 500, n)],
+        "id_producto": productos[p],
+        "nombre_producto": nombres[p],
+        "unidades": unidades,
+        "precio_unitario": precio,
+        "_source_file": "bench.csv",
+        "_ingest_ts": rng.choice(["2025-06-01T00:00:00+00:00", "2025-06-02T00:00:00+00:00"], n),
+        "importe": unidades * precio,
+    })
+
+
+def medir(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de columnas category para ids y nombres")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    base = build_clean(args.rows)
+    variantes = {
+        "object": base,
+        "str": base.astype({c: "str" for c in run.CATEGORY_COLS}),
+        "category": base.astype({c: "category" for c in run.CATEGORY_COLS}),
+    }
+    print(f"{args.rows} filas · media de {args.repeat} ejecuciones (s)")
+    print(f"{'tipo':>9} | {'memoria (MiB)':>13} | {'dedup':>6} | {'groupby':>7} | {'Parquet':>7} | "
+          f"{'MiB':>5} | {'kpis':>5}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for nombre, df in variantes.items():
+            memoria = df[run.CATEGORY_COLS].memory_usage(deep=True, index=False).sum() / 2**20
+            t_dedup = medir(lambda: run.dedup_last_wins(df.copy()), args.repeat)
+            t_group = medir(lambda: df.groupby(["id_producto", "nombre_producto"], observed=True)
+                                      .agg(importe=("importe", "sum")), args.repeat)
+            destino = Path(tmp) / f"{nombre}.parquet"
+            t_parquet = medir(lambda: df.to_parquet(destino, index=False), args.repeat)
+            tabla = pa.Table.from_pandas(df[run.REPORT_COLS], preserve_index=False)
+            t_kpis = medir(lambda: kpis.compute(tabla), args.repeat)
+            print(f"{nombre:>9} | {memoria:>13.1f} | {t_dedup:>6.2f} | {t_group:>7.2f} | {t_parquet:>7.2f} | "
+                  f"{destino.stat().st_size / 2**20:>5.1f} | {t_kpis:>5.2f}")
+            assert pq.read_table(destino).num_rows == args.rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+bench_dedup.py — "último gana" ordenando por _ingest_ts frente a dedup.last_wins.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_dedup                      # 5M filas, lote de 100k
+  python -m project.bench.bench_dedup --rows 1000000 --batch 50000
+
+Mide dos casos con la clave natural (fecha, cliente, producto) como category,
+como llega al pipeline:
+
+  * deduplicación de un lote con duplicados entre ficheros: orden estable por
+    _ingest_ts + drop_duplicates frente a run.dedup_last_wins (clave entera y
+    máximo por grupo, sin ordenar);
+  * fusión incremental de una partición ya persistida (ordenada por clave) con
+    un lote nuevo, como PartitionWriter.commit: antes se volvía a ordenar todo
+    por _ingest_ts y por clave; ahora máscara + dedup.key_order, que sólo
+    intercala las filas nuevas.
+
+Comprueba que ambos métodos dejan exactamente las mismas filas.
+"""
+from __future__ import annotations
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from project.ingest import dedup, run
+
+
+def build_clean(n: int, claves: int, seed: int = 0, ts: tuple[str, ...] = ("2025-06-01T00:00:00+00:00",
+                                                                             "2025-06-02T00:00:00+00:00")) -> pd.DataFrame:
+    """Filas limpias con `claves` claves naturales distintas como máximo (habrá duplicados)."""
+    rng = np.random.default_rng(seed)
+    codigo = rng.integers(0, claves, n)
+    inicio = date(2025, 1, 1)
+    dias = np.array([inicio + timedelta(days=d) for d in range(365)], dtype=object)
+    clientes = pd.Categorical.from_codes(codigo // 365 % 500, [f"C{c:03d}" for c in range(1, 501)])
+    productos = pd.Categorical.from_codes(codigo // (365 * 500) % 200, [f"P{p:03d}" for p in range(1, 201)])
+    unidades = rng.integers(1, 10, n).astype(float)
+    return pd.DataFrame({
+        "fecha": dias[codigo % 365],
+        "id_cliente": clientes,
+        "id_producto": productos,
+        "unidades": unidades,
+        "precio_unitario": rng.uniform(1, 150, n).round(2),
+        "_ingest_ts": rng.choice(list(ts), n),
+        "pos": np.arange(n),
+    })
+
+
+def dedup_sort(clean: pd.DataFrame) -> pd.DataFrame:
+    """Deduplicación anterior de run.dedup_last_wins."""
+    return clean.sort_values("_ingest_ts", kind="stable").drop_duplicates(subset=run.KEY, keep="last")
+
+
+def medir(fn, repeat: int):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        res = fn()
+    return (time.perf_counter() - t0) / repeat, res
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de la deduplicación último gana")
+    ap.add_argument("--rows", type=int, default=5_000_000, help="Filas del lote y de la partición histórica")
+    ap.add_argument("--batch", type=int, default=100_000, help="Filas nuevas en la fusión incremental")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    claves = 365 * 500 * 200
+
+    lote = build_clean(args.rows, claves // 4)
+    t_sort, antes = medir(lambda: dedup_sort(lote), args.repeat)
+    t_hash, ahora = medir(lambda: run.dedup_last_wins(lote), args.repeat)
+    if set(antes["pos"]) != set(ahora["pos"]):
+        raise SystemExit("dedup_last_wins no coincide con la deduplicación ordenando")
+    duplicadas = len(lote) - len(ahora)
+
+    # partición persistida: ya deduplicada y ordenada por clave; el lote nuevo va detrás
+    historico = dedup_sort(build_clean(args.rows, claves, seed=1)).sort_values(run.KEY, kind="stable")
+    nuevas = build_clean(args.batch, claves, seed=2, ts=("2025-07-01T00:00:00+00:00",))
+    nuevas["pos"] += args.rows
+    frame = pd.concat([historico, nuevas], ignore_index=True)
+    t_merge_sort, antes = medir(lambda: dedup_sort(frame).sort_values(run.KEY, kind="stable"), args.repeat)
+
+    def fusion():
+        vivas = frame[dedup.last_wins(frame, run.KEY)]
+        return vivas.iloc[dedup.key_order(vivas, run.KEY)]
+
+    t_merge_hash, ahora = medir(fusion, args.repeat)
+    if list(antes["pos"]) != list(ahora["pos"]):
+        raise SystemExit("la fusión con key_order no coincide con la ordenación completa")
+
+    print(f"{args.rows} filas ({duplicadas} duplicadas en el lote) · "
+          f"fusión de {len(historico)} persistidas + {args.batch} nuevas · media de {args.repeat} ejecuciones")
+    print(f"{'caso':>20} | {'ordenando (s)':>13} | {'last_wins (s)':>13}")
+    print(f"{'lote':>20} | {t_sort:>13.2f} | {t_hash:>13.2f}")
+    print(f"{'fusión incremental':>20} | {t_merge_sort:>13.2f} | {t_merge_hash:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_kpis.py — KPIs del reporte: varias pasadas con pandas frente a kpis.compute.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_kpis                  # 10M filas
+  python -m project.bench.bench_kpis --rows 1000000 --repeat 5
+
+Genera una tabla Arrow con las columnas del reporte (precios entre 1 y 160 €,
+así que hay filas por encima del máximo) y mide el cálculo anterior sobre el
+DataFrame (suma, filtro por precio, dos groupby, min/max y recuento de precios
+altos) frente a kpis.compute sobre las filas ya separadas por precio, como las
+devuelve run.read_report. La separación se mide aparte (en el pipeline la hace
+la lectura del Parquet). Comprueba que ambos dan las mismas métricas.
+"""
+from __future__ import annotations
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from project.ingest import kpis, run
+
+
+def build_table(n: int, seed: int = 0) -> pa.Table:
+    rng = np.random.default_rng(seed)
+    productos = pa.array([f"P{p:03d}" for p in range(200)])
+    codigos = pa.array(rng.integers(0, 200, n))
+    unidades = rng.integers(1, 10, n).astype(float)
+    precio = rng.uniform(1, 160, n).round(2)
+    inicio = (date(2023, 1, 1) - date(1970, 1, 1)).days
+    return pa.table({
+        "fecha": pa.array(inicio + rng.integers(0, 3 * 365, n), pa.int32()).cast(pa.date32()),
+        "id_producto": productos.take(codigos),
+        "nombre_producto": pc.binary_join_element_wise("Prod ", productos.take(codigos), ""),
+        "precio_unitario": precio,
+        "importe": unidades * precio,
+    })
+
+
+def kpis_pandas(df: pd.DataFrame, max_precio: float = 150):
+    """Cálculo anterior de run.main: varias pasadas y una copia filtrada del DataFrame."""
+    ingresos = float(df["importe"].sum())
+    trans = int(len(df))
+    clean_for_report = df[df["precio_unitario"] <= max_precio]
+    top = (clean_for_report.groupby(["id_producto", "nombre_producto"], as_index=False)
+                           .agg(importe=("importe", "sum"))
+                           .sort_values("importe", ascending=False)
+                           .head(5))
+    by_day = (clean_for_report.groupby("fecha", as_index=False)
+                              .agg(importe_total=("importe", "sum"), transacciones=("importe", "count"))
+                              .sort_values("fecha", ascending=False)
+                              .head(20))
+    periodo = (df["fecha"].min(), df["fecha"].max())
+    precio_alto = int((df["precio_unitario"] > max_precio).sum())
+    return ingresos, trans, periodo, precio_alto, top, by_day
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del motor de KPIs del reporte")
+    ap.add_argument("--rows", type=int, default=10_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    tabla = build_table(args.rows)
+    df = tabla.to_pandas()
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        antes = kpis_pandas(df, run.MAX_PRECIO_REPORTE)
+    t_pandas = (time.perf_counter() - t0) / args.repeat
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        precio = pc.field("precio_unitario")
+        filas = tabla.filter(precio <= run.MAX_PRECIO_REPORTE)
+        resto = tabla.filter((precio > run.MAX_PRECIO_REPORTE) | precio.is_null())
+    t_split = (time.perf_counter() - t0) / args.repeat
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        k = kpis.compute(filas, resto, max_precio=run.MAX_PRECIO_REPORTE)
+    t_kpis = (time.perf_counter() - t0) / args.repeat
+
+    ingresos, trans, periodo, precio_alto, top, by_day = antes
+    iguales = (
+        round(ingresos, 2) == round(k.ingresos, 2) and trans == k.transacciones
+        and periodo == k.periodo and precio_alto == k.precio_alto
+        and list(top["id_producto"]) == [p.id_producto for p in k.top_productos]
+        and np.allclose(top["importe"], [p.importe for p in k.top_productos])
+        and list(by_day["fecha"]) == [d.fecha for d in k.por_dia]
+        and list(by_day["transacciones"]) == [d.transacciones for d in k.por_dia]
+        and np.allclose(by_day["importe_total"], [d.importe_total for d in k.por_dia])
+    )
+    if not iguales:
+        raise SystemExit("kpis.compute no coincide con el cálculo con pandas")
+
+    print(f"{args.rows} filas · media de {args.repeat} ejecuciones")
+    print(f"{'cálculo':>22} | {'tiempo (s)':>10}")
+    print(f"{'pandas (varias pasadas)':>22} | {t_pandas:>10.2f}")
+    print(f"{'kpis.compute':>22} | {t_kpis:>10.2f}")
+    print(f"{'(separar por precio)':>22} | {t_split:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
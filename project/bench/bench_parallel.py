@@ -0,0 +1,70 @@
+"""
+bench_parallel.py — Escalado de la ingesta por ficheros con un pool de procesos.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_parallel                          # 24 ficheros x 100k filas, 1..nº de CPUs
+  python -m project.bench.bench_parallel --files 48 --rows 50000 --workers 1 2 4 8
+
+Mide lectura + validación + tipado de cada drop (run.process_drop) y la
+deduplicación global en el proceso principal, primero en serie dentro del
+propio proceso y después con run.process_drops para cada número de workers.
+"""
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from project.ingest import get_data, run
+
+
+def build_drops(directory: Path, n_files: int, rows: int) -> list[Path]:
+    """Crea `n_files` drops horarios de `rows` filas a partir de get_data."""
+    base = get_data.generar_muestra(directorio_drops=directory, forzar=True, n_filas=rows)
+    files = []
+    for h in range(n_files):
+        f = directory / f"ventas_{h:02d}.csv"
+        shutil.copyfile(base, f)
+        files.append(f)
+    base.unlink()
+    return files
+
+
+def dedup(cleans) -> int:
+    clean = pd.concat(list(cleans), ignore_index=True)
+    return len(run.dedup_last_wins(clean))
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({w for w in (1, 2, 4, 8, 16, 32) if w <= cpus} | {cpus})
+    ap = argparse.ArgumentParser(description="Benchmark de ingesta paralela por ficheros")
+    ap.add_argument("--files", type=int, default=24)
+    ap.add_argument("--rows", type=int, default=100_000, help="Filas por fichero")
+    ap.add_argument("--workers", nargs="*", type=int, default=default_workers)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = build_drops(Path(tmp), args.files, args.rows)
+        total = args.files * args.rows
+        print(f"{args.files} ficheros x {args.rows} filas = {total} filas · CPUs: {cpus}")
+        print(f"{'workers':>8} | {'tiempo (s)':>10} | {'filas/s':>12} | {'speedup':>7}")
+
+        t0 = time.perf_counter()
+        dedup(run.process_drop(f, "2025-01-01T00:00:00+00:00")["clean"] for f in files)
+        t_serie = time.perf_counter() - t0
+        print(f"{'serie':>8} | {t_serie:>10.2f} | {total / t_serie:>12,.0f} | {1.0:>6.2f}x")
+
+        for w in args.workers:
+            t0 = time.perf_counter()
+            dedup(res["clean"] for res in run.process_drops(files, w))
+            t = time.perf_counter() - t0
+            print(f"{w:>8} | {t:>10.2f} | {total / t:>12,.0f} | {t_serie / t:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+bench_parquet.py — Parquet plata monolítico frente a dataset particionado por año/mes.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_parquet                        # 1M filas de histórico, lote de 50k en un mes
+  python -m project.bench.bench_parquet --rows 2000000 --batch 100000
+
+Parte de un histórico de `--rows` filas repartidas en 12 meses y añade un lote
+de `--batch` filas de un solo mes (la mitad actualiza claves existentes). Mide
+la ruta anterior (releer clean_ventas.parquet entero, fusionar, deduplicar y
+reescribirlo) frente a parquet_store (reescribir sólo la partición tocada), y
+comprueba que ambas dejan las mismas filas. Después compara tamaño y tiempos
+de escritura y lectura del histórico con cada códec de parquet_store.COMPRESIONES,
+y la lectura del reporte: completa, con proyección y filtro de precio
+(run.read_report) y limitada a un mes (--desde/--hasta).
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from project.ingest import parquet_store, run
+
+
+def build_clean(n: int, ts: str, meses: range = range(1, 13), seed: int = 0) -> pd.DataFrame:
+    """Frame limpio con claves únicas repartidas en los meses indicados de 2025."""
+    rng = np.random.default_rng(seed)
+    dias = [d for d in range(365) if (date(2025, 1, 1) + timedelta(days=d)).month in meses]
+    idx = np.arange(n)
+    inicio = date(2025, 1, 1)
+    productos = [f"P{p:03d}" for p in idx // (len(dias) * 5000)]
+    return pd.DataFrame({
+        "fecha": [inicio + timedelta(days=dias[int(d)]) for d in idx % len(dias)],
+        "id_cliente": [f"C{c:04d}" for c in (idx // len(dias)) % 5000],
+        "id_producto": productos,
+        "nombre_producto": [f"Prod {p}" for p in productos],
+        "unidades": rng.integers(1, 10, n).astype(float),
+        "precio_unitario": rng.uniform(1, 150, n).round(2),
+        "_source_file": "bench.csv",
+        "_ingest_ts": ts,
+    })
+
+
+def monolitico(fichero: Path, lote: pd.DataFrame) -> None:
+    """Ruta anterior: histórico completo + lote, deduplicado y reescrito en un único fichero."""
+    previo = pd.read_parquet(fichero, columns=run.CLEAN_COLS)
+    run.dedup_last_wins(pd.concat([previo, lote], ignore_index=True)).to_parquet(fichero, index=False)
+
+
+def particionado(dataset: parquet_store.Dataset, lote: pd.DataFrame) -> None:
+    with dataset.writer() as parts:
+        parts.add(lote)
+        parts.commit(run.dedup_last_wins)
+
+
+def filas(frame: pd.DataFrame) -> pd.DataFrame:
+    """Filas comparables: el dataset guarda ids y nombre como category."""
+    frame = frame[run.CLEAN_COLS].astype({c: "str" for c in run.CATEGORY_COLS})
+    return frame.sort_values(run.KEY).reset_index(drop=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de escritura del Parquet plata")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--batch", type=int, default=50_000)
+    args = ap.parse_args()
+
+    historico = run.dedup_last_wins(build_clean(args.rows, "2025-06-01T00:00:00+00:00"))
+    lote = build_clean(args.batch, "2025-07-01T00:00:00+00:00", meses=range(3, 4), seed=1)
+    lote["id_cliente"] = np.where(np.arange(args.batch) % 2 == 0, lote["id_cliente"], "N" + lote["id_cliente"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fichero = tmp / "clean_ventas.parquet"
+        historico.to_parquet(fichero, index=False)
+        t0 = time.perf_counter()
+        monolitico(fichero, lote)
+        t_mono = time.perf_counter() - t0
+
+        dataset = parquet_store.Dataset(tmp / "clean_ventas")
+        particionado(dataset, historico)
+        t0 = time.perf_counter()
+        particionado(dataset, lote)
+        t_part = time.perf_counter() - t0
+
+        if not filas(pd.read_parquet(fichero)).equals(filas(pd.read_parquet(dataset.root, columns=run.CLEAN_COLS))):
+            raise SystemExit("El dataset particionado no coincide con el fichero monolítico")
+        print(f"{args.rows} filas de histórico · lote de {args.batch} filas en un mes")
+        print(f"{'ruta':>14} | {'escritura (s)':>13}")
+        print(f"{'monolítico':>14} | {t_mono:>13.2f}")
+        print(f"{'particionado':>14} | {t_part:>13.2f}")
+
+        print(f"\n{'códec':>14} | {'tamaño (MiB)':>12} | {'escritura (s)':>13} | {'lectura (s)':>11}")
+        for codec in parquet_store.COMPRESIONES:
+            dataset = parquet_store.Dataset(tmp / f"clean_{codec}", compression=codec)
+            t0 = time.perf_counter()
+            for key, parte in historico.groupby(pd.to_datetime(historico["fecha"]).dt.month):
+                dataset.write_partition(202500 + key, parte)
+            escritura = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            pq.read_table(dataset.root)
+            lectura = time.perf_counter() - t0
+            tamano = sum(f.stat().st_size for f in dataset.files()) / 2**20
+            print(f"{codec:>14} | {tamano:>12.1f} | {escritura:>13.2f} | {lectura:>11.2f}")
+
+        dataset = parquet_store.Dataset(tmp / "clean_zstd")
+        lecturas = {
+            "completa": lambda: pd.read_parquet(dataset.root, columns=parquet_store.SCHEMA.names),
+            "proyección": lambda: run.read_report(dataset)[0],
+            "un mes": lambda: run.read_report(dataset, date(2025, 3, 1), date(2025, 3, 31))[0],
+        }
+        print(f"\n{'reporte':>14} | {'filas':>12} | {'tiempo (s)':>13}")
+        for nombre, leer in lecturas.items():
+            t0 = time.perf_counter()
+            n = len(leer())
+            print(f"{nombre:>14} | {n:>12} | {time.perf_counter() - t0:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+bench_pipeline.py — Latencia de extremo a extremo de run.py en secuencia frente a --pipeline.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_pipeline                              # 1M filas en 8 drops, 3 repeticiones
+  python -m project.bench.bench_pipeline --rows 5000000 --files 24 --repeat 5 --extra --sqlite-profile wal
+
+Genera los drops una vez (bench_suite.build_drops: inválidas y un drop de
+reenvíos) y ejecuta ingest/run.py --full-refresh en un proceso aparte sobre
+una copia de ingest/ y sql/, alternando el modo secuencial y --pipeline
+(ver ingest/pipeline.py). De cada modo muestra la mediana y el mínimo del
+tiempo del proceso completo (desde el arranque hasta reporte.md) y el
+solapamiento: suma de los tiempos de las etapas de run_metrics.json entre el
+total (1,0 = nada solapado). Comprueba que clean_ventas, los agregados y la
+cuarentena son iguales en los dos modos.
+
+Con una sola CPU el solapamiento sólo esconde esperas de E/S (fsync, disco):
+la validación, el bronce y el UPSERT compiten por el mismo núcleo.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from project.bench import bench_suite
+
+CONSULTAS = [
+    "SELECT fecha, id_cliente, id_producto, unidades, precio_unitario FROM clean_ventas ORDER BY 1, 2, 3",
+    "SELECT fecha, ROUND(importe_total, 6), unidades, lineas FROM agg_ventas_diarias ORDER BY 1",
+    "SELECT _source_file, _reason_bits, COUNT(*) FROM quarantine_ventas GROUP BY 1, 2 ORDER BY 1, 2",
+]
+
+
+def ejecutar(root: Path, args: list[str]) -> tuple[float, float]:
+    """Ejecuta run.py; devuelve el tiempo del proceso y el solapamiento de sus etapas."""
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, str(root / "ingest" / "run.py"), "--full-refresh", *args],
+                   check=True, stdout=subprocess.DEVNULL)
+    wall = time.perf_counter() - t0
+    etapas = json.loads((root / "output" / "run_metrics.json").read_text(encoding="utf-8"))["stages"]
+    total = next(s["wall_s"] for s in etapas if s["stage"] == "total")
+    return wall, sum(s["wall_s"] for s in etapas if s["stage"] != "total") / total
+
+
+def estado(root: Path) -> list:
+    con = sqlite3.connect(root / "output" / "ut1.db")
+    filas = [con.execute(q).fetchall() for q in CONSULTAS]
+    con.close()
+    return filas
+
+
+def main():
+    ap = argparse.ArgumentParser(description="run.py secuencial frente a --pipeline (latencia de extremo a extremo)")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--files", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--extra", nargs=argparse.REMAINDER, default=[],
+                    help="Argumentos de run.py para los dos modos (p. ej. --extra --engine arrow)")
+    args = ap.parse_args()
+
+    esc = bench_suite.Escenario(args.rows, files=args.files)
+    modos = {"secuencial": [], "pipeline": ["--pipeline"]}
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+        root = Path(tmp) / "project"
+        shutil.copytree(bench_suite.PROJECT / "ingest", root / "ingest", ignore=shutil.ignore_patterns("__pycache__"))
+        shutil.copytree(bench_suite.PROJECT / "sql", root / "sql")
+        filas = bench_suite.build_drops(root / "data" / "drops", esc)
+        print(f"{filas} filas en {args.files + 1} drops · {os.cpu_count()} CPU · {args.repeat} repeticiones "
+              f"· run.py {' '.join(args.extra)}")
+
+        tiempos = {m: [] for m in modos}
+        solapes = {m: [] for m in modos}
+        estados = {}
+        for _ in range(args.repeat):
+            for modo, extra in modos.items():
+                wall, solape = ejecutar(root, extra + args.extra)
+                tiempos[modo].append(wall)
+                solapes[modo].append(solape)
+                estados.setdefault(modo, estado(root))
+        if estados["pipeline"] != estados["secuencial"]:
+            raise SystemExit("--pipeline no deja el mismo clean_ventas, agregados o cuarentena que el modo secuencial")
+
+        referencia = statistics.median(tiempos["secuencial"])
+        print(f"{'modo':>10} | {'mediana (s)':>11} | {'mín (s)':>7} | {'vs secuencial':>13} | {'solapamiento':>12}")
+        for modo in modos:
+            mediana = statistics.median(tiempos[modo])
+            print(f"{modo:>10} | {mediana:>11.2f} | {min(tiempos[modo]):>7.2f} | "
+                  f"{mediana / referencia - 1:>+13.1%} | {statistics.median(solapes[modo]):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
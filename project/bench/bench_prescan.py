@@ -0,0 +1,77 @@
+"""
+bench_prescan.py — Pre-escaneo con mmap frente a parsear el drop, y un CSV grande partido en rangos.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_prescan                          # un CSV de 2M filas, 1..nº de CPUs
+  python -m project.bench.bench_prescan --rows 5000000 --workers 1 2 4
+
+Mide sobre un único CSV de get_data.generar_muestra_rapida:
+
+  * prescan.scan (conteo de líneas, cabecera, delimitador, rangos) frente a
+    pd.read_csv del fichero completo, que es lo que costaría saber lo mismo
+    parseando;
+  * lectura + validación + tipado con run.process_drops del fichero entero
+    (un proceso) y partido en rangos de bytes (run.split_tasks) para cada
+    número de workers.
+
+Comprueba que las filas limpias son las mismas con y sin partir.
+"""
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from project.ingest import get_data, prescan, run
+
+
+def clean_rows(files: list[Path], workers: int, scans: dict) -> pd.DataFrame:
+    """Filas limpias de run.process_drops sin _ingest_ts (cambia en cada llamada)."""
+    cleans = [res["clean"].drop(columns="_ingest_ts") for res in run.process_drops(files, workers, scans=scans)]
+    return pd.concat(cleans, ignore_index=True)
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({w for w in (1, 2, 4, 8) if w <= cpus} | {cpus, 2})
+    ap = argparse.ArgumentParser(description="Benchmark del pre-escaneo con mmap y de la lectura por rangos")
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--workers", nargs="*", type=int, default=default_workers)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        f, = get_data.generar_muestra_rapida(directorio_drops=Path(tmp), forzar=True, n_filas=args.rows)
+
+        t0 = time.perf_counter()
+        info = prescan.scan(f)
+        t_scan = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        n = len(pd.read_csv(f, dtype=str))
+        t_read = time.perf_counter() - t0
+        if n != info.rows:
+            raise SystemExit(f"prescan cuenta {info.rows} filas y pd.read_csv {n}")
+        print(f"{f.stat().st_size / 2**20:.0f} MiB · {info.rows} filas · CPUs: {cpus}")
+        print(f"prescan.scan: {t_scan:.2f} s · pd.read_csv: {t_read:.2f} s ({t_read / t_scan:.0f}x)")
+
+        # sin pre-escaneo el fichero va entero a un proceso
+        t0 = time.perf_counter()
+        entero = clean_rows([f], 1, {})
+        t_entero = time.perf_counter() - t0
+        entero = entero.astype(str)
+        print(f"\n{'workers':>8} | {'rangos':>6} | {'tiempo (s)':>10} | {'filas/s':>12} | {'speedup':>7}")
+        print(f"{'entero':>8} | {1:>6} | {t_entero:>10.2f} | {info.rows / t_entero:>12,.0f} | {1.0:>6.2f}x")
+        for w in args.workers:
+            rangos = len(run.split_tasks([f], w, {f: info}))
+            t0 = time.perf_counter()
+            partido = clean_rows([f], w, {f: info})
+            t = time.perf_counter() - t0
+            if not partido.astype(str).equals(entero):
+                raise SystemExit(f"con {w} workers las filas limpias no coinciden con el fichero entero")
+            print(f"{w:>8} | {rangos:>6} | {t:>10.2f} | {info.rows / t:>12,.0f} | {t_entero / t:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
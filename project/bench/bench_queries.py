@@ -0,0 +1,128 @@
+"""
+bench_queries.py — Consultas de reporte sobre ut1.db con y sin índices.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_queries                  # 1M filas en clean_ventas y raw_ventas
+  python -m project.bench.bench_queries --rows 200000 --repeat 5
+
+Carga las mismas filas en tres esquemas: "sin índices" (00_schema.sql sin los
+CREATE INDEX, el esquema original), "índices" (00_schema.sql completo) y
+"without rowid" (índices + sql/01_clean_ventas_without_rowid.sql). Para cada
+uno mide la carga, el tamaño del fichero y el tiempo medio de las consultas
+del reporte: la vista ventas_diarias (completa y por rango de fechas), el top
+de productos, las ventas de un producto y de un cliente, y el bronce de un
+fichero y de un batch. "diarias (scan)" es la antigua definición de la vista
+ventas_diarias (GROUP BY sobre clean_ventas); hoy la vista y "top (agregado)"
+leen los agregados materializados agg_ventas_* (sql/21_agg_rebuild.sql).
+"""
+from __future__ import annotations
+import argparse
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from project.ingest import run
+
+SQL = Path(run.__file__).resolve().parents[1] / "sql"
+
+CONSULTAS = {
+    "diarias (scan)": ("SELECT fecha, TOTAL(unidades*precio_unitario), COUNT(*) FROM clean_ventas"
+                       " GROUP BY fecha"),
+    "diarias marzo": ("SELECT fecha, TOTAL(unidades*precio_unitario), COUNT(*) FROM clean_ventas"
+                      " WHERE fecha BETWEEN '2025-03-01' AND '2025-03-31' GROUP BY fecha"),
+    "ventas_diarias": "SELECT * FROM ventas_diarias",
+    "top productos": ("SELECT id_producto, TOTAL(unidades*precio_unitario) AS importe FROM clean_ventas"
+                      " GROUP BY id_producto ORDER BY importe DESC LIMIT 5"),
+    "top (agregado)": ("SELECT id_producto, importe_total FROM agg_ventas_producto"
+                       " ORDER BY importe_total DESC LIMIT 5"),
+    "un producto": "SELECT COUNT(*), SUM(unidades*precio_unitario) FROM clean_ventas WHERE id_producto = 'P007'",
+    "un cliente": "SELECT COUNT(*), SUM(unidades*precio_unitario) FROM clean_ventas WHERE id_cliente = 'C007'",
+    "bronce fichero": "SELECT COUNT(*) FROM raw_ventas WHERE _source_file = 'ventas_07.csv'",
+    "bronce batch": "SELECT COUNT(*) FROM raw_ventas WHERE _batch_id = 'b0007'",
+}
+
+
+def build_rows(n: int, seed: int = 0):
+    """Filas de clean_ventas y raw_ventas con claves aleatorias (orden de llegada realista)."""
+    rng = np.random.default_rng(seed)
+    inicio = date(2025, 1, 1)
+    fechas = [str(inicio + timedelta(days=int(d))) for d in rng.integers(0, 365, n)]
+    clientes = [f"C{c:03d}" for c in rng.integers(0, 1000, n)]
+    productos = [f"P{p:03d}" for p in rng.integers(0, 200, n)]
+    unidades = rng.integers(1, 10, n).astype(float).tolist()
+    precios = rng.uniform(1, 150, n).round(2).tolist()
+    ts = "2025-06-01T00:00:00+00:00"
+    clean = list(zip(fechas, clientes, productos, unidades, precios, [ts] * n))
+    fichero = [f"ventas_{h:02d}.csv" for h in np.arange(n) * 24 // n]
+    batch = [f"b{b:04d}" for b in np.arange(n) * 100 // n]
+    raw = list(zip(fechas, clientes, productos, map(str, unidades), map(str, precios), [ts] * n, fichero, batch))
+    return clean, raw
+
+
+def normalizar(filas: list) -> list:
+    """Filas comparables entre esquemas (el orden de suma cambia los últimos decimales)."""
+    return sorted(tuple(round(v, 4) if isinstance(v, float) else v for v in f) for f in filas)
+
+
+def esquemas() -> dict[str, str]:
+    completo = (SQL / "00_schema.sql").read_text(encoding="utf-8")
+    sin_indices = re.sub(r"^CREATE INDEX .*;$", "", completo, flags=re.MULTILINE)
+    without_rowid = (SQL / "01_clean_ventas_without_rowid.sql").read_text(encoding="utf-8")
+    return {
+        "sin índices": sin_indices,
+        "índices": completo,
+        "without rowid": completo + without_rowid + completo,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de consultas de reporte en SQLite")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    clean, raw = build_rows(args.rows)
+    vistas = (SQL / "20_views.sql").read_text(encoding="utf-8")
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for nombre, ddl in esquemas().items():
+            db = Path(tmp) / f"{nombre.replace(' ', '_')}.db"
+            con = sqlite3.connect(db)
+            con.executescript(ddl + vistas)
+            t0 = time.perf_counter()
+            con.executemany("INSERT OR REPLACE INTO clean_ventas VALUES (?, ?, ?, ?, ?, ?)", clean)
+            con.executemany("INSERT INTO raw_ventas VALUES (?, ?, ?, ?, ?, ?, ?, ?)", raw)
+            for sentencia in run.sql_statements((SQL / "21_agg_rebuild.sql").read_text(encoding="utf-8")):
+                con.execute(sentencia)
+            con.commit()
+            carga = time.perf_counter() - t0
+            con.execute("ANALYZE")
+            tiempos = {}
+            for consulta, sql in CONSULTAS.items():
+                con.execute(sql).fetchall()  # calentar caché
+                t0 = time.perf_counter()
+                for _ in range(args.repeat):
+                    filas = con.execute(sql).fetchall()
+                tiempos[consulta] = ((time.perf_counter() - t0) / args.repeat, normalizar(filas))
+            con.close()
+            resultados[nombre] = (carga, db.stat().st_size / 2**20, tiempos)
+
+    nombres = list(resultados)
+    print(f"{args.rows} filas · media de {args.repeat} ejecuciones (ms)")
+    print(f"{'':>16} | " + " | ".join(f"{n:>13}" for n in nombres))
+    print(f"{'carga (s)':>16} | " + " | ".join(f"{resultados[n][0]:>13.2f}" for n in nombres))
+    print(f"{'tamaño (MiB)':>16} | " + " | ".join(f"{resultados[n][1]:>13.0f}" for n in nombres))
+    for consulta in CONSULTAS:
+        fila = [resultados[n][2][consulta] for n in nombres]
+        if any(r[1] != fila[0][1] for r in fila):
+            raise SystemExit(f"Resultados distintos en '{consulta}'")
+        print(f"{consulta:>16} | " + " | ".join(f"{1000 * r[0]:>13.1f}" for r in fila))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+bench_readers.py — Lector de CSV de pandas (dtype=str) frente a pyarrow.csv.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_readers                       # 100k, 1M filas
+  python -m project.bench.bench_readers --sizes 1000000 5000000
+
+Para cada tamaño mide el parseo (run.read_drop con cada engine), la memoria
+del DataFrame resultante y el tiempo de validación + tipado de las filas
+limpias, que con columnas category trabaja sobre los valores distintos.
+"""
+from __future__ import annotations
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from project.ingest import get_data, run
+
+
+def build_drop(directory: Path, rows: int) -> Path:
+    """Genera un drop de `rows` filas repitiendo una muestra de get_data."""
+    base = get_data.generar_muestra(directorio_drops=directory, forzar=True, n_filas=min(rows, 100_000))
+    f = directory / "ventas_bench.csv"
+    with base.open("rb") as src, f.open("wb") as dst:
+        header = src.readline()
+        body = src.read()
+        dst.write(header)
+        for _ in range(max(1, rows // min(rows, 100_000))):
+            dst.write(body)
+    base.unlink()
+    return f
+
+
+def medir(f: Path, engine: str) -> tuple[float, float, float]:
+    t0 = time.perf_counter()
+    raw = next(run.read_drop(f, engine=engine))
+    t_parse = time.perf_counter() - t0
+    mem = raw.memory_usage(deep=True).sum() / 2**20
+    t0 = time.perf_counter()
+    _, clean, _ = run.split_valid(raw)
+    run.coerce_clean(clean)
+    t_valid = time.perf_counter() - t0
+    return t_parse, mem, t_valid
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de lectores de CSV")
+    ap.add_argument("--sizes", nargs="*", type=int, default=[100_000, 1_000_000])
+    args = ap.parse_args()
+
+    print(f"{'filas':>10} | {'engine':>6} | {'parseo (s)':>10} | {'memoria (MiB)':>13} | {'validar+tipar (s)':>17}")
+    for n in args.sizes:
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            f = build_drop(tmp, n)
+            for engine in ("pandas", "arrow"):
+                t_parse, mem, t_valid = medir(f, engine)
+                print(f"{n:>10} | {engine:>6} | {t_parse:>10.2f} | {mem:>13.1f} | {t_valid:>17.2f}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+bench_sqlite.py — Perfiles de escritura de SQLite en la etapa de persistencia.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_sqlite                         # 200k filas, por lotes y en bloques de 20k
+  python -m project.bench.bench_sqlite --rows 1000000 --chunk-size 50000
+
+Ejecuta la ingesta completa (run.ingest_batch / run.ingest_chunked) sobre un
+ut1.db vacío con cada perfil de sqlite_profile.PERFILES y mide el tiempo
+total y el de las escrituras en SQLite (bronce + UPSERT). El modo en bloques
+hace muchas cargas pequeñas, que es donde más pesa confirmar cada una.
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from project.ingest import get_data, parquet_store, run, sqlite_profile
+
+SQL = Path(run.__file__).resolve().parents[1] / "sql"
+
+
+class Cronometro:
+    """Acumula el tiempo pasado dentro de las funciones envueltas."""
+
+    def __init__(self):
+        self.total = 0.0
+
+    def envolver(self, fn):
+        def medido(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - t0
+        return medido
+
+
+def medir(drop: Path, tmp: Path, perfil: str, chunk_size) -> tuple[float, float]:
+    db = tmp / f"ut1_{perfil}.db"
+    con = sqlite_profile.connect(db, perfil)
+    con.executescript((SQL / "00_schema.sql").read_text(encoding="utf-8"))
+    upsert_sql = (SQL / "11_upsert_bulk.sql").read_text(encoding="utf-8")
+    quarantine, dataset = tmp / "q.csv", parquet_store.Dataset(tmp / "clean_ventas")
+    quarantine.write_text(",".join(run.QCOLS) + "\n", encoding="utf-8")
+    dataset.reset()
+
+    crono = Cronometro()
+    originales = run.write_raw, run.upsert_clean
+    run.write_raw, run.upsert_clean = map(crono.envolver, originales)
+    try:
+        t0 = time.perf_counter()
+        with con.transaccion():
+            if chunk_size:
+                run.ingest_chunked([drop], con, upsert_sql, quarantine, dataset, "bench", chunk_size)
+            else:
+                run.ingest_batch([drop], con, upsert_sql, quarantine, dataset, "bench")
+            con.commit()
+        con.close()
+        return time.perf_counter() - t0, crono.total
+    finally:
+        run.write_raw, run.upsert_clean = originales
+        for f in tmp.glob(f"ut1_{perfil}.db*"):
+            f.unlink()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de perfiles de escritura de SQLite")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--chunk-size", type=int, default=20_000)
+    ap.add_argument("--profiles", nargs="*", default=list(sqlite_profile.PERFILES))
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        drop = get_data.generar_muestra(directorio_drops=tmp / "drops", forzar=True, n_filas=args.rows)
+        print(f"{args.rows} filas")
+        print(f"{'modo':>16} | {'perfil':>8} | {'total (s)':>9} | {'SQLite (s)':>10}")
+        for modo, chunk_size in (("lotes", None), (f"bloques {args.chunk_size}", args.chunk_size)):
+            for perfil in args.profiles:
+                total, escritura = medir(drop, tmp, perfil, chunk_size)
+                print(f"{modo:>16} | {perfil:>8} | {total:>9.2f} | {escritura:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+bench_suite.py — Batería reproducible del pipeline completo con línea base de referencia.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_suite                               # 10k, 100k y 1M, modo por defecto
+  python -m project.bench.bench_suite --sizes 10k 100k 1M 10M --modes default chunk workers arrow pipeline
+  python -m project.bench.bench_suite --save-baseline               # guarda la línea base
+  python -m project.bench.bench_suite --sizes 100k --tolerance 0.2  # compara con la línea base
+
+Cada escenario genera sus drops con get_data.generar_muestra_rapida (n_filas
+y n_invalidas según la proporción de inválidas) repartidos en N ficheros, más
+un drop de reenvíos con una proporción de claves repetidas (otras unidades y
+precio, así que "último gana" tiene trabajo). Además de los tamaños pedidos
+se ejecutan variantes del primer tamaño de 100k o más con muchas inválidas,
+muchos ficheros y muchos duplicados.
+
+Cada ejecución corre ingest/run.py --full-refresh en un proceso aparte sobre
+una copia de ingest/ y sql/ en un directorio temporal, y lee sus métricas por
+etapa de output/run_metrics.json (ver ingest/metrics.py): tiempo, filas/s y
+pico de RSS. Con --save-baseline los resultados se guardan en la línea base
+(por defecto project/bench/baseline.json, propia de cada máquina y fuera de
+git); si no, se comparan con ella y se marcan las etapas más lentas o con más
+memoria que la tolerancia. Sale con código 1 si hay regresiones.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from project.ingest import get_data
+
+PROJECT = Path(__file__).resolve().parents[1]
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+TAMANOS = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+# las etapas más cortas que esto no se comparan: el ruido domina
+MIN_WALL_S = 0.05
+
+
+@dataclass(frozen=True)
+class Escenario:
+    """Carga de un escenario.
+
+    Args:
+        rows: filas generadas por get_data (válidas + inválidas)
+        invalid: proporción de filas inválidas
+        files: número de drops en que se reparten las filas
+        dup: proporción de filas válidas reenviadas en un drop posterior
+    """
+    rows: int
+    invalid: float = 0.07
+    files: int = 4
+    dup: float = 0.05
+
+    @property
+    def nombre(self) -> str:
+        tamano = next((k for k, v in TAMANOS.items() if v == self.rows), str(self.rows))
+        return f"{tamano}-inv{self.invalid:g}-f{self.files}-dup{self.dup:g}"
+
+
+def escenarios(sizes: list[str]) -> list[Escenario]:
+    """Un escenario por tamaño y, sobre el primero de 100k o más, variantes de carga."""
+    res = [Escenario(TAMANOS[s]) for s in sizes]
+    medio = next((e.rows for e in res if e.rows >= 100_000), None)
+    if medio:
+        res += [Escenario(medio, invalid=0.3), Escenario(medio, files=24), Escenario(medio, dup=0.25)]
+    return res
+
+
+def modos(rows: int) -> dict[str, list[str]]:
+    """Argumentos de run.py de cada modo para `rows` filas."""
+    return {
+        "default": [],
+        "chunk": ["--chunk-size", str(max(rows // 10, 10_000))],
+        "workers": ["--workers", str(os.cpu_count() or 1)],
+        "arrow": ["--engine", "arrow"],
+        "pipeline": ["--pipeline"],
+    }
+
+
+def build_drops(drops: Path, esc: Escenario, seed: int = 0) -> int:
+    """Genera los drops del escenario; devuelve el número total de filas escritas."""
+    ficheros = get_data.generar_muestra_rapida(directorio_drops=drops, forzar=True, n_filas=esc.rows,
+                                               n_invalidas=int(round(esc.rows * esc.invalid)), shards=esc.files,
+                                               tasa_duplicados=esc.dup, semilla=seed)
+    # una línea por fila más la cabecera de cada CSV
+    return sum(f.read_bytes().count(b"\n") - 1 for f in ficheros)
+
+
+def run_pipeline(root: Path, args: list[str]) -> dict:
+    """Ejecuta run.py sobre la copia `root` y devuelve sus métricas por etapa."""
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, str(root / "ingest" / "run.py"), "--full-refresh", *args],
+                   check=True, stdout=subprocess.DEVNULL)
+    wall = time.perf_counter() - t0
+    doc = json.loads((root / "output" / "run_metrics.json").read_text(encoding="utf-8"))
+    etapas = {s["stage"]: {k: s[k] for k in ("wall_s", "cpu_s", "peak_rss_mb", "rows", "rows_per_s")}
+              for s in doc["stages"]}
+    etapas["proceso"] = {"wall_s": wall}  # incluye el arranque del intérprete y los imports
+    return etapas
+
+
+def compare(actual: dict, base: dict, tolerance: float) -> list[str]:
+    """Etapas de `actual` más lentas o con más memoria que `base` por encima de la tolerancia."""
+    avisos = []
+    for etapa, m in actual.items():
+        b = base.get(etapa)
+        if not b:
+            continue
+        if b["wall_s"] >= MIN_WALL_S and m["wall_s"] > b["wall_s"] * (1 + tolerance):
+            avisos.append(f"{etapa}: {b['wall_s']:.2f} s -> {m['wall_s']:.2f} s")
+        if b.get("peak_rss_mb") and m.get("peak_rss_mb") and m["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance):
+            avisos.append(f"{etapa}: {b['peak_rss_mb']:.0f} MiB -> {m['peak_rss_mb']:.0f} MiB")
+    return avisos
+
+
+def print_result(clave: str, etapas: dict, avisos: list[str]) -> None:
+    print(f"\n{clave}")
+    print(f"{'etapa':>12} | {'tiempo (s)':>10} | {'filas/s':>10} | {'pico (MiB)':>10}")
+    for etapa, m in etapas.items():
+        filas_s = f"{m['rows_per_s']:>10.0f}" if m.get("rows_per_s") else f"{'':>10}"
+        pico = f"{m['peak_rss_mb']:>10.0f}" if m.get("peak_rss_mb") else f"{'':>10}"
+        print(f"{etapa:>12} | {m['wall_s']:>10.2f} | {filas_s} | {pico}")
+    for aviso in avisos:
+        print(f"  REGRESIÓN {aviso}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Batería de benchmarks del pipeline con línea base")
+    ap.add_argument("--sizes", nargs="+", choices=list(TAMANOS), default=["10k", "100k", "1M"])
+    ap.add_argument("--modes", nargs="+", choices=list(modos(0)), default=["default"])
+    ap.add_argument("--baseline", type=Path, default=BASELINE, help="Fichero JSON de la línea base")
+    ap.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como línea base")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="Empeoramiento admitido (0.15 = 15%%)")
+    args = ap.parse_args(argv)
+
+    base = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    resultados, regresiones = {}, 0
+    print(f"Python {platform.python_version()} · {os.cpu_count()} CPU · línea base: "
+          f"{args.baseline if base and not args.save_baseline else '—'}")
+    for esc in escenarios(args.sizes):
+        with tempfile.TemporaryDirectory(prefix="bench_suite_") as tmp:
+            root = Path(tmp) / "project"
+            shutil.copytree(PROJECT / "ingest", root / "ingest", ignore=shutil.ignore_patterns("__pycache__"))
+            shutil.copytree(PROJECT / "sql", root / "sql")
+            t0 = time.perf_counter()
+            filas = build_drops(root / "data" / "drops", esc)
+            print(f"\n== {esc.nombre}: {filas} filas en {esc.files + 1} drops "
+                  f"(generadas en {time.perf_counter() - t0:.1f} s)")
+            for modo in args.modes:
+                clave = f"{esc.nombre}/{modo}"
+                etapas = run_pipeline(root, modos(esc.rows)[modo])
+                avisos = [] if args.save_baseline else compare(etapas, base.get("results", {}).get(clave, {}),
+                                                                args.tolerance)
+                regresiones += len(avisos)
+                resultados[clave] = etapas
+                print_result(clave, etapas, avisos)
+
+    if args.save_baseline:
+        guardados = base.get("results", {}) if base else {}
+        guardados.update(resultados)
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "results": guardados,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nLínea base guardada en {args.baseline} ({len(resultados)} ejecuciones)")
+    elif base:
+        print(f"\n{regresiones} regresiones por encima del {args.tolerance:.0%}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
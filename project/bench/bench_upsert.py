@@ -0,0 +1,87 @@
+"""
+bench_upsert.py — UPSERT fila a fila frente a UPSERT por lotes en clean_ventas.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_upsert                        # 10k, 100k, 1M filas
+  python -m project.bench.bench_upsert --sizes 1000000 --rows-max 100000
+
+Para cada tamaño carga un frame limpio en un ut1.db vacío (inserciones) y lo
+vuelve a cargar con un _ingest_ts posterior (todo conflictos que actualizan),
+con run.upsert_clean_rows (sql/10_upserts.sql, iterrows) y con
+run.upsert_clean (tabla temporal + sql/11_upsert_bulk.sql). Comprueba que
+ambas rutas dejan la misma tabla.
+"""
+from __future__ import annotations
+import argparse
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from project.ingest import run
+
+SQL = Path(run.__file__).resolve().parents[1] / "sql"
+
+
+def build_clean(n: int, ts: str, seed: int = 0) -> pd.DataFrame:
+    """Frame limpio y deduplicado de `n` filas con claves únicas."""
+    rng = np.random.default_rng(seed)
+    dias = np.arange(n) % 365
+    clientes = (np.arange(n) // 365) % 1000
+    productos = np.arange(n) // (365 * 1000)
+    inicio = date(2025, 1, 1)
+    return pd.DataFrame({
+        "fecha": [inicio + timedelta(days=int(d)) for d in dias],
+        "id_cliente": [f"C{c:03d}" for c in clientes],
+        "id_producto": [f"P{p:03d}" for p in productos],
+        "unidades": rng.integers(1, 10, n).astype(float),
+        "precio_unitario": rng.uniform(1, 150, n).round(2),
+        "_ingest_ts": ts,
+    })
+
+
+def medir(fn, sql: str, frames: list[pd.DataFrame], db: Path) -> tuple[list[float], list]:
+    db.unlink(missing_ok=True)
+    con = sqlite3.connect(db)
+    con.executescript((SQL / "00_schema.sql").read_text(encoding="utf-8"))
+    tiempos = []
+    for frame in frames:
+        t0 = time.perf_counter()
+        fn(frame, con, sql)
+        tiempos.append(time.perf_counter() - t0)
+    tabla = con.execute("SELECT * FROM clean_ventas ORDER BY fecha, id_cliente, id_producto").fetchall()
+    con.close()
+    return tiempos, tabla
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de UPSERT en SQLite")
+    ap.add_argument("--sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--rows-max", type=int, default=100_000, help="Tamaño máximo para la ruta fila a fila")
+    args = ap.parse_args()
+
+    por_fila = (SQL / "10_upserts.sql").read_text(encoding="utf-8")
+    por_lotes = (SQL / "11_upsert_bulk.sql").read_text(encoding="utf-8")
+    print(f"{'filas':>10} | {'ruta':>9} | {'inserción (s)':>13} | {'actualización (s)':>17} | {'filas/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "ut1.db"
+        for n in args.sizes:
+            frames = [build_clean(n, "2025-01-01T00:00:00+00:00"), build_clean(n, "2025-01-02T00:00:00+00:00", seed=1)]
+            rutas = [("lotes", run.upsert_clean, por_lotes)]
+            if n <= args.rows_max:
+                rutas.insert(0, ("fila", run.upsert_clean_rows, por_fila))
+            tablas = []
+            for nombre, fn, sql in rutas:
+                (t_ins, t_upd), tabla = medir(fn, sql, frames, db)
+                tablas.append(tabla)
+                print(f"{n:>10} | {nombre:>9} | {t_ins:>13.2f} | {t_upd:>17.2f} | {2 * n / (t_ins + t_upd):>10,.0f}")
+            if len(tablas) == 2 and tablas[0] != tablas[1]:
+                raise SystemExit(f"Resultados distintos con {n} filas")
+
+
+if __name__ == "__main__":
+    main()
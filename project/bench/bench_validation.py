@@ -0,0 +1,79 @@
+"""
+bench_validation.py — Compara la validación fila a fila (validate_row + apply)
+con el motor columnar (validation.validate_frame).
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_validation                       # 10k, 1M y 10M filas
+  python -m project.bench.bench_validation --sizes 10000 1000000
+  python -m project.bench.bench_validation --legacy-max 1000000  # no mide el camino antiguo por encima
+
+Las filas se obtienen replicando una muestra de get_data.generar_muestra leída
+igual que en el pipeline (dtype=str), así que incluyen los casos inválidos.
+Para cada tamaño se comprueba que la cuarentena (CSV) de ambos caminos es
+idéntica byte a byte.
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from project.ingest import get_data, validation
+
+QCOLS = ["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_source_file", "_ingest_ts", "_reason"]
+
+
+def build_raw(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Genera `n_rows` filas crudas a partir de la muestra de get_data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = get_data.generar_muestra(directorio_drops=Path(tmp), forzar=True, n_filas=10000)
+        base = pd.read_csv(path, dtype=str)
+    idx = np.random.default_rng(seed).integers(0, len(base), size=n_rows)
+    raw = base.iloc[idx].reset_index(drop=True)
+    raw["_source_file"] = "bench.csv"
+    raw["_ingest_ts"] = "2025-01-01T00:00:00+00:00"
+    return raw
+
+
+def quarantine_csv(raw: pd.DataFrame, valid, reasons) -> str:
+    df = raw.copy()
+    df["_reason"] = reasons
+    return df.loc[~np.asarray(valid, dtype=bool), QCOLS].to_csv(index=False)
+
+
+def run_legacy(raw: pd.DataFrame):
+    validated = raw.apply(lambda row: validation.validate_row(row), axis=1)
+    return [v[0] for v in validated], [v[1] for v in validated]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de validación: fila a fila vs columnar")
+    ap.add_argument("--sizes", nargs="*", type=int, default=[10_000, 1_000_000, 10_000_000])
+    ap.add_argument("--legacy-max", type=int, default=None, help="No medir validate_row por encima de este número de filas")
+    args = ap.parse_args()
+
+    print(f"{'filas':>10} | {'fila a fila (s)':>15} | {'columnar (s)':>12} | {'speedup':>8} | cuarentena")
+    for n in args.sizes:
+        raw = build_raw(n)
+
+        t0 = time.perf_counter()
+        valid, reasons = validation.validate_frame(raw)
+        t_new = time.perf_counter() - t0
+
+        if args.legacy_max is not None and n > args.legacy_max:
+            print(f"{n:>10} | {'—':>15} | {t_new:>12.3f} | {'—':>8} | (no comparada)")
+            continue
+
+        t0 = time.perf_counter()
+        valid_old, reasons_old = run_legacy(raw)
+        t_old = time.perf_counter() - t0
+
+        same = quarantine_csv(raw, valid, reasons) == quarantine_csv(raw, valid_old, reasons_old)
+        print(f"{n:>10} | {t_old:>15.3f} | {t_new:>12.3f} | {t_old / t_new:>7.0f}x | {'idéntica' if same else 'DIFERENTE'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+bench_watch.py — Latencia del modo watch: desde que un drop llega hasta que sus filas se ven en clean_ventas.
+
+Uso (desde la raíz del repositorio):
+  python -m project.bench.bench_watch                                # 10 drops de 10k filas
+  python -m project.bench.bench_watch --drops 20 --rows 50000 --settle 0.2 0.5 --interval 0.1
+
+Genera los drops con get_data.generar_muestra_rapida en un directorio aparte y
+arranca watch.Watcher en un hilo sobre un data/drops y un output temporales.
+Cada drop se deja caer de dos formas y se espera a que sea visible antes del
+siguiente:
+
+- rename: se copia como ``.part`` y se renombra (llegada atómica);
+- append: se escribe directamente en cuatro trozos separados por una pausa
+  menor que el antirrebote, como un cliente lento.
+
+Otra conexión a ut1.db consulta el manifiesto cada 2 ms y, cuando el drop
+aparece, comprueba que clean_ventas tiene filas con su _ingest_ts. La latencia
+observada va desde la última escritura (o el rename) hasta ese momento; se
+muestra junto a la que registra el watcher en watch_latency (espera del
+antirrebote e ingesta).
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from project.ingest import get_data, watch
+
+TROZOS = 4
+
+
+def land(f: Path, drops: Path, modo: str, pausa: float) -> float:
+    """Deja caer `f` en `drops`; devuelve el instante en que termina de llegar."""
+    destino = drops / f.name
+    if modo == "rename":
+        parte = drops / f"{f.name}.part"
+        shutil.copyfile(f, parte)
+        os.replace(parte, destino)
+        return time.time()
+    datos = f.read_bytes()
+    paso = -(-len(datos) // TROZOS)
+    with destino.open("wb") as fh:
+        for i in range(0, len(datos), paso):
+            if i:
+                time.sleep(pausa)
+            fh.write(datos[i:i + paso])
+            fh.flush()
+    return time.time()
+
+
+def visible(db: Path, nombre: str, limite: float = 120.0) -> float:
+    """Espera a que el drop esté en el manifiesto (misma transacción que clean_ventas)."""
+    con = sqlite3.connect(db)
+    fin = time.monotonic() + limite
+    try:
+        while time.monotonic() < fin:
+            if con.execute("SELECT 1 FROM ingest_manifest WHERE source_file = ?", (nombre,)).fetchone():
+                t = time.time()
+                filas = con.execute("SELECT COUNT(*) FROM clean_ventas WHERE _ingest_ts IN"
+                                    " (SELECT _ingest_ts FROM batches WHERE _source_file = ?)", (nombre,)).fetchone()[0]
+                if not filas:
+                    raise SystemExit(f"{nombre} está en el manifiesto pero no en clean_ventas")
+                return t
+            time.sleep(0.002)
+    finally:
+        con.close()
+    raise SystemExit(f"{nombre} no es visible tras {limite:.0f} s")
+
+
+def medir(fuentes: list[Path], tmp: Path, modo: str, settle: float, interval: float) -> pd.DataFrame:
+    """Latencia observada y registrada de cada drop con un watcher recién arrancado."""
+    drops, out = tmp / "drops", tmp / "output"
+    shutil.rmtree(drops, ignore_errors=True)
+    shutil.rmtree(out, ignore_errors=True)
+    drops.mkdir()
+    watcher = watch.Watcher(drops, out, settle=settle)
+    listo, stop, errores = threading.Event(), threading.Event(), []
+
+    def vigilar():
+        try:
+            watcher.open()
+            listo.set()
+            watcher.run(interval, stop=stop)
+        except BaseException as e:  # se relanza en el hilo principal
+            errores.append(e)
+            listo.set()
+        finally:
+            watcher.close()
+
+    hilo = threading.Thread(target=vigilar)
+    filas = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        hilo.start()
+        listo.wait()
+        try:
+            for f in fuentes:
+                if errores:
+                    break
+                llegada = land(f, drops, modo, pausa=settle / 2)
+                filas.append({"source_file": f.name, "observada_s": visible(out / "ut1.db", f.name) - llegada})
+        finally:
+            stop.set()
+            hilo.join()
+    if errores:
+        raise errores[0]
+    con = sqlite3.connect(out / "ut1.db")
+    registrada = pd.read_sql("SELECT source_file, wait_s, ingest_s, latency_s FROM watch_latency", con)
+    con.close()
+    return pd.DataFrame(filas).merge(registrada, on="source_file", how="left")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencia del modo watch (llegada -> visible en clean_ventas)")
+    ap.add_argument("--drops", type=int, default=10)
+    ap.add_argument("--rows", type=int, default=10_000, help="Filas por drop")
+    ap.add_argument("--settle", type=float, nargs="*", default=[0.5])
+    ap.add_argument("--interval", type=float, default=0.2)
+    ap.add_argument("--modes", nargs="*", choices=["rename", "append"], default=["rename", "append"])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fuentes = get_data.generar_muestra_rapida(directorio_drops=tmp / "fuentes", forzar=True,
+                                                  n_filas=args.rows * args.drops, shards=args.drops)
+        print(f"{len(fuentes)} drops de {args.rows} filas · sondeo cada {args.interval} s")
+        print(f"{'llegada':>8} | {'settle':>6} | {'p50 (s)':>7} | {'p95 (s)':>7} | {'máx (s)':>7} | "
+              f"{'espera p50':>10} | {'ingesta p50':>11}")
+        for settle in args.settle:
+            for modo in args.modes:
+                df = medir(fuentes, tmp, modo, settle, args.interval)
+                p50, p95 = np.percentile(df["observada_s"], [50, 95])
+                print(f"{modo:>8} | {settle:>6.2f} | {p50:>7.2f} | {p95:>7.2f} | {df['observada_s'].max():>7.2f} | "
+                      f"{df['wait_s'].median():>10.2f} | {df['ingest_s'].median():>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Lectura de drops CSV con pyarrow.csv (``--engine arrow``).
+
+El lector de pandas con ``dtype=str`` crea un objeto ``str`` de Python por
+celda. Aquí el CSV se parsea con el lector multihilo de Arrow y con un
+esquema explícito en el que las columnas de negocio son cadenas codificadas
+como diccionario, que llegan a pandas como ``category``: una copia de cada
+valor distinto más un índice entero por fila.
+
+Los tipos finales (fecha, unidades, precio) no se piden al lector: Arrow
+aborta la lectura completa ante la primera celda no convertible, y esas filas
+tienen que llegar a la cuarentena con su motivo. La conversión tipada se hace
+después, una vez por valor distinto, con los mismos derivados que la
+validación (ver validation.convert), de modo que los precios con coma
+decimal siguen funcionando.
+"""
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from pandas.api.types import union_categoricals
+
+# columnas de negocio y su tipo de lectura
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+COLUMN_TYPES = {
+    c: DICT_STRING
+    for c in ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario"]
+}
+
+# mismos marcadores de nulo que pd.read_csv por defecto
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# tamaño medio aproximado de una fila para traducir filas a bytes de bloque
+BYTES_POR_FILA = 50
+
+
+def _convert_options() -> pacsv.ConvertOptions:
+    return pacsv.ConvertOptions(
+        column_types=COLUMN_TYPES,
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True,
+    )
+
+
+def read_csv(path: Path, chunk_size: Optional[int] = None, delimiter: str = ",") -> Iterator[pd.DataFrame]:
+    """Lee un CSV con Arrow y lo devuelve como DataFrame(s) con columnas category.
+
+    Args:
+        path: fichero CSV (o un buffer con la cabecera y un rango de filas, ver prescan.read_range)
+        chunk_size: si se indica, se lee en streaming con bloques de aproximadamente
+            este número de filas
+        delimiter: delimitador de campos
+    """
+    parse_options = pacsv.ParseOptions(delimiter=delimiter)
+    if chunk_size is None:
+        yield pacsv.read_csv(path, parse_options=parse_options, convert_options=_convert_options()).to_pandas()
+        return
+    read_options = pacsv.ReadOptions(block_size=max(1 << 16, chunk_size * BYTES_POR_FILA))
+    with pacsv.open_csv(path, read_options=read_options, parse_options=parse_options,
+                        convert_options=_convert_options()) as reader:
+        for batch in reader:
+            yield batch.to_pandas()
+
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """pd.concat que conserva las columnas category unificando sus categorías.
+
+    Sin unificar, pd.concat convierte a object las categóricas con categorías
+    distintas (una por fichero) y se pierde el ahorro de memoria.
+    """
+    frames = [f for f in frames if len(f.columns)]
+    if len(frames) > 1:
+        comunes = set.intersection(*(set(f.columns) for f in frames))
+        for c in comunes:
+            if all(isinstance(f[c].dtype, pd.CategoricalDtype) for f in frames):
+                categorias = union_categoricals([f[c] for f in frames], ignore_order=True).categories
+                for f in frames:
+                    f[c] = f[c].cat.set_categories(categorias)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,153 @@
+"""Batches de ingesta: identificador monótono por ejecución y linaje por drop.
+
+    batch = batches.open_batch(con)            # 20250601T101500123456Z
+    ts = batches.stamp()                       # _ingest_ts de un drop
+    batches.close_batch(con, batch, drops=3, rows_raw=..., rows_quarantine=...)
+
+Cada ejecución de ``run.py`` (y cada ``replay.py``) abre un batch en la tabla
+``batch_runs`` de ``ut1.db``: ``seq`` (AUTOINCREMENT), tipo (``ingesta`` o
+``replay``), batch rehecho, inicio, fin y recuentos. Un batch sin fin es una
+ejecución que no terminó.
+
+Los ``_batch_id`` conservan el formato de instante UTC (ordenan igual que los
+anteriores) pero nunca retroceden: si el reloj va por detrás del último batch
+registrado, el nuevo es el último + 1 µs. ``stamp`` hace lo mismo con los
+``_ingest_ts`` de los drops, de los que depende "último gana".
+
+El instante de ingesta de cada drop se guarda una vez en ``batches`` (batch,
+drop, ``_ingest_ts``, filas) con una clave entera, ``batch_key``; las filas
+sólo la repiten en el bronce compacto (ver bronze_store.py). Es lo que usa
+``replay.py`` para rehacer un batch con sus instantes originales.
+``batch_key`` es AUTOINCREMENT: una clave borrada por ``manifest.forget`` no
+se vuelve a dar, porque los ficheros del bronce compacto que la contienen la
+siguen cubriendo hasta que ``prune`` los borra.
+"""
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+FORMATO = "%Y%m%dT%H%M%S%fZ"
+TIPOS = ["ingesta", "replay"]
+_UN_US = timedelta(microseconds=1)
+# último instante entregado por stamp en este proceso
+_ultimo: Optional[datetime] = None
+
+
+class Batch(NamedTuple):
+    """Batch abierto por una ejecución."""
+    batch_id: str
+    seq: int
+    kind: str = "ingesta"
+    replay_of: Optional[str] = None
+
+
+def stamp() -> str:
+    """Instante UTC en ISO 8601 (siempre con microsegundos), estrictamente creciente en el proceso."""
+    global _ultimo
+    ahora = datetime.now(timezone.utc)
+    if _ultimo is not None and ahora <= _ultimo:
+        ahora = _ultimo + _UN_US
+    _ultimo = ahora
+    return ahora.isoformat(timespec="microseconds")
+
+
+def _floor(ts: Optional[str]) -> None:
+    """Hace que stamp no devuelva instantes anteriores o iguales a `ts`."""
+    global _ultimo
+    if ts:
+        previo = datetime.fromisoformat(ts)
+        if _ultimo is None or previo > _ultimo:
+            _ultimo = previo
+
+
+def open_batch(con: sqlite3.Connection, kind: str = "ingesta", replay_of: Optional[str] = None) -> Batch:
+    """Registra en batch_runs un batch nuevo, posterior a todos los anteriores.
+
+    Args:
+        con: conexión a ut1.db con el esquema aplicado
+        kind: "ingesta" (run.py) o "replay" (replay.py)
+        replay_of: batch que se rehace, si kind es "replay"
+    """
+    ultimo = con.execute(
+        "SELECT MAX(b) FROM (SELECT MAX(_batch_id) AS b FROM batch_runs"
+        " UNION ALL SELECT MAX(_batch_id) FROM ingest_manifest)").fetchone()[0]
+    _floor(con.execute("SELECT MAX(_ingest_ts) FROM batches").fetchone()[0])
+    ahora = datetime.now(timezone.utc)
+    if ultimo is not None and ahora.strftime(FORMATO) <= ultimo:
+        ahora = datetime.strptime(ultimo, FORMATO).replace(tzinfo=timezone.utc) + _UN_US
+    batch_id = ahora.strftime(FORMATO)
+    cur = con.execute("INSERT INTO batch_runs (_batch_id, kind, replay_of, started_at) VALUES (?, ?, ?, ?)",
+                      (batch_id, kind, replay_of, datetime.now(timezone.utc).isoformat(timespec="seconds")))
+    con.commit()
+    return Batch(batch_id, cur.lastrowid, kind, replay_of)
+
+
+def close_batch(con: sqlite3.Connection, batch: Batch, drops: int, rows_raw: int, rows_quarantine: int) -> None:
+    """Anota el fin y los recuentos del batch."""
+    con.execute(
+        "UPDATE batch_runs SET finished_at = ?, drops = ?, rows_raw = ?, rows_clean = ?, rows_quarantine = ?"
+        " WHERE _batch_id = ?",
+        (datetime.now(timezone.utc).isoformat(timespec="seconds"), drops, rows_raw, rows_raw - rows_quarantine,
+         rows_quarantine, batch.batch_id),
+    )
+    con.commit()
+
+
+def migrate_legacy(con: sqlite3.Connection) -> None:
+    """Reconstruye batches con batch_key AUTOINCREMENT antes de aplicar 00_schema.sql.
+
+    Conserva las filas y sus claves; la secuencia sigue a la mayor clave usada,
+    también las que sólo quedan en bronze_parts (linajes ya borrados).
+    """
+    fila = con.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'batches'").fetchone()
+    if fila is None or "AUTOINCREMENT" in fila[0].upper():
+        return
+    con.execute("ALTER TABLE batches RENAME TO batches_legacy")
+    # mismo DDL que en 00_schema.sql
+    con.execute(
+        "CREATE TABLE batches(batch_key INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " _batch_id TEXT NOT NULL, _source_file TEXT NOT NULL, _ingest_ts TEXT NOT NULL,"
+        " rows INTEGER NOT NULL DEFAULT 0, UNIQUE (_batch_id, _source_file, _ingest_ts))"
+    )
+    con.execute("INSERT INTO batches SELECT batch_key, _batch_id, _source_file, _ingest_ts, rows FROM batches_legacy")
+    ultima = con.execute("SELECT MAX(batch_key) FROM batches_legacy").fetchone()[0] or 0
+    if con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bronze_parts'").fetchone():
+        ultima = max(ultima, con.execute("SELECT COALESCE(MAX(key_max), 0) FROM bronze_parts").fetchone()[0])
+    con.execute("DELETE FROM sqlite_sequence WHERE name = 'batches'")
+    con.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('batches', ?)", (ultima,))
+    # el índice de la tabla anterior se va con ella
+    con.execute("DROP TABLE batches_legacy")
+    con.commit()
+
+
+def lineage_keys(con: sqlite3.Connection, df: pd.DataFrame, batch_id: str) -> np.ndarray:
+    """batch_key de cada fila: registra en batches los linajes nuevos y suma sus filas."""
+    ficheros, f_unicos = pd.factorize(df["_source_file"])
+    stamps, t_unicos = pd.factorize(df["_ingest_ts"])
+    pares, p_unicos = pd.factorize(ficheros.astype(np.int64) * len(t_unicos) + stamps)
+    filas = np.bincount(pares, minlength=len(p_unicos))
+    claves = np.empty(len(p_unicos), dtype=np.int32)
+    for i, par in enumerate(p_unicos):
+        linaje = (batch_id, str(f_unicos[par // len(t_unicos)]), str(t_unicos[par % len(t_unicos)]))
+        con.execute("INSERT OR IGNORE INTO batches (_batch_id, _source_file, _ingest_ts) VALUES (?, ?, ?)", linaje)
+        con.execute("UPDATE batches SET rows = rows + ? WHERE _batch_id = ? AND _source_file = ? AND _ingest_ts = ?",
+                    (int(filas[i]), *linaje))
+        claves[i] = con.execute(
+            "SELECT batch_key FROM batches WHERE _batch_id = ? AND _source_file = ? AND _ingest_ts = ?", linaje
+        ).fetchone()[0]
+    return claves[pares]
+
+
+def lineage(con: sqlite3.Connection, batch_id: str) -> pd.DataFrame:
+    """Drops de un batch con su _ingest_ts y sus filas de bronce (batch_key, _source_file, _ingest_ts, rows)."""
+    return pd.read_sql("SELECT batch_key, _source_file, _ingest_ts, rows FROM batches WHERE _batch_id = ?"
+                       " ORDER BY batch_key", con, params=[batch_id])
+
+
+def runs(con: sqlite3.Connection, limit: int = 20) -> pd.DataFrame:
+    """Últimos batches registrados en batch_runs, del más reciente al más antiguo."""
+    return pd.read_sql("SELECT seq, _batch_id, kind, replay_of, started_at, finished_at, drops, rows_raw,"
+                       " rows_clean, rows_quarantine FROM batch_runs ORDER BY seq DESC LIMIT ?", con, params=[limit])
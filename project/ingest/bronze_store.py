@@ -0,0 +1,148 @@
+"""Bronce compacto: filas crudas en Parquet por batch y linaje normalizado en SQLite.
+
+    output/bronze/batch=20250601T101500123456Z/part-00000.parquet
+
+Con ``--bronze parquet`` el bronce no va a raw_ventas (todo TEXT, con
+_source_file, _ingest_ts y _batch_id repetidos en cada fila) sino a:
+
+- ``batches``: la dimensión de linaje, una fila por (_batch_id, _source_file,
+  _ingest_ts) con su ``batch_key`` entero y sus filas (ver batches.py);
+- ficheros Parquet (zstd) por batch con los campos crudos tal y como se leen
+  (``id_*`` y ``nombre_producto`` como diccionario) y ``batch_key`` como único
+  linaje por fila;
+- ``bronze_parts``: el índice de esos ficheros en SQLite (ruta, filas, bytes y
+  rango de batch_key), para saber qué ficheros leer sin abrirlos.
+
+``read`` devuelve las filas crudas con las columnas de linaje, como raw_ventas.
+Un drop modificado sólo pierde sus filas de ``batches`` (manifest.forget): sus
+filas crudas anteriores se quedan sin linaje y ya no se leen, y ``prune``
+borra, tras confirmar la transacción, los ficheros que no tienen ninguna viva.
+"""
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    from . import batches
+except ImportError:
+    import batches
+
+# dónde va el bronce: raw_ventas (sqlite) o este módulo (parquet)
+MODOS = ["sqlite", "parquet"]
+# campos crudos que se guardan (los de raw_ventas más nombre_producto) y linaje que los sustituye
+PAYLOAD = ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario"]
+LINEAGE = ["_source_file", "_ingest_ts", "_batch_id"]
+_DICT = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema(
+    [(c, _DICT if c in ("id_cliente", "id_producto", "nombre_producto") else pa.string()) for c in PAYLOAD]
+    + [("batch_key", pa.int32())]
+)
+
+
+def _as_text(col: pd.Series) -> pa.Array:
+    """Columna cruda como Arrow (category -> diccionario; vacíos y NaN -> null)."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return pa.DictionaryArray.from_arrays(
+            pa.array(col.cat.codes.to_numpy(), mask=col.isna().to_numpy()).cast(pa.int32()),
+            pa.array(col.cat.categories.astype(str).to_numpy(dtype=object), type=pa.string()),
+        )
+    return pa.array(col.to_numpy(dtype=object, na_value=None), type=pa.string(), from_pandas=True)
+
+
+@dataclass(frozen=True)
+class BronzeStore:
+    """Bronce Parquet en `root` con su códec.
+
+    Args:
+        root: directorio raíz del bronce
+        compression: códec de Parquet (zstd, snappy, gzip o none)
+    """
+    root: Path
+    compression: str = "zstd"
+
+    def reset(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, df: pd.DataFrame, con, batch_id: str) -> None:
+        """Añade las filas crudas de `df` (con _source_file e _ingest_ts) como un fichero del batch."""
+        if df.empty:
+            return
+        claves = batches.lineage_keys(con, df, batch_id)
+        columnas = [_as_text(df[c]) if c in df.columns else pa.nulls(len(df), pa.string()) for c in PAYLOAD]
+        table = pa.Table.from_arrays(columnas + [pa.array(claves)], names=SCHEMA.names).cast(SCHEMA)
+        directorio = self.root / f"batch={batch_id}"
+        directorio.mkdir(parents=True, exist_ok=True)
+        siguiente = 1 + max((int(p.stem.split("-")[1]) for p in directorio.glob("part-*.parquet")), default=-1)
+        destino = directorio / f"part-{siguiente:05d}.parquet"
+        pq.write_table(table, destino, compression=None if self.compression == "none" else self.compression)
+        con.execute(
+            "INSERT INTO bronze_parts (path, _batch_id, rows, bytes, key_min, key_max) VALUES (?, ?, ?, ?, ?, ?)",
+            (destino.relative_to(self.root).as_posix(), batch_id, len(table), destino.stat().st_size,
+             int(claves.min()), int(claves.max())),
+        )
+
+    def read(self, con, batch_id: Optional[str] = None, source_file: Optional[str] = None,
+             fechas: Optional[list[str]] = None, antes_de: Optional[str] = None) -> pd.DataFrame:
+        """Filas crudas vivas (con linaje en batches), opcionalmente de un batch o de un drop.
+
+        Args:
+            con: conexión a ut1.db
+            batch_id: sólo las filas de este batch
+            source_file: sólo las filas de este drop
+            fechas: sólo las filas con estos valores crudos de fecha
+            antes_de: sólo las filas con _ingest_ts anterior a este
+
+        Returns:
+            DataFrame con PAYLOAD + LINEAGE, en orden de escritura
+        """
+        condiciones, params = [], []
+        for condicion, valor in (("_batch_id = ?", batch_id), ("_source_file = ?", source_file),
+                                 ("_ingest_ts < ?", antes_de)):
+            if valor is not None:
+                condiciones.append(condicion)
+                params.append(valor)
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        linaje = pd.read_sql(f"SELECT batch_key, {', '.join(LINEAGE)} FROM batches{where} ORDER BY batch_key",
+                             con, params=params)
+        if linaje.empty:
+            return pd.DataFrame(columns=PAYLOAD + LINEAGE)
+        partes = [self.root / p for (p,) in con.execute(
+            "SELECT path FROM bronze_parts WHERE key_max >= ? AND key_min <= ? ORDER BY _batch_id, path",
+            (int(linaje["batch_key"].min()), int(linaje["batch_key"].max())))]
+        if not partes:  # batches con el bronce en raw_ventas
+            return pd.DataFrame(columns=PAYLOAD + LINEAGE)
+        filtro = pc.field("batch_key").isin(pa.array(linaje["batch_key"], pa.int32()))
+        if fechas is not None:
+            filtro &= pc.field("fecha").isin(pa.array(fechas, pa.string()))
+        table = ds.dataset(partes, schema=SCHEMA, format="parquet").to_table(filter=filtro)
+        df = table.to_pandas()
+        posicion = pd.Index(linaje["batch_key"]).get_indexer(df.pop("batch_key"))
+        for c in LINEAGE:
+            df[c] = linaje[c].to_numpy()[posicion]
+        return df
+
+    def prune(self, con) -> int:
+        """Borra los ficheros sin filas vivas (tras forget) y su índice; devuelve cuántos.
+
+        Llamar con la transacción confirmada: si se deshiciera, el índice apuntaría a ficheros borrados.
+        """
+        muertos = [p for (p,) in con.execute(
+            "SELECT path FROM bronze_parts AS p WHERE NOT EXISTS"
+            " (SELECT 1 FROM batches AS b WHERE b.batch_key BETWEEN p.key_min AND p.key_max)")]
+        for p in muertos:
+            (self.root / p).unlink(missing_ok=True)
+            if not any((self.root / p).parent.iterdir()):
+                (self.root / p).parent.rmdir()
+        con.executemany("DELETE FROM bronze_parts WHERE path = ?", [(p,) for p in muertos])
+        con.commit()
+        return len(muertos)
+
+    def disk_bytes(self, con) -> int:
+        return con.execute("SELECT TOTAL(bytes) FROM bronze_parts").fetchone()[0]
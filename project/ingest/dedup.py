@@ -0,0 +1,88 @@
+"""Deduplicación "último gana" por clave natural sin ordenar por _ingest_ts.
+
+La versión anterior (ordenar todo por la cadena _ingest_ts y
+``drop_duplicates(keep="last")``) es O(n log n) sobre todas las filas. Aquí la
+clave natural se convierte en un entero compacto (``key_codes``: códigos de
+cada columna combinados en base mixta, o un hash de 64 bits si no caben), el
+_ingest_ts en su rango entre los valores distintos (pocos: uno por fichero),
+y en una pasada se queda por clave la fila con mayor ``rango * n + posición``:
+la de mayor _ingest_ts y, a igualdad, la última leída. Es el mismo criterio
+que el orden estable + ``keep="last"``.
+
+Las particiones ya persistidas (parquet_store) llegan ordenadas por clave, así
+que al fusionarlas con filas nuevas sólo se calcula la máscara y se intercalan
+las nuevas (``key_order``: timsort sobre un tramo ya ordenado + uno corto); el
+histórico no se vuelve a ordenar.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# por encima de este producto de cardinalidades la clave no cabe en int64 con holgura
+_MAX_CLAVES = 1 << 62
+# hasta este número de claves posibles la clave es directamente el índice del cubo
+MAX_CLAVES_DIRECTAS = 1 << 22
+
+
+def key_codes(frame: pd.DataFrame, key: list[str]) -> Optional[np.ndarray]:
+    """Clave natural como int64 en el mismo orden que sort_values(key) (nulos al final).
+
+    Returns:
+        None si el producto de las cardinalidades no cabe en int64
+    """
+    codigos = np.zeros(len(frame), dtype=np.int64)
+    total = 1
+    for c in key:
+        codes, unicos = pd.factorize(frame[c], sort=True)
+        base = len(unicos) + 1
+        if total * base >= _MAX_CLAVES:
+            return None
+        codigos = codigos * base + np.where(codes < 0, len(unicos), codes)
+        total *= base
+    return codigos
+
+
+def _ts_rank(ts: pd.Series) -> np.ndarray:
+    """Rango de cada _ingest_ts entre los valores distintos (nulos al final, como sort_values).
+
+    Con category (linaje de run.read_drop) se ordenan las categorías, no las filas:
+    su orden es el de llegada, no el lexicográfico.
+    """
+    if isinstance(ts.dtype, pd.CategoricalDtype):
+        rangos = np.argsort(np.argsort(ts.cat.categories.to_numpy(dtype=object)))
+        codes = ts.cat.codes.to_numpy()
+        return np.where(codes < 0, len(rangos), rangos[codes]).astype(np.int64)
+    codes, unicos = pd.factorize(ts, sort=True)
+    return np.where(codes < 0, len(unicos), codes).astype(np.int64)
+
+
+def last_wins(frame: pd.DataFrame, key: list[str], ts: str = "_ingest_ts") -> np.ndarray:
+    """Máscara de las filas que ganan en "último gana" por `key` y `ts`."""
+    n = len(frame)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    claves = key_codes(frame, key)
+    if claves is not None and claves.max() < MAX_CLAVES_DIRECTAS:
+        grupos, cubos = claves, int(claves.max()) + 1
+    else:
+        if claves is None:
+            claves = pd.util.hash_pandas_object(frame[key], index=False).to_numpy()
+        grupos, unicos = pd.factorize(claves)
+        cubos = len(unicos)
+    puntuacion = _ts_rank(frame[ts]) * n + np.arange(n, dtype=np.int64)
+    mejor = np.full(cubos, -1, dtype=np.int64)
+    np.maximum.at(mejor, grupos, puntuacion)
+    return puntuacion == mejor[grupos]
+
+
+def key_order(frame: pd.DataFrame, key: list[str]) -> np.ndarray:
+    """Posiciones que ordenan `frame` por `key`, estable.
+
+    Con un prefijo ya ordenado (partición persistida) timsort lo recorre como
+    un único tramo y sólo ordena e intercala las filas nuevas.
+    """
+    claves = key_codes(frame, key)
+    if claves is None:
+        return frame[key].reset_index(drop=True).sort_values(key, kind="stable").index.to_numpy()
+    return np.argsort(claves, kind="stable")
@@ -3,24 +3,13 @@ from typing import Optional
 import random
 from datetime import date, timedelta
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 
-def generar_muestra(directorio_drops: Optional[Path] = None, forzar: bool = False, n_filas: int = 10000, n_invalidas: Optional[int] = None) -> Path:
-	"""Crear un archivo CSV de ejemplo en el directorio de 'drops'.
-
-	Args:
-		directorio_drops: Ruta opcional al directorio de drops. Si no se proporciona,
-			se usa la carpeta por defecto project/data/drops.
-		forzar: Si es True, sobrescribe el archivo de ejemplo existente. Si es False,
-			no sobrescribe cuando ya existe.
-
-	Returns:
-		Path: ruta al archivo generado (o existente).
-	"""
-	base = Path(__file__).resolve().parents[1]
-	DATA = (directorio_drops or base / "data" / "drops")
-	DATA.mkdir(parents=True, exist_ok=True)
 
-	# generar filas sintéticas
+def _catalogo():
+	"""Fecha inicial, clientes, productos y nombre de cada producto de la muestra."""
 	fecha_inicio = date(2025, 1, 1)
 	clientes = [f"C{str(i).zfill(3)}" for i in range(1, 501)]
 	productos = [f"P{str(i).zfill(3)}" for i in range(1, 201)]
@@ -44,6 +33,45 @@ def generar_muestra(directorio_drops: Optional[Path] = None, forzar: bool = Fals
 
 	producto_a_nombre = dict(zip(productos, producto_nombres))
 
+	return fecha_inicio, clientes, productos, producto_a_nombre
+
+
+def _casos_invalidos(fecha_inicio: date, producto_a_nombre: dict) -> list[tuple]:
+	"""Filas inválidas que se repiten en orden para probar la cuarentena."""
+	return [
+		# (fecha, cliente, id_producto, nombre_producto, unidades, precio)
+		(fecha_inicio.isoformat(), "C001", "P001", producto_a_nombre.get("P001", ""), -1, "10.00"),           # unidades negativas
+		("2025-13-01", "C002", "P002", producto_a_nombre.get("P002", ""), 2, "20.00"),                    # fecha inválida
+		(fecha_inicio.isoformat(), "", "P003", producto_a_nombre.get("P003", ""), 3, "30.00"),               # cliente faltante
+		(fecha_inicio.isoformat(), "C004", "", "", 1, "40.00"),                                             # producto faltante
+		(fecha_inicio.isoformat(), "C005", "P005", producto_a_nombre.get("P005", ""), 0, "50.00"),           # unidades cero
+		(fecha_inicio.isoformat(), "C006", "P006", producto_a_nombre.get("P006", ""), 2, "doce"),            # precio no numérico
+		(fecha_inicio.isoformat(), "C007", "P007", producto_a_nombre.get("P007", ""), "tres", "60.00"),    # unidades no numéricas
+		(fecha_inicio.isoformat(), None, "P008", producto_a_nombre.get("P008", ""), 1, "70.00"),               # cliente None
+		(fecha_inicio.isoformat(), "C009", "P009", producto_a_nombre.get("P009", ""), 1, ""),                # precio vacío
+		(fecha_inicio.isoformat(), "C010", "P010", producto_a_nombre.get("P010", ""), -100, "1000.00"),      # unidades muy negativas
+	]
+
+
+def generar_muestra(directorio_drops: Optional[Path] = None, forzar: bool = False, n_filas: int = 10000, n_invalidas: Optional[int] = None) -> Path:
+	"""Crear un archivo CSV de ejemplo en el directorio de 'drops'.
+
+	Args:
+		directorio_drops: Ruta opcional al directorio de drops. Si no se proporciona,
+			se usa la carpeta por defecto project/data/drops.
+		forzar: Si es True, sobrescribe el archivo de ejemplo existente. Si es False,
+			no sobrescribe cuando ya existe.
+
+	Returns:
+		Path: ruta al archivo generado (o existente).
+	"""
+	base = Path(__file__).resolve().parents[1]
+	DATA = (directorio_drops or base / "data" / "drops")
+	DATA.mkdir(parents=True, exist_ok=True)
+
+	# generar filas sintéticas
+	fecha_inicio, clientes, productos, producto_a_nombre = _catalogo()
+
 	random.seed(42)
 	lineas = ["fecha,id_cliente,id_producto,nombre_producto,unidades,precio_unitario"]
 
@@ -64,19 +92,7 @@ def generar_muestra(directorio_drops: Optional[Path] = None, forzar: bool = Fals
 
 	# inyectar varias filas inválidas para probar la cuarentena
 	# tipos: unidades negativas, precio no numérico, cliente faltante, fecha inválida, unidades cero, producto vacío
-	casos_invalidos = [
-		# (fecha, cliente, id_producto, nombre_producto, unidades, precio)
-		(fecha_inicio.isoformat(), "C001", "P001", producto_a_nombre.get("P001", ""), -1, "10.00"),           # unidades negativas
-		("2025-13-01", "C002", "P002", producto_a_nombre.get("P002", ""), 2, "20.00"),                    # fecha inválida
-		(fecha_inicio.isoformat(), "", "P003", producto_a_nombre.get("P003", ""), 3, "30.00"),               # cliente faltante
-		(fecha_inicio.isoformat(), "C004", "", "", 1, "40.00"),                                             # producto faltante
-		(fecha_inicio.isoformat(), "C005", "P005", producto_a_nombre.get("P005", ""), 0, "50.00"),           # unidades cero
-		(fecha_inicio.isoformat(), "C006", "P006", producto_a_nombre.get("P006", ""), 2, "doce"),            # precio no numérico
-		(fecha_inicio.isoformat(), "C007", "P007", producto_a_nombre.get("P007", ""), "tres", "60.00"),    # unidades no numéricas
-		(fecha_inicio.isoformat(), None, "P008", producto_a_nombre.get("P008", ""), 1, "70.00"),               # cliente None
-		(fecha_inicio.isoformat(), "C009", "P009", producto_a_nombre.get("P009", ""), 1, ""),                # precio vacío
-		(fecha_inicio.isoformat(), "C010", "P010", producto_a_nombre.get("P010", ""), -100, "1000.00"),      # unidades muy negativas
-	]
+	casos_invalidos = _casos_invalidos(fecha_inicio, producto_a_nombre)
 
 	# repetir casos inválidos hasta alcanzar n_invalidas si hace falta
 	for i in range(n_invalidas):
@@ -110,6 +126,128 @@ def generate_sample(drop_dir: Optional[Path] = None, force: bool = False, n_rows
 	return generar_muestra(directorio_drops=drop_dir, forzar=force, n_filas=n_rows, n_invalidas=n_invalid)
 
 
+FORMATOS = ["csv", "ndjson", "mixto"]
+COLUMNAS = ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario"]
+
+
+def _columna(valores: list, codigos, casos: list, caso, invalida) -> pa.Array:
+	"""Columna de texto: `valores[codigos]`, salvo las filas inválidas, que toman su caso."""
+	diccionario = pa.array(valores + casos, pa.string())
+	return diccionario.take(pa.array(np.where(invalida, len(valores) + caso, codigos)))
+
+
+def _escribir(fh, columnas: list, formato: str) -> None:
+	"""Escribe las filas como líneas CSV o NDJSON: se unen con pyarrow.compute y se vuelca el buffer."""
+	if not len(columnas[0]):
+		return
+	if formato == "csv":
+		partes = [p for col in columnas for p in (col, ",")][:-1] + ["\n"]
+	else:
+		# campo vacío -> null, como una celda vacía del CSV (NaN al leer)
+		valores = [pc.if_else(pc.equal(col, ""), "null", pc.binary_join_element_wise('"', col, '"', "")) for col in columnas]
+		partes = [p for nombre, col in zip(COLUMNAS, valores) for p in (',"' + nombre + '":', col)]
+		partes = ['{' + partes[0][1:]] + partes[1:] + ['}\n']
+	lineas = pc.binary_join_element_wise(*partes, "")
+	fin = np.frombuffer(lineas.buffers()[1], dtype=np.int32)[len(lineas)]
+	fh.write(lineas.buffers()[2][:fin])
+
+
+def generar_muestra_rapida(directorio_drops: Optional[Path] = None, forzar: bool = False, n_filas: int = 10000, n_invalidas: Optional[int] = None, shards: int = 1, formato: str = "csv", tasa_duplicados: float = 0.0, filas_por_bloque: int = 500_000, semilla: int = 42) -> list[Path]:
+	"""Generar la muestra con NumPy, por bloques y repartida en varios drops.
+
+	Mismo catálogo, mismas filas inválidas y mismo reparto de fechas que
+	generar_muestra, pero sin bucles por fila: cada bloque de `filas_por_bloque`
+	filas son códigos NumPy sobre los valores posibles, las líneas se montan con
+	pyarrow.compute y se escriben en cuanto están listas, así que la memoria no
+	depende de n_filas. Las inválidas se reparten de forma uniforme (no al
+	final), de modo que todos los shards tienen alguna.
+
+	Con tasa_duplicados > 0 una fracción de las filas válidas se reenvía con
+	otras unidades y otro precio en ventas_ejemplo_reenvios.*, que run.list_drops
+	lee después de los shards: en la ingesta recibe un _ingest_ts posterior y
+	gana en "último gana".
+
+	Args:
+		directorio_drops: Ruta opcional al directorio de drops (por defecto project/data/drops).
+		forzar: Si es False y ya existen todos los ficheros, no se regeneran.
+		n_filas: filas de los shards, válidas + inválidas (sin contar los reenvíos).
+		n_invalidas: filas inválidas; si se omite, 7% del total.
+		shards: número de ficheros en que se reparten las filas.
+		formato: "csv", "ndjson" o "mixto" (shards alternos CSV y NDJSON).
+		tasa_duplicados: fracción de filas válidas que se reenvían.
+		filas_por_bloque: filas generadas y escritas de cada vez.
+		semilla: con la misma semilla y los mismos parámetros salen los mismos ficheros.
+
+	Returns:
+		list[Path]: ficheros generados (o existentes): shards y, si hay, reenvíos.
+	"""
+	base = Path(__file__).resolve().parents[1]
+	DATA = (directorio_drops or base / "data" / "drops")
+	DATA.mkdir(parents=True, exist_ok=True)
+
+	# NDJSON se lee después de los CSV: los reenvíos van en el formato que se lee al final
+	extensiones = ["ndjson" if formato == "ndjson" or (formato == "mixto" and s % 2) else "csv" for s in range(shards)]
+	nombres = ["ventas_ejemplo"] if shards == 1 else [f"ventas_ejemplo_{s:03d}" for s in range(shards)]
+	destinos = [DATA / f"{n}.{ext}" for n, ext in zip(nombres, extensiones)]
+	if tasa_duplicados > 0:
+		destinos.append(DATA / f"ventas_ejemplo_reenvios.{'csv' if formato == 'csv' else 'ndjson'}")
+	if all(d.exists() for d in destinos) and not forzar:
+		return destinos
+
+	fecha_inicio, clientes, productos, producto_a_nombre = _catalogo()
+	fechas = [(fecha_inicio + timedelta(days=d)).isoformat() for d in range(365)]
+	nombres_producto = [producto_a_nombre[p] for p in productos]
+	unidades = [str(u) for u in range(1, 11)]
+	precios = [f"{c // 100}.{c % 100:02d}" for c in range(100, 15001)]  # tope de precio 150
+	casos = [["" if v is None else str(v) for v in caso] for caso in _casos_invalidos(fecha_inicio, producto_a_nombre)]
+	casos = [list(c) for c in zip(*casos)]  # por columna
+
+	if n_invalidas is None:
+		n_invalidas = max(0, int(round(n_filas * 0.07)))
+	n_invalidas = min(n_invalidas, n_filas)
+	rng = np.random.default_rng(semilla)
+
+	def abrir(destino: Path):
+		fh = destino.open("wb")
+		if destino.suffix == ".csv":
+			fh.write((",".join(COLUMNAS) + "\n").encode("utf-8"))
+		return fh
+
+	reenvios = abrir(destinos[-1]) if tasa_duplicados > 0 else None
+	try:
+		for s, destino in enumerate(destinos[:shards]):
+			fin_shard = (s + 1) * n_filas // shards
+			with abrir(destino) as fh:
+				for ini in range(s * n_filas // shards, fin_shard, filas_por_bloque):
+					i = np.arange(ini, min(ini + filas_por_bloque, fin_shard), dtype=np.int64)
+					# la fila i es la inválida nº i*n_invalidas//n_filas cuando ese cociente avanza
+					orden = i * n_invalidas // n_filas
+					invalida = (i + 1) * n_invalidas // n_filas > orden
+					caso = orden % len(casos[0])
+					p = rng.integers(0, len(productos), len(i))
+					codigos = [
+						i % 365, rng.integers(0, len(clientes), len(i)), p, p,
+						rng.integers(0, len(unidades), len(i)), rng.integers(0, len(precios), len(i)),
+					]
+					valores = [fechas, clientes, productos, nombres_producto, unidades, precios]
+					columnas = [_columna(v, c, casos[k], caso, invalida)
+								for k, (v, c) in enumerate(zip(valores, codigos))]
+					_escribir(fh, columnas, destino.suffix[1:])
+
+					if reenvios is not None:
+						dup = ~invalida & (rng.random(len(i)) < tasa_duplicados)
+						n_dup = int(dup.sum())
+						repetidas = [col.filter(pa.array(dup)) for col in columnas[:4]] + [
+							pa.array(unidades).take(pa.array(rng.integers(0, len(unidades), n_dup))),
+							pa.array(precios).take(pa.array(rng.integers(0, len(precios), n_dup))),
+						]
+						_escribir(reenvios, repetidas, destinos[-1].suffix[1:])
+	finally:
+		if reenvios is not None:
+			reenvios.close()
+	return destinos
+
+
 if __name__ == "__main__":
 	import argparse
 	parser = argparse.ArgumentParser(description="Generar CSV de ejemplo en data/drops")
@@ -117,7 +255,17 @@ if __name__ == "__main__":
 	parser.add_argument("--rows", "-n", type=int, default=10000, dest="rows", help="Número de filas a generar (sin incluir la cabecera)")
 	parser.add_argument("--invalid", "-i", type=int, default=None, dest="invalid", help="Número de filas inválidas a inyectar (si se omite, 7% del total)")
 	parser.add_argument("--no-run", dest="run", action="store_false", help="No ejecutar pipeline después de generar los datos")
+	parser.add_argument("--fast", action="store_true", dest="rapido", help="Generación vectorizada por bloques (implícita con --shards, --format o --dup-rate)")
+	parser.add_argument("--shards", type=int, default=1, help="Repartir las filas en N ficheros de drop")
+	parser.add_argument("--format", choices=FORMATOS, default="csv", dest="formato", help="Formato de los drops (mixto: CSV y NDJSON alternos)")
+	parser.add_argument("--dup-rate", type=float, default=0.0, dest="dup_rate", help="Fracción de filas válidas reenviadas en un drop posterior (último gana)")
+	parser.add_argument("--seed", type=int, default=42, help="Semilla de la generación vectorizada")
 	parser.set_defaults(run=True)
 	args = parser.parse_args()
-	path = generar_muestra(directorio_drops=None, forzar=args.forzar, n_filas=args.rows, n_invalidas=args.invalid)
-	print("Generado:", path)
+	if args.rapido or args.shards > 1 or args.formato != "csv" or args.dup_rate:
+		paths = generar_muestra_rapida(directorio_drops=None, forzar=args.forzar, n_filas=args.rows, n_invalidas=args.invalid, shards=args.shards, formato=args.formato, tasa_duplicados=args.dup_rate, semilla=args.seed)
+		for path in paths:
+			print("Generado:", path)
+	else:
+		path = generar_muestra(directorio_drops=None, forzar=args.forzar, n_filas=args.rows, n_invalidas=args.invalid)
+		print("Generado:", path)
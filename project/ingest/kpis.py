@@ -0,0 +1,201 @@
+"""Motor de KPIs del reporte en una sola pasada sobre tablas Arrow.
+
+El reporte necesita ingresos, transacciones, periodo, filas con precio alto, el
+top de productos y el resumen por día. En lugar de varios ``groupby`` y sumas
+sobre copias del DataFrame, cada columna se convierte una vez a arrays NumPy,
+los grupos se codifican una vez (día como entero, producto con
+``dictionary_encode``) y todas las sumas y recuentos salen de ``np.bincount``.
+
+    filas, resto = run.read_report(dataset)   # precio <= 150 / resto
+    k = kpis.compute(filas, resto)
+    k.ingresos, k.top_productos[0].id_producto, k.por_dia[:3]
+
+from_aggregates() construye el mismo objeto desde los agregados materializados
+de ut1.db (agg_ventas_*, dim_producto), sin leer filas.
+"""
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import date
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# por debajo de este número de pares (id, nombre) posibles se agrupa con bincount directo
+MAX_PARES_DIRECTOS = 1 << 22
+
+
+class Producto(NamedTuple):
+    id_producto: str
+    nombre_producto: str
+    importe: float
+
+
+class Dia(NamedTuple):
+    fecha: date
+    importe_total: float
+    transacciones: int
+
+
+@dataclass(frozen=True)
+class KPIs:
+    """Métricas del reporte.
+
+    Args:
+        ingresos: suma de importes de todas las filas (también las de precio alto)
+        transacciones: número de filas
+        periodo: (primera, última) fecha con ventas, o None sin datos
+        precio_alto: filas con precio por encima del máximo del reporte
+        top_productos: productos con más importe (sólo filas dentro del máximo)
+        por_dia: importe y transacciones de los últimos días (sólo filas dentro del máximo)
+    """
+    ingresos: float = 0.0
+    transacciones: int = 0
+    periodo: Optional[tuple[date, date]] = None
+    precio_alto: int = 0
+    top_productos: list[Producto] = field(default_factory=list)
+    por_dia: list[Dia] = field(default_factory=list)
+
+    @property
+    def ticket_medio(self) -> float:
+        return self.ingresos / self.transacciones if self.transacciones else 0.0
+
+    @property
+    def producto_lider(self) -> str:
+        return self.top_productos[0].id_producto if self.top_productos else "—"
+
+
+def _floats(col: pa.ChunkedArray) -> np.ndarray:
+    """Columna numérica como float64 con NaN en los nulos."""
+    return pc.cast(col, pa.float64()).to_numpy()
+
+
+def _codes(col: pa.ChunkedArray) -> tuple[np.ndarray, pa.Array]:
+    """Códigos de diccionario (-1 para nulos) y valores distintos de una columna.
+
+    Las columnas que ya vienen como diccionario (ids y nombre en Parquet) sólo
+    unifican los diccionarios de sus trozos; no se vuelve a codificar cada fila.
+    """
+    if not pa.types.is_dictionary(col.type):
+        col = pc.dictionary_encode(col)
+    col = col.unify_dictionaries()
+    if not col.num_chunks:
+        return np.empty(0, dtype=np.int32), pa.array([], col.type.value_type)
+    indices = pa.chunked_array([c.indices for c in col.chunks], type=col.type.index_type)
+    return pc.fill_null(indices, -1).to_numpy(), col.chunk(0).dictionary
+
+
+def _periodo(*columnas: pa.ChunkedArray) -> Optional[tuple[date, date]]:
+    extremos = [pc.min_max(c) for c in columnas if len(c)]
+    minimos = [e["min"].as_py() for e in extremos if e["min"].is_valid]
+    maximos = [e["max"].as_py() for e in extremos if e["max"].is_valid]
+    return (min(minimos), max(maximos)) if minimos else None
+
+
+def top_productos(filas: pa.Table, importe: np.ndarray, n: int) -> list[Producto]:
+    """Productos (id + nombre) con más importe; como groupby, ignora las filas con algún nulo."""
+    ids, id_valores = _codes(filas["id_producto"])
+    nombres, nombre_valores = _codes(filas["nombre_producto"])
+    validas = (ids >= 0) & (nombres >= 0)
+    ancho = max(len(nombre_valores), 1)
+    pares = ids[validas].astype(np.int64) * ancho + nombres[validas]
+    pesos = np.nan_to_num(importe[validas])
+    if len(id_valores) * ancho <= MAX_PARES_DIRECTOS:
+        # pocos pares posibles: el par es directamente el índice del cubo
+        unicos = np.flatnonzero(np.bincount(pares, minlength=len(id_valores) * ancho))
+        sumas = np.bincount(pares, weights=pesos, minlength=len(id_valores) * ancho)[unicos]
+    else:
+        grupos, unicos = pd.factorize(pares)
+        sumas = np.bincount(grupos, weights=pesos, minlength=len(unicos))
+    id_py, nombre_py = id_valores.to_pylist(), nombre_valores.to_pylist()
+    claves = [(id_py[p // ancho], nombre_py[p % ancho]) for p in unicos]
+    # orden de groupby (por clave) y después por importe descendente, estable
+    orden = sorted(range(len(claves)), key=claves.__getitem__)
+    orden = sorted(orden, key=lambda g: -sumas[g])[:n]
+    return [Producto(*claves[g], float(sumas[g])) for g in orden]
+
+
+def por_dia(filas: pa.Table, importe: np.ndarray, n: int) -> list[Dia]:
+    """Importe y transacciones (importes no nulos) de los `n` últimos días con ventas."""
+    dias = pc.fill_null(pc.cast(filas["fecha"], pa.int32()), np.iinfo(np.int32).min).to_numpy()
+    validas = dias != np.iinfo(np.int32).min
+    if not validas.any():
+        return []
+    dias, importe = dias[validas], importe[validas]
+    base = int(dias.min())
+    codigos = dias - base
+    sumas = np.bincount(codigos, weights=np.nan_to_num(importe))
+    cuentas = np.bincount(codigos, weights=~np.isnan(importe))
+    presentes = np.flatnonzero(np.bincount(codigos))[::-1][:n]
+    return [Dia(date.fromordinal(date(1970, 1, 1).toordinal() + base + int(d)), float(sumas[d]), int(cuentas[d]))
+            for d in presentes]
+
+
+def compute(filas: pa.Table, resto: Optional[pa.Table] = None, max_precio: float = 150,
+            top_n: int = 5, dias: int = 20) -> KPIs:
+    """Calcula todas las métricas del reporte.
+
+    Args:
+        filas: filas con precio <= max_precio (fecha, id_producto, nombre_producto, importe)
+        resto: filas restantes (fecha, precio_unitario, importe); cuentan en totales y periodo
+        max_precio: precio máximo del reporte
+        top_n: productos del top
+        dias: días del resumen diario
+
+    Returns:
+        KPIs con todas las métricas
+    """
+    importe = _floats(filas["importe"])
+    ingresos = float(np.nansum(importe))
+    transacciones = len(filas)
+    precio_alto = 0
+    columnas_fecha = [filas["fecha"]]
+    if resto is not None:
+        ingresos += float(np.nansum(_floats(resto["importe"])))
+        transacciones += len(resto)
+        precio_alto = int(np.count_nonzero(_floats(resto["precio_unitario"]) > max_precio))
+        columnas_fecha.append(resto["fecha"])
+    if not transacciones:
+        return KPIs()
+    return KPIs(
+        ingresos=ingresos,
+        transacciones=transacciones,
+        periodo=_periodo(*columnas_fecha),
+        precio_alto=precio_alto,
+        top_productos=top_productos(filas, importe, top_n),
+        por_dia=por_dia(filas, importe, dias),
+    )
+
+
+def from_aggregates(con: sqlite3.Connection, top_n: int = 5, dias: int = 20) -> KPIs:
+    """KPIs desde agg_ventas_diarias, agg_ventas_producto y dim_producto.
+
+    No aplica el precio máximo (los agregados no lo distinguen) y agrupa el top
+    sólo por id_producto; ingest/report.py lo usa cuando las estadísticas del
+    Parquet garantizan que no hay filas que filtrar. Los importes se redondean a
+    céntimos: los agregados acumulan deltas y arrastran error de coma flotante.
+    """
+    ingresos, transacciones, primera, ultima = con.execute(
+        "SELECT TOTAL(importe_total), TOTAL(lineas), MIN(fecha), MAX(fecha) FROM agg_ventas_diarias WHERE lineas > 0"
+    ).fetchone()
+    if not transacciones:
+        return KPIs()
+    top = con.execute(
+        "SELECT a.id_producto, d.nombre_producto, a.importe_total FROM agg_ventas_producto a"
+        " LEFT JOIN dim_producto d USING (id_producto)"
+        " WHERE a.lineas > 0 AND a.id_producto <> '' ORDER BY a.importe_total DESC, a.id_producto LIMIT ?",
+        (top_n,),
+    ).fetchall()
+    ultimos = con.execute(
+        "SELECT fecha, importe_total, lineas FROM agg_ventas_diarias WHERE lineas > 0 ORDER BY fecha DESC LIMIT ?",
+        (dias,),
+    ).fetchall()
+    return KPIs(
+        ingresos=round(ingresos, 2),
+        transacciones=int(transacciones),
+        periodo=(date.fromisoformat(primera), date.fromisoformat(ultima)),
+        top_productos=[Producto(id_producto, nombre, round(importe, 2)) for id_producto, nombre, importe in top],
+        por_dia=[Dia(date.fromisoformat(f), round(importe, 2), int(lineas)) for f, importe, lineas in ultimos],
+    )
@@ -0,0 +1,104 @@
+"""Manifiesto de drops procesados: ingesta incremental idempotente.
+
+La tabla ``ingest_manifest`` de ``ut1.db`` guarda, por fichero de
+``data/drops``, su huella (tamaño, mtime, sha256), el batch que lo ingirió y
+sus recuentos de filas. En cada ejecución sólo se ingieren los drops nuevos o
+modificados:
+
+- tamaño y mtime iguales al manifiesto → sin cambios (no se lee el fichero);
+- si difieren, se calcula el sha256: si coincide (p. ej. un ``touch`` o una
+  copia) sólo se actualiza el mtime; si no, el drop está modificado.
+
+``reset`` vacía el manifiesto y las tablas derivadas (``--full-refresh``).
+"""
+import hashlib
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+BLOQUE_HASH = 1 << 20
+
+
+class Huella(NamedTuple):
+    """Identidad de un drop en el manifiesto."""
+    path: Path
+    size_bytes: int
+    mtime: float
+    sha256: Optional[str] = None
+
+
+def file_hash(f: Path) -> str:
+    """sha256 del contenido, leído en bloques de 1 MiB."""
+    h = hashlib.sha256()
+    with f.open("rb") as fh:
+        for bloque in iter(lambda: fh.read(BLOQUE_HASH), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huella(f: Path, with_hash: bool = False) -> Huella:
+    st = f.stat()
+    return Huella(f, st.st_size, st.st_mtime, file_hash(f) if with_hash else None)
+
+
+def plan(con: sqlite3.Connection, files: list[Path]) -> tuple[list[Huella], list[Path]]:
+    """Separa los drops pendientes (nuevos o modificados) de los ya ingeridos.
+
+    Returns:
+        tuple: (huellas con sha256 de los pendientes, ficheros omitidos sin cambios)
+    """
+    previos = {
+        nombre: (size, mtime, sha)
+        for nombre, size, mtime, sha in con.execute(
+            "SELECT source_file, size_bytes, mtime, sha256 FROM ingest_manifest")
+    }
+    pendientes, omitidos = [], []
+    for f in files:
+        h = huella(f)
+        previo = previos.get(f.name)
+        if previo is not None and previo[:2] == (h.size_bytes, h.mtime):
+            omitidos.append(f)
+            continue
+        h = h._replace(sha256=file_hash(f))
+        if previo is not None and previo[2] == h.sha256:
+            con.execute("UPDATE ingest_manifest SET size_bytes = ?, mtime = ? WHERE source_file = ?",
+                        (h.size_bytes, h.mtime, f.name))
+            omitidos.append(f)
+            continue
+        pendientes.append(h)
+    con.commit()
+    return pendientes, omitidos
+
+
+def record(con: sqlite3.Connection, h: Huella, batch_id: str, rows_raw: int, rows_quarantine: int) -> None:
+    """Registra (o sustituye) la entrada de un drop ya ingerido."""
+    con.execute(
+        "INSERT OR REPLACE INTO ingest_manifest"
+        " (source_file, size_bytes, mtime, sha256, _batch_id, rows_raw, rows_clean, rows_quarantine, ingested_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (h.path.name, h.size_bytes, h.mtime, h.sha256, batch_id,
+         rows_raw, rows_raw - rows_quarantine, rows_quarantine, datetime.now(timezone.utc).isoformat()),
+    )
+
+
+def forget(con: sqlite3.Connection, files: list[Path]) -> None:
+    """Borra del bronce y de la cuarentena las filas previas de drops que se van a (re)ingerir.
+
+    Son las de versiones anteriores de drops modificados o las que dejó una
+    ejecución cortada antes de confirmar el manifiesto (el drop sigue siendo nuevo).
+
+    En el bronce compacto basta con borrar su linaje de batches (ver bronze_store.py).
+    """
+    for f in files:
+        con.execute("DELETE FROM raw_ventas WHERE _source_file = ?", (f.name,))
+        con.execute("DELETE FROM quarantine_ventas WHERE _source_file = ?", (f.name,))
+        con.execute("DELETE FROM batches WHERE _source_file = ?", (f.name,))
+
+
+def reset(con: sqlite3.Connection) -> None:
+    """Vacía el manifiesto y las tablas cargadas a partir de los drops."""
+    for tabla in ("ingest_manifest", "raw_ventas", "clean_ventas", "quarantine_ventas", "batches", "bronze_parts",
+                  "agg_ventas_diarias", "agg_ventas_producto", "agg_ventas_mensuales", "dim_producto"):
+        con.execute(f"DELETE FROM {tabla}")
+    con.commit()
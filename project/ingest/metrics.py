@@ -0,0 +1,202 @@
+"""Métricas por etapa de una ejecución: tiempo real, CPU, pico de memoria y filas.
+
+    perf = metrics.StageProfiler()
+    with perf.stage("validacion", rows=len(raw_df)):
+        df, clean, quarantine = split_valid(raw_df)
+    perf.save(DB, batch_id)                      # tabla run_metrics de ut1.db
+    perf.write_json(OUT / "run_metrics.json", batch_id)
+
+Una etapa puede abrirse varias veces (en el modo por bloques, una por bloque):
+acumula tiempo, CPU, filas y tramos, y su pico de RSS es el máximo de sus
+tramos. En Linux el pico se reinicia al entrar en cada tramo
+(``/proc/self/clear_refs``) y se lee de ``VmHWM``, así que es el de la etapa y
+no el de todo el proceso; si no se puede reiniciar es el pico del proceso hasta
+ese momento (``resource``), y None donde no hay ninguno de los dos (Windows).
+
+La CPU es la del proceso más la de los procesos hijos ya terminados, de modo
+que el pool de ``--workers`` cuenta en la etapa en la que se cierra.
+
+Con ``profile=True`` cada etapa tiene su propio ``cProfile.Profile`` y
+``dump_slowest`` guarda en formato pstats el de la etapa más lenta.
+
+Las etapas pueden medirse desde varios hilos a la vez (``run.py --pipeline``,
+ver pipeline.py). Entonces se solapan: la suma de sus tiempos supera el total,
+y la CPU de cada una es la de todo el proceso mientras estaba abierta. El pico
+se reinicia sólo cuando no hay ninguna etapa abierta en ningún hilo.
+"""
+import cProfile
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_STATUS = Path("/proc/self/status")
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+@dataclass
+class StageMetrics:
+    """Métricas acumuladas de una etapa."""
+    stage: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    rows: int = 0
+    calls: int = 0
+
+    @property
+    def rows_per_s(self) -> Optional[float]:
+        return self.rows / self.wall_s if self.rows and self.wall_s else None
+
+
+def _cpu() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _reset_peak() -> None:
+    """Reinicia VmHWM del proceso (Linux); si no es posible el pico sigue siendo el del proceso."""
+    try:
+        _CLEAR_REFS.write_text("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso en MiB."""
+    try:
+        for linea in _STATUS.read_text().splitlines():
+            if linea.startswith("VmHWM:"):
+                return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: KiB en Linux, bytes en macOS
+    return pico / 2**20 if sys.platform == "darwin" else pico / 1024
+
+
+class StageProfiler:
+    """Registra las etapas de una ejecución en el orden en que aparecen.
+
+    Args:
+        profile: si es True, perfila cada etapa con cProfile (más lento)
+    """
+
+    def __init__(self, profile: bool = False):
+        self.profile = profile
+        self.stages: dict[str, StageMetrics] = {}
+        self._perfiles: dict[str, cProfile.Profile] = {}
+        self._perfilando = False
+        self._abiertas = 0
+        self._cerrojo = threading.Lock()
+        self._inicio = (time.perf_counter(), _cpu())
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0) -> Iterator[StageMetrics]:
+        """Mide un tramo de la etapa `name`; las filas pueden sumarse también en el registro devuelto."""
+        with self._cerrojo:
+            m = self.stages.setdefault(name, StageMetrics(name))
+            m.rows += rows
+            if not self._abiertas:
+                # dentro de otra etapa no se reinicia: se perdería el pico de la exterior
+                _reset_peak()
+            self._abiertas += 1
+            perfil = None
+            if self.profile and not self._perfilando:
+                # cProfile no admite dos perfiles activos: las etapas anidadas (o de otros hilos)
+                # cuentan en la primera
+                perfil = self._perfiles.setdefault(name, cProfile.Profile())
+                self._perfilando = True
+                perfil.enable()
+        t0, c0 = time.perf_counter(), _cpu()
+        try:
+            yield m
+        finally:
+            pico = _peak_rss_mb()
+            with self._cerrojo:
+                m.wall_s += time.perf_counter() - t0
+                m.cpu_s += _cpu() - c0
+                m.calls += 1
+                self._abiertas -= 1
+                if perfil is not None:
+                    perfil.disable()
+                    self._perfilando = False
+                if pico is not None:
+                    m.peak_rss_mb = max(pico, m.peak_rss_mb or 0.0)
+
+    def iterate(self, name: str, items: Iterable, rows: Callable[[object], int] = len) -> Iterator:
+        """Recorre `items` contando en la etapa `name` el tiempo de producir cada elemento."""
+        it = iter(items)
+        while True:
+            with self.stage(name) as m:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                m.rows += rows(item)
+            yield item
+
+    def total(self) -> StageMetrics:
+        """Tiempo y CPU desde la creación del perfilador; el pico es el mayor de las etapas."""
+        picos = [m.peak_rss_mb for m in self.stages.values() if m.peak_rss_mb is not None]
+        return StageMetrics(
+            "total",
+            wall_s=time.perf_counter() - self._inicio[0],
+            cpu_s=_cpu() - self._inicio[1],
+            peak_rss_mb=max(picos) if picos else None,
+            calls=1,
+        )
+
+    def slowest(self) -> Optional[StageMetrics]:
+        return max(self.stages.values(), key=lambda m: m.wall_s, default=None)
+
+    def summary(self) -> list[StageMetrics]:
+        """Etapas en orden de aparición y el total al final."""
+        return list(self.stages.values()) + [self.total()]
+
+    def save(self, db: Path, batch_id: str) -> None:
+        """Guarda las métricas en run_metrics (una fila por etapa y batch)."""
+        con = sqlite3.connect(db)
+        with con:
+            con.executemany(
+                "INSERT OR REPLACE INTO run_metrics (_batch_id, stage, seq, wall_s, cpu_s, peak_rss_mb, rows, calls)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(batch_id, m.stage, seq, m.wall_s, m.cpu_s, m.peak_rss_mb, m.rows, m.calls)
+                 for seq, m in enumerate(self.summary())],
+            )
+        con.close()
+
+    def write_json(self, path: Path, batch_id: str, params: Optional[dict] = None) -> None:
+        """Escribe las métricas de la ejecución (y sus parámetros) en JSON."""
+        doc = {
+            "batch_id": batch_id,
+            "params": params or {},
+            "stages": [dict(asdict(m), rows_per_s=m.rows_per_s) for m in self.summary()],
+        }
+        path.write_text(json.dumps(doc, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+
+    def dump_slowest(self, directory: Path) -> Optional[Path]:
+        """Guarda el perfil cProfile de la etapa más lenta (con profile=True).
+
+        Returns:
+            ruta del fichero .pstats, o None si no se perfiló
+        """
+        lenta = self.slowest()
+        if lenta is None or lenta.stage not in self._perfiles:
+            return None
+        destino = directory / f"profile_{lenta.stage}.pstats"
+        self._perfiles[lenta.stage].dump_stats(str(destino))
+        return destino
@@ -0,0 +1,263 @@
+"""Dataset Parquet de la capa plata particionado por año/mes (estilo Hive).
+
+    output/parquet/clean_ventas/year=2025/month=03/part-0.parquet
+
+La clave natural incluye la fecha, así que todas las versiones de una clave
+caen en la misma partición y "último gana" se resuelve partición a partición:
+cada ejecución reescribe sólo las particiones que tocan sus filas (filas
+anteriores de la partición + nuevas, deduplicadas) y el coste de escritura es
+proporcional a los datos nuevos, no al histórico.
+
+Las filas nuevas se reparten por partición en ficheros temporales (Arrow IPC)
+a medida que llegan, de modo que el modo ``--chunk-size`` no las acumula en
+memoria; al confirmar se reescribe cada partición tocada con un fichero
+temporal + ``replace`` (una partición nunca queda a medio escribir).
+"""
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    from .dedup import key_order
+    from .streaming import CLEAN_SCHEMA
+except ImportError:
+    from dedup import key_order
+    from streaming import CLEAN_SCHEMA
+
+COMPRESIONES = ["zstd", "snappy", "gzip", "none"]
+FICHERO = "part-0.parquet"
+# columnas de cada partición: las de plata + el importe calculado por la deduplicación
+SCHEMA = CLEAN_SCHEMA.append(pa.field("importe", pa.float64()))
+# orden de las filas dentro de cada partición (la clave natural)
+KEY = ["fecha", "id_cliente", "id_producto"]
+_PARTICION = re.compile(r"year=(\d+)/month=(\d+)")
+
+
+def _partition_key(fichero: Path) -> int:
+    """year*100 + month de la partición a la que pertenece un fichero."""
+    year, month = _PARTICION.search(fichero.as_posix()).groups()
+    return int(year) * 100 + int(month)
+
+
+def _y(a: Optional[pc.Expression], b: pc.Expression) -> pc.Expression:
+    return b if a is None else a & b
+
+
+def _partition_keys(table: pa.Table) -> np.ndarray:
+    """year*100 + month de cada fila (0 si la fecha es nula)."""
+    year = pc.fill_null(pc.year(table["fecha"]), 0)
+    month = pc.fill_null(pc.month(table["fecha"]), 0)
+    return (pc.add(pc.multiply(year, 100), month)).to_numpy(zero_copy_only=False)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Dataset particionado en `root` con sus opciones de escritura.
+
+    Args:
+        root: directorio raíz del dataset
+        compression: códec de Parquet (zstd, snappy, gzip o none)
+        row_group_size: filas máximas por row group
+    """
+    root: Path
+    compression: str = "zstd"
+    row_group_size: int = 128_000
+
+    def partition_dir(self, key: int) -> Path:
+        return self.root / f"year={key // 100}" / f"month={key % 100:02d}"
+
+    def files(self, desde: Optional[date] = None, hasta: Optional[date] = None) -> list[Path]:
+        """Ficheros del dataset; con desde/hasta, sólo los de las particiones que solapan la ventana."""
+        ficheros = sorted(self.root.glob("year=*/month=*/*.parquet"))
+        if desde is None and hasta is None:
+            return ficheros
+        minimo = desde.year * 100 + desde.month if desde else 0
+        maximo = hasta.year * 100 + hasta.month if hasta else 999_912
+        return [f for f in ficheros if minimo <= _partition_key(f) <= maximo]
+
+    def exists(self) -> bool:
+        return bool(self.files())
+
+    def num_rows(self) -> int:
+        return sum(pq.ParquetFile(f).metadata.num_rows for f in self.files())
+
+    def column_stats(self, column: str) -> Optional[tuple[object, object, int]]:
+        """(mínimo, máximo, nulos) de una columna leídos sólo de los metadatos de los row groups.
+
+        Returns:
+            None si algún row group no tiene estadísticas de la columna o el dataset está vacío
+        """
+        minimos, maximos, nulos = [], [], 0
+        for f in self.files():
+            metadata = pq.ParquetFile(f).metadata
+            indice = metadata.schema.to_arrow_schema().get_field_index(column)
+            for rg in range(metadata.num_row_groups):
+                stats = metadata.row_group(rg).column(indice).statistics
+                if stats is None or not stats.has_null_count:
+                    return None
+                nulos += stats.null_count
+                if stats.has_min_max:
+                    minimos.append(stats.min)
+                    maximos.append(stats.max)
+        if not minimos and not nulos:
+            return None
+        return (min(minimos) if minimos else None, max(maximos) if maximos else None, nulos)
+
+    def reset(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def writer(self) -> "PartitionWriter":
+        return PartitionWriter(self)
+
+    def write_partition(self, key: int, frame: pd.DataFrame) -> None:
+        """Escribe (sustituye) una partición completa."""
+        directorio = self.partition_dir(key)
+        directorio.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(frame.reindex(columns=SCHEMA.names), schema=SCHEMA, preserve_index=False)
+        tmp = directorio / f".{FICHERO}.tmp"  # oculto: los lectores de datasets ignoran los ficheros con "."
+        pq.write_table(table, tmp, compression=None if self.compression == "none" else self.compression,
+                       row_group_size=self.row_group_size)
+        tmp.replace(directorio / FICHERO)
+
+    def drop_partition(self, key: int) -> None:
+        (self.partition_dir(key) / FICHERO).unlink(missing_ok=True)
+
+    def scan(self, columns: list[str], filtro: Optional[pc.Expression] = None,
+             desde: Optional[date] = None, hasta: Optional[date] = None) -> pa.Table:
+        """Lee sólo `columns` de las filas que cumplen `filtro` y caen en [desde, hasta].
+
+        La ventana de fechas descarta particiones enteras por su ruta; el filtro y
+        los límites de fecha se empujan a los row groups (estadísticas min/max de
+        Parquet), así que sólo se descomprimen los que pueden tener filas.
+        """
+        ficheros = self.files(desde, hasta)
+        if not ficheros:
+            return SCHEMA.empty_table().select(columns)
+        condicion = filtro
+        if desde:
+            condicion = _y(condicion, pc.field("fecha") >= desde)
+        if hasta:
+            condicion = _y(condicion, pc.field("fecha") <= hasta)
+        return ds.dataset([str(f) for f in ficheros], schema=SCHEMA, format="parquet").to_table(
+            columns=columns, filter=condicion)
+
+    def read_partition(self, key: int) -> Optional[pa.Table]:
+        """Filas de una partición con CLEAN_SCHEMA (también las escritas con ids como string)."""
+        f = self.partition_dir(key) / FICHERO
+        if not f.exists():
+            return None
+        return pq.read_table(f, columns=CLEAN_SCHEMA.names).cast(CLEAN_SCHEMA)
+
+    def migrate_legacy(self, legacy_file: Path, dedup: Callable[[pd.DataFrame], pd.DataFrame]) -> None:
+        """Importa el antiguo clean_ventas.parquet monolítico y lo elimina."""
+        legacy = pq.ParquetFile(legacy_file)
+        columnas = [c for c in CLEAN_SCHEMA.names if c in legacy.schema_arrow.names]
+        with self.writer() as parts:
+            for batch in legacy.iter_batches(columns=columnas):
+                parts.add(batch.to_pandas().reindex(columns=CLEAN_SCHEMA.names))
+            parts.commit(dedup)
+        legacy_file.unlink()
+
+
+class PartitionWriter:
+    """Acumula filas nuevas por partición en disco y reescribe al confirmar las particiones tocadas.
+
+    Se usa como gestor de contexto: si no se llama a commit(), las particiones
+    existentes no se modifican.
+    """
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+        self._tmp: Optional[tempfile.TemporaryDirectory] = None
+        self._writers: dict[int, pa.ipc.RecordBatchStreamWriter] = {}
+
+    def __enter__(self):
+        self.dataset.root.mkdir(parents=True, exist_ok=True)
+        self._tmp = tempfile.TemporaryDirectory(prefix="parts_", dir=self.dataset.root.parent)
+        return self
+
+    def __exit__(self, *exc):
+        self._close()
+        self._tmp.cleanup()
+
+    def _path(self, key: int) -> Path:
+        return Path(self._tmp.name) / f"{key}.arrows"
+
+    def _close(self) -> list[int]:
+        """Cierra los ficheros temporales y devuelve las particiones tocadas."""
+        for writer in self._writers.values():
+            writer.close()
+        tocadas = sorted(self._writers)
+        self._writers.clear()
+        return tocadas
+
+    def add(self, clean: pd.DataFrame) -> None:
+        """Añade filas limpias ya tipadas (columnas de CLEAN_SCHEMA)."""
+        if clean.empty:
+            return
+        table = pa.Table.from_pandas(clean[CLEAN_SCHEMA.names], schema=CLEAN_SCHEMA, preserve_index=False)
+        keys = _partition_keys(table)
+        orden = np.argsort(keys, kind="stable")
+        particiones, inicios = np.unique(keys[orden], return_index=True)
+        limites = list(inicios[1:]) + [len(orden)]
+        for key, ini, fin in zip(particiones, inicios, limites):
+            writer = self._writers.get(int(key))
+            if writer is None:
+                writer = pa.ipc.new_stream(str(self._path(int(key))), CLEAN_SCHEMA)
+                self._writers[int(key)] = writer
+            writer.write_table(table.take(orden[ini:fin]))
+
+    def commit(self, dedup: Callable[[pd.DataFrame], pd.DataFrame], drop: Optional[pc.Expression] = None,
+               also: Iterable[int] = ()) -> list[int]:
+        """Reescribe cada partición tocada con sus filas anteriores + las nuevas, deduplicadas.
+
+        Args:
+            dedup: deduplicación "último gana" de las filas de una partición
+            drop: filas anteriores que se descartan (p. ej. las de un batch que se rehace)
+            also: particiones que se reescriben aunque no tengan filas nuevas (para aplicar `drop`)
+
+        Returns:
+            claves year*100+month de las particiones reescritas
+        """
+        nuevas_por_key = self._close()
+        tocadas = sorted(set(nuevas_por_key) | set(also))
+        for key in tocadas:
+            nuevas = None
+            if key in nuevas_por_key:
+                with pa.ipc.open_stream(str(self._path(key))) as reader:
+                    nuevas = reader.read_all()
+            previas = self.dataset.read_partition(key)
+            if previas is not None and drop is not None:
+                previas = previas.filter(~drop)
+            if nuevas is None:
+                if previas is None:
+                    continue
+                nuevas, previas = previas, None
+            # las filas anteriores van primero: a igual _ingest_ts ganan las nuevas;
+            # concatenar en Arrow y convertir una vez unifica los diccionarios (category)
+            tabla = nuevas if previas is None else pa.concat_tables([previas, nuevas])
+            frame = tabla.to_pandas()
+            # category ordena por el orden de sus categorías: se ordenan antes para que
+            # las filas (y los diccionarios del Parquet) queden en orden lexicográfico
+            for c in frame.select_dtypes("category"):
+                frame[c] = frame[c].cat.reorder_categories(sorted(frame[c].cat.categories))
+            # dedup conserva el orden de llegada: las previas siguen ordenadas por clave
+            # y key_order sólo intercala las nuevas, sin reordenar el histórico
+            frame = dedup(frame)
+            frame = frame.iloc[key_order(frame, KEY)]
+            if frame.empty:
+                self.dataset.drop_partition(key)
+            else:
+                self.dataset.write_partition(key, frame)
+        return tocadas
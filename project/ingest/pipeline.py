@@ -0,0 +1,163 @@
+"""Ingesta por etapas solapadas (``run.py --pipeline``).
+
+    lectura ──cola──> validación ──cola──> cuarentena + bronce (ut1.db)
+                          │
+                          └─ al final: dedup ──> Parquet plata   ║   UPSERT en clean_ventas
+
+Cada etapa es un hilo y las une una cola acotada (``PROFUNDIDAD`` drops en
+vuelo), así que mientras se valida el drop N se lee el N+1 y se escriben la
+cuarentena y el bronce del N-1, sin tener en memoria más que esos. "Último
+gana" es global, como en run.ingest_batch: la plata sólo se conoce cuando se
+ha validado el último drop. Entonces el Parquet plata (en un hilo) y el UPSERT
+(en el principal) se escriben a la vez, porque no dependen uno del otro.
+
+Hilos y no asyncio: todas las etapas son llamadas bloqueantes (pandas,
+pyarrow, sqlite3) que sueltan el GIL en su parte pesada (parseo, compresión,
+``sqlite3_step``), y un bucle de eventos sólo las pasaría a un pool de hilos.
+Todo lo que escribe en ut1.db se ejecuta en el hilo principal, el de la
+conexión, porque sqlite3 no comparte conexiones entre hilos.
+
+El resultado es el mismo que el de run.ingest_batch: mismas filas en el mismo
+orden de llegada, con la validación por drop de run.ingest_parallel.
+"""
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+try:
+    from . import arrow_io, bronze_store, metrics, parquet_store, run
+except ImportError:
+    import arrow_io
+    import bronze_store
+    import metrics
+    import parquet_store
+    import run
+
+# drops en vuelo en cada cola
+PROFUNDIDAD = 2
+# fin de una cola
+FIN = None
+# segundos entre comprobaciones de cancelación en una cola llena o vacía
+_ESPERA = 0.1
+
+
+class Etapa(threading.Thread):
+    """Hilo de una etapa: si falla, guarda la excepción y cancela las demás."""
+
+    def __init__(self, nombre: str, objetivo: Callable[[], None], cancelado: threading.Event):
+        super().__init__(name=nombre, daemon=True)
+        self.objetivo = objetivo
+        self.cancelado = cancelado
+        self.error: Optional[BaseException] = None
+
+    def run(self):
+        try:
+            self.objetivo()
+        except BaseException as e:  # se relanza en el hilo principal
+            self.error = e
+            self.cancelado.set()
+
+
+def put(cola: queue.Queue, item, cancelado: threading.Event) -> None:
+    """Encola `item` esperando sitio, salvo que otra etapa haya fallado."""
+    while not cancelado.is_set():
+        try:
+            cola.put(item, timeout=_ESPERA)
+            return
+        except queue.Full:
+            pass
+
+
+def get(cola: queue.Queue, cancelado: threading.Event):
+    """Siguiente elemento de `cola` (FIN si otra etapa ha fallado)."""
+    while not cancelado.is_set():
+        try:
+            return cola.get(timeout=_ESPERA)
+        except queue.Empty:
+            pass
+    return FIN
+
+
+def ingest_pipelined(files, con, upsert_sql, quarantine_file: Path, dataset: parquet_store.Dataset, batch_id: str,
+                     engine: str = "pandas", perf: Optional[metrics.StageProfiler] = None,
+                     scans: Optional[dict] = None, bronze: Optional[bronze_store.BronzeStore] = None,
+                     depth: int = PROFUNDIDAD) -> dict:
+    """Como run.ingest_batch, pero con lectura, validación y escrituras solapadas.
+
+    En las métricas las etapas se solapan: la suma de sus tiempos supera el total.
+    """
+    perf = perf or metrics.StageProfiler()
+    scans = scans or {}
+    stats = run.new_stats()
+    leidos, validados = queue.Queue(depth), queue.Queue(depth)
+    cancelado = threading.Event()
+    resultado = {}
+
+    def leer():
+        try:
+            for f in files:
+                for raw_df in perf.iterate("lectura", run.read_drop(f, engine=engine, scan=scans.get(f))):
+                    put(leidos, raw_df, cancelado)
+        finally:
+            put(leidos, FIN, cancelado)
+
+    def validar():
+        cleans = []
+        try:
+            while (raw_df := get(leidos, cancelado)) is not FIN:
+                with perf.stage("validacion", rows=len(raw_df)):
+                    df, clean, quarantine = run.split_valid(raw_df)
+                    cleans.append(run.coerce_clean(clean))
+                put(validados, (df, quarantine), cancelado)
+        finally:
+            put(validados, FIN, cancelado)
+        if cancelado.is_set():
+            return
+        with perf.stage("dedup"):
+            clean = arrow_io.concat_frames(cleans) if cleans else pd.DataFrame(columns=run.CLEAN_COLS)
+        del cleans
+        if not clean.empty:
+            with perf.stage("dedup", rows=len(clean)):
+                clean = run.dedup_last_wins(clean)
+        resultado["clean"] = clean
+
+    def escribir_parquet():
+        clean = resultado["clean"]
+        with perf.stage("parquet", rows=len(clean)), dataset.writer() as parts:
+            parts.add(clean)
+            parts.commit(run.dedup_last_wins)
+
+    etapas = [Etapa("lectura", leer, cancelado), Etapa("validacion", validar, cancelado)]
+    for etapa in etapas:
+        etapa.start()
+    try:
+        # cuarentena y bronce de cada drop según se valida
+        while (item := get(validados, cancelado)) is not FIN:
+            df, quarantine = item
+            with perf.stage("cuarentena", rows=len(quarantine)):
+                run.write_quarantine(quarantine, quarantine_file, con, batch_id)
+            with perf.stage("bronce", rows=len(df)):
+                run.write_raw(df, con, batch_id, bronze)
+            run.tally(stats, df, quarantine)
+        etapas[1].join()
+        if not cancelado.is_set():
+            # plata: Parquet en otro hilo mientras el UPSERT ocupa la conexión
+            etapas.append(Etapa("parquet", escribir_parquet, cancelado))
+            etapas[-1].start()
+            clean = resultado["clean"]
+            if not clean.empty:
+                with perf.stage("upsert", rows=len(clean)):
+                    run.upsert_clean(clean, con, upsert_sql)
+    except BaseException:
+        cancelado.set()
+        raise
+    finally:
+        for etapa in etapas:
+            etapa.join()
+    for etapa in etapas:
+        if etapa.error is not None:
+            raise etapa.error
+    return stats
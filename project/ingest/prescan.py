@@ -0,0 +1,260 @@
+"""Pre-escaneo de drops con mmap: estadísticas baratas antes del parseo completo.
+
+    info = prescan.scan(Path("data/drops/ventas.csv"))
+    info.rows, info.delimiter, info.decimal, info.problems, info.errors
+    info.ranges(4)      # 4 rangos de bytes que empiezan y acaban en fin de línea
+
+El fichero se proyecta en memoria (``mmap``) y sólo se recorre para contar
+saltos de línea (``bytes.count`` por tramos, sin decodificar ni crear objetos
+por fila); cabecera, delimitador, separador decimal y forma de las filas se
+deducen de una muestra del principio y del final. Lo que se detecta:
+
+- CSV: delimitador entre ``, ; \\t |`` (el que da el mismo número de campos en
+  la cabecera y en la muestra), coma decimal (precios ``12,50``), columnas
+  obligatorias ausentes y líneas de la muestra con otro número de campos;
+- NDJSON: líneas de la muestra que no son objetos JSON;
+- en ambos: fichero vacío, bytes NUL (binario) o texto que no es UTF-8.
+
+Sólo lo que impide leer el fichero (vacío, binario, no UTF-8 o NDJSON que no
+es JSON) va a ``errors`` y deja el drop sin ingerir (``readable`` es False).
+Columnas ausentes y filas con otro número de campos son avisos
+(``problems``): el drop se lee y la validación manda esas filas a cuarentena.
+
+``rows`` son las líneas no vacías sin la cabecera: exacto salvo si hay campos
+entre comillas con saltos de línea, y en ese caso ``splittable`` es False
+porque partir por bytes cortaría filas. ``ranges`` permite a ``run.py
+--workers`` parsear un drop grande en varios procesos.
+
+Uso (desde project/):
+  python ingest/prescan.py                     # todos los drops de data/drops
+  python ingest/prescan.py data/drops/a.csv --parts 4
+"""
+import csv
+import io
+import json
+import mmap
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+DELIMITADORES = [",", ";", "\t", "|"]
+# columnas sin las que un CSV de ventas no se puede validar
+OBLIGATORIAS = ["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario"]
+# bytes de muestra del principio y del final del fichero
+MUESTRA = 1 << 16
+# tramo de conteo de saltos de línea
+TRAMO = 1 << 26
+_COMA_DECIMAL = re.compile(r"^-?\d+,\d+$")
+
+
+@dataclass(frozen=True)
+class Prescan:
+    """Resultado del pre-escaneo de un drop.
+
+    Args:
+        path: fichero
+        size_bytes: tamaño en bytes
+        lines: saltos de línea del fichero (más uno si la última línea no termina en salto)
+        rows: filas de datos estimadas (líneas no vacías sin la cabecera)
+        header: nombres de columna (claves del primer objeto en NDJSON)
+        data_offset: byte en el que empiezan los datos (tras la cabecera en CSV)
+        delimiter: delimitador del CSV (None en NDJSON)
+        decimal: separador decimal de los importes ("." o ",")
+        splittable: si se puede partir por bytes en fin de línea sin cortar filas
+        problems: avisos de forma (columnas ausentes, filas con otro número de campos)
+        errors: motivos por los que el fichero no se puede leer
+        ragged: si alguna línea de la muestra tiene otro número de campos que la cabecera
+    """
+    path: Path
+    size_bytes: int
+    lines: int = 0
+    rows: int = 0
+    header: list[str] = field(default_factory=list)
+    data_offset: int = 0
+    delimiter: Optional[str] = None
+    decimal: str = "."
+    splittable: bool = False
+    problems: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    ragged: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems and not self.errors
+
+    @property
+    def readable(self) -> bool:
+        return not self.errors
+
+    def ranges(self, parts: int) -> list[tuple[int, int]]:
+        """Hasta `parts` rangos [inicio, fin) de bytes de datos, cada uno con líneas completas."""
+        if not self.splittable or parts <= 1 or self.size_bytes <= self.data_offset:
+            return [(self.data_offset, self.size_bytes)]
+        cortes = [self.data_offset]
+        with self.path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            datos = self.size_bytes - self.data_offset
+            for k in range(1, parts):
+                objetivo = self.data_offset + datos * k // parts
+                salto = mm.find(b"\n", max(objetivo, cortes[-1]))
+                if salto < 0 or salto + 1 >= self.size_bytes:
+                    break
+                if salto + 1 > cortes[-1]:
+                    cortes.append(salto + 1)
+        cortes.append(self.size_bytes)
+        return list(zip(cortes[:-1], cortes[1:]))
+
+
+def _count_lines(mm: mmap.mmap) -> tuple[int, int]:
+    """Saltos de línea y líneas en blanco ("\\n\\n") del fichero, por tramos."""
+    saltos = vacias = 0
+    previo = b""
+    for ini in range(0, len(mm), TRAMO):
+        tramo = mm[ini:ini + TRAMO]
+        saltos += tramo.count(b"\n")
+        # una línea en blanco puede quedar partida entre dos tramos
+        vacias += (previo + tramo[:1]).count(b"\n\n") + tramo.count(b"\n\n") + tramo.count(b"\n\r\n")
+        previo = tramo[-1:]
+    return saltos, vacias
+
+
+def _decode(muestra: bytes, errores: list[str]) -> str:
+    if b"\x00" in muestra:
+        errores.append("contiene bytes NUL (¿fichero binario?)")
+    try:
+        return muestra.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(muestra) - 3:  # no es sólo un carácter cortado al final de la muestra
+            errores.append("no es UTF-8 válido")
+        return muestra[:e.start].decode("utf-8")
+
+
+def _rows(muestras: list[str], delimitador: str) -> list[list[str]]:
+    """Filas no vacías de las muestras (un campo entre comillas puede ocupar varias líneas)."""
+    return [f for m in muestras for f in csv.reader(io.StringIO(m), delimiter=delimitador) if f]
+
+
+def _sniff_delimiter(cabecera: str, muestras: list[str]) -> Optional[str]:
+    """Delimitador con el que la cabecera y la muestra tienen el mismo número de campos (>1)."""
+    mejor, aciertos = None, -1
+    for d in DELIMITADORES:
+        campos = len(next(csv.reader([cabecera], delimiter=d)))
+        if campos < 2:
+            continue
+        iguales = sum(len(fila) == campos for fila in _rows(muestras, d))
+        if iguales > aciertos:
+            mejor, aciertos = d, iguales
+    return mejor
+
+
+def _sample(texto_ini: str, texto_fin: str, completo: bool) -> tuple[str, list[str]]:
+    """Primera línea y muestras de líneas completas del principio y del final."""
+    cabecera, _, cuerpo = texto_ini.partition("\n")
+    if not completo:
+        # la muestra del principio acaba a mitad de línea y la del final empieza a mitad de otra
+        cuerpo = cuerpo.rpartition("\n")[0]
+        texto_fin = texto_fin.partition("\n")[2]
+    return cabecera.rstrip("\r"), [cuerpo, texto_fin]
+
+
+def _scan_csv(cabecera: str, muestras: list[str], required: list[str], problemas: list[str]) -> dict:
+    delimitador = _sniff_delimiter(cabecera, muestras)
+    if delimitador is None:
+        problemas.append("no se reconoce el delimitador (la cabecera tiene un solo campo)")
+        return {"header": [cabecera.strip()], "delimiter": None, "ragged": False}
+    header = [c.strip() for c in next(csv.reader([cabecera], delimiter=delimitador))]
+    faltan = [c for c in required if c not in header]
+    if faltan:
+        problemas.append(f"faltan columnas: {', '.join(faltan)}")
+    filas = _rows(muestras, delimitador)
+    distintas = sum(len(f) != len(header) for f in filas)
+    if distintas:
+        problemas.append(f"{distintas} de {len(filas)} líneas de muestra con un número de campos distinto de la cabecera")
+    decimal = "."
+    if "precio_unitario" in header:
+        i = header.index("precio_unitario")
+        precios = [f[i].strip() for f in filas if len(f) > i and f[i].strip()]
+        if precios and sum(bool(_COMA_DECIMAL.match(p)) for p in precios) * 2 > len(precios):
+            decimal = ","
+    return {"header": header, "delimiter": delimitador, "decimal": decimal, "ragged": bool(distintas),
+            "quotes": any("\n" in c or "\r" in c for f in filas for c in f)}
+
+
+def _scan_ndjson(cabecera: str, muestras: list[str], errores: list[str]) -> dict:
+    lineas = [l for l in [cabecera] + [l for m in muestras for l in m.splitlines()] if l.strip()]
+    header, malas = [], 0
+    for l in lineas:
+        try:
+            obj = json.loads(l)
+        except ValueError:
+            malas += 1
+            continue
+        if not isinstance(obj, dict):
+            malas += 1
+        elif not header:
+            header = list(obj)
+    if malas:
+        errores.append(f"{malas} de {len(lineas)} líneas de muestra no son objetos JSON")
+    return {"header": header}
+
+
+def scan(path: Path, required: list[str] = OBLIGATORIAS) -> Prescan:
+    """Pre-escanea un drop CSV o NDJSON sin parsearlo.
+
+    Args:
+        path: fichero del drop
+        required: columnas que debe tener un CSV (si faltan, se anota como problema)
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    if size == 0:
+        return Prescan(path, 0, errors=["fichero vacío"])
+    problemas: list[str] = []
+    errores: list[str] = []
+    with path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        saltos, vacias = _count_lines(mm)
+        lineas = saltos + (mm[-1:] != b"\n")
+        texto_ini = _decode(mm[:MUESTRA], errores)
+        texto_fin = _decode(mm[max(MUESTRA, size - MUESTRA):], []) if size > MUESTRA else ""
+        fin_cabecera = mm.find(b"\n") + 1 or size
+    cabecera, muestras = _sample(texto_ini.lstrip("\ufeff"), texto_fin, completo=size <= MUESTRA)
+
+    if path.suffix.lower() in (".ndjson", ".jsonl"):
+        info = _scan_ndjson(cabecera, muestras, errores)
+        return Prescan(path, size, lineas, lineas - vacias, info["header"], 0, splittable=True, problems=problemas,
+                       errors=errores)
+    info = _scan_csv(cabecera, muestras, required, problemas)
+    return Prescan(
+        path, size, lineas, max(0, lineas - vacias - 1), info["header"], fin_cabecera,
+        delimiter=info["delimiter"], decimal=info.get("decimal", "."),
+        splittable=info["delimiter"] is not None and not info.get("quotes", False),
+        problems=problemas, errors=errores, ragged=info["ragged"],
+    )
+
+
+def read_range(path: Path, data_offset: int, rango: tuple[int, int]) -> io.BytesIO:
+    """Cabecera (si la hay) + los bytes de `rango`, listos para pd.read_csv, pd.read_json o pyarrow.csv."""
+    inicio, fin = rango
+    with path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return io.BytesIO(mm[:data_offset] + mm[inicio:fin])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-escanear drops con mmap (líneas, cabecera, delimitador, rangos)")
+    parser.add_argument("files", nargs="*", type=Path, help="Drops a escanear (por defecto, todos los de data/drops)")
+    parser.add_argument("--parts", type=int, default=1, help="Rangos de bytes en que partir cada fichero")
+    args = parser.parse_args()
+
+    drops = Path(__file__).resolve().parents[1] / "data" / "drops"
+    files = args.files or sorted(p for p in drops.iterdir() if p.suffix.lower() in (".csv", ".ndjson", ".jsonl"))
+    for f in files:
+        info = scan(f)
+        delimitador = {"\t": "\\t", None: "—"}.get(info.delimiter, info.delimiter)
+        estado = "OK" if info.ok else ("ILEGIBLE: " if info.errors else "AVISOS: ") + "; ".join(info.errors + info.problems)
+        print(f"{f.name}: {info.size_bytes} bytes · {info.rows} filas · delimitador {delimitador} · "
+              f"decimal {info.decimal} · {estado}")
+        if args.parts > 1:
+            for inicio, fin in info.ranges(args.parts):
+                print(f"  [{inicio}, {fin})")
@@ -0,0 +1,69 @@
+"""Cuarentena en SQLite: filas rechazadas con una máscara de bits de motivos.
+
+Cada fila de ``quarantine_ventas`` guarda los campos crudos, su linaje y
+``_reason_bits``, la máscara que calcula ``validation.REGLAS`` (bit i = i-ésima
+regla). Los textos de los motivos están una sola vez en ``quarantine_reasons``
+(bit, mask, reason), que se sincroniza con el registro de reglas en cada
+ejecución. Contar motivos no parte textos fila a fila: la vista
+``quarantine_motivos`` (sql/20_views.sql) agrupa por ``_reason_bits`` sobre su
+índice (pocas combinaciones distintas) y reparte cada combinación en sus bits.
+
+El CSV output/quality/ventas_invalidas.csv se sigue escribiendo, con los
+motivos en texto, como exportación legible.
+"""
+import sqlite3
+from collections import Counter
+from typing import Optional
+
+import pandas as pd
+
+try:
+    from . import sqlite_profile, validation
+except ImportError:
+    import sqlite_profile
+    import validation
+
+COLS = ["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_reason_bits", "_ingest_ts",
+        "_source_file"]
+
+
+def migrate_legacy(con: sqlite3.Connection) -> None:
+    """Sustituye la quarantine_ventas anterior (_reason, _row en texto) antes de aplicar 00_schema.sql.
+
+    El pipeline nunca escribió en ella: vacía se elimina; con filas se conserva
+    como quarantine_ventas_legacy.
+    """
+    columnas = {c for _, c, *_ in con.execute("PRAGMA table_info(quarantine_ventas)")}
+    if "_row" not in columnas:
+        return
+    if con.execute("SELECT EXISTS (SELECT 1 FROM quarantine_ventas)").fetchone()[0]:
+        con.execute("ALTER TABLE quarantine_ventas RENAME TO quarantine_ventas_legacy")
+    else:
+        con.execute("DROP TABLE quarantine_ventas")
+    # los índices de la tabla anterior se van con ella (o se quedan en la _legacy)
+    con.execute("DROP INDEX IF EXISTS idx_quarantine_ventas_batch")
+    con.execute("DROP INDEX IF EXISTS idx_quarantine_ventas_source")
+    con.commit()
+
+
+def sync_reasons(con: sqlite3.Connection, registro: Optional[validation.RegistroReglas] = None) -> None:
+    """Vuelca los motivos del registro de reglas en quarantine_reasons."""
+    registro = registro or validation.REGLAS
+    con.executemany(
+        "INSERT OR REPLACE INTO quarantine_reasons (bit, mask, reason) VALUES (?, ?, ?)",
+        [(bit, 1 << bit, motivo) for bit, motivo in enumerate(registro.motivos)],
+    )
+
+
+def write(quarantine: pd.DataFrame, con: sqlite3.Connection, batch_id: str) -> None:
+    """Carga en bloque las filas de cuarentena (COLS) con su _batch_id."""
+    if not quarantine.empty:
+        filas = quarantine[COLS].copy()
+        filas["_batch_id"] = batch_id
+        filas.to_sql("quarantine_ventas", con, if_exists="append", index=False,
+                     **sqlite_profile.to_sql_options(con, len(filas.columns)))
+
+
+def count(con: sqlite3.Connection) -> Counter:
+    """Filas de cuarentena por motivo, en el orden en que aparece cada motivo por primera vez."""
+    return Counter(dict(con.execute("SELECT reason, filas FROM quarantine_motivos ORDER BY primera, bit")))
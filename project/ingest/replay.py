@@ -0,0 +1,281 @@
+"""Rehace la plata y el oro de un batch a partir de su bronce, sin reingerir el resto.
+
+Uso (desde project/):
+  python ingest/replay.py --list                            # últimos batches (batch_runs)
+  python ingest/replay.py --batch 20250601T101500123456Z
+
+Para recuperarse de un drop malo o de una regla de validación corregida basta
+con rehacer su batch. Las filas crudas del batch (raw_ventas o el bronce
+compacto, ver bronze_store.py) se vuelven a validar, tipar y deduplicar con
+sus ``_ingest_ts`` originales (tabla ``batches``), así que "último gana" frente
+al resto del histórico no cambia. Sólo se usan las filas de los drops e
+``_ingest_ts`` que registró el batch, y tienen que ser tantas como sus
+``rows``; si no, el replay se detiene sin tocar nada:
+
+1. las filas de clean_ventas que ganaron con el batch (mismas fechas y un
+   ``_ingest_ts`` del batch) se retiran y se restan de los agregados
+   (``sql/12_replay_batch.sql``);
+2. las filas que vuelven a ser válidas entran con el UPSERT por lotes; para
+   las claves retiradas también las versiones de batches anteriores, que
+   pueden volver a ganar si la del batch ya no es válida (se buscan en el
+   bronce por los mismos valores crudos de fecha);
+3. la cuarentena del batch (quarantine_ventas y el CSV) se sustituye y el
+   manifiesto se actualiza con los nuevos recuentos;
+4. en el Parquet plata sólo se reescriben las particiones de esas fechas.
+
+El replay se registra como un batch más (``kind = 'replay'``) con sus métricas
+en run_metrics. reporte.md no se regenera: ``python ingest/report.py``.
+"""
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    from . import (arrow_io, batches, bronze_store, metrics, parquet_store, quarantine_store, run, sqlite_profile,
+                   validation)
+except ImportError:
+    import arrow_io
+    import batches
+    import bronze_store
+    import metrics
+    import parquet_store
+    import quarantine_store
+    import run
+    import sqlite_profile
+    import validation
+
+# las filas de raw_ventas anteriores a su columna nombre_producto toman el de dim_producto
+RAW_SQL = ("SELECT r.fecha, r.id_cliente, r.id_producto, COALESCE(r.nombre_producto, d.nombre_producto)"
+           " AS nombre_producto, r.unidades, r.precio_unitario, r._source_file, r._ingest_ts, r._batch_id"
+           " FROM raw_ventas AS r LEFT JOIN dim_producto AS d ON d.id_producto = r.id_producto")
+
+
+def _as_drop(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos de run.read_drop: texto (nulos como NaN) y CATEGORY_COLS y linaje como category."""
+    df = df.reindex(columns=run.BASE_COLS + bronze_store.LINEAGE)
+    for c in df.columns:
+        categoria = c in run.CATEGORY_COLS or c in bronze_store.LINEAGE
+        if not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category" if categoria else "str")
+        elif not categoria:
+            df[c] = df[c].astype("str")
+    return df
+
+
+def read_bronze(con: sqlite3.Connection, store: bronze_store.BronzeStore, batch_id: Optional[str] = None,
+                fechas: Optional[list[str]] = None, antes_de: Optional[str] = None) -> pd.DataFrame:
+    """Filas crudas de raw_ventas y del bronce compacto (un ut1.db puede tener batches en los dos).
+
+    Args:
+        con: conexión a ut1.db
+        store: bronce compacto
+        batch_id: sólo las filas de este batch
+        fechas: sólo las filas con estos valores crudos de fecha
+        antes_de: sólo las filas con _ingest_ts anterior a este
+
+    Returns:
+        DataFrame con BASE_COLS + linaje, en orden de llegada dentro de cada drop
+    """
+    condiciones, params = [], []
+    for condicion, valor in (("r._batch_id = ?", batch_id), ("r._ingest_ts < ?", antes_de)):
+        if valor is not None:
+            condiciones.append(condicion)
+            params.append(valor)
+    if fechas is not None:
+        condiciones.append(f"r.fecha IN ({', '.join('?' * len(fechas))})")
+        params += fechas
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    frames = [pd.read_sql(f"{RAW_SQL}{where} ORDER BY r.rowid", con, params=params),
+              store.read(con, batch_id, fechas=fechas, antes_de=antes_de)]
+    return arrow_io.concat_frames([_as_drop(f) for f in frames if len(f)] or [_as_drop(frames[0])])
+
+
+def lineage(con: sqlite3.Connection, batch_id: str) -> pd.DataFrame:
+    """Drops e _ingest_ts del batch (de raw_ventas si el batch es anterior a la tabla batches)."""
+    linaje = batches.lineage(con, batch_id)
+    if linaje.empty:
+        linaje = pd.read_sql("SELECT _source_file, _ingest_ts, COUNT(*) AS rows FROM raw_ventas WHERE _batch_id = ?"
+                             " GROUP BY _source_file, _ingest_ts ORDER BY MIN(rowid)", con, params=[batch_id])
+    return linaje
+
+
+def of_lineage(bronce: pd.DataFrame, linaje: pd.DataFrame, batch_id: str) -> pd.DataFrame:
+    """Filas de `bronce` con uno de los linajes (drop, _ingest_ts) del batch; deben ser las que registró.
+
+    Args:
+        bronce: filas crudas leídas por batch_id
+        linaje: drops del batch con su _ingest_ts y sus filas (ver lineage)
+        batch_id: batch que se rehace
+
+    Returns:
+        las filas de `bronce` del linaje, en el mismo orden
+    """
+    pares = pd.MultiIndex.from_frame(linaje[["_source_file", "_ingest_ts"]].astype(str))
+    propias = pd.MultiIndex.from_arrays([bronce[c].astype(str) for c in ("_source_file", "_ingest_ts")]).isin(pares)
+    bronce = bronce[propias].reset_index(drop=True)
+    esperadas = int(linaje["rows"].sum())
+    if len(bronce) != esperadas:
+        raise SystemExit(f"El bronce del batch {batch_id} tiene {len(bronce)} filas de su linaje y batches registra"
+                         f" {esperadas}; no se rehace")
+    return bronce
+
+
+def _fechas(df: pd.DataFrame) -> np.ndarray:
+    """Fecha (AAAA-MM-DD) de cada fila cruda, con el mismo parseo que la validación ("" si no es válida)."""
+    fechas = validation.convert(df["fecha"], "fecha")
+    return np.where(np.isnat(fechas), "", np.datetime_as_string(fechas, unit="D"))
+
+
+def _claves(df: pd.DataFrame) -> pd.MultiIndex:
+    """Clave natural como texto, comparable entre filas tipadas y filas leídas de SQLite."""
+    return pd.MultiIndex.from_arrays(
+        [df["fecha"].astype(str)] + [df[c].astype(object).where(df[c].notna(), "").astype(str) for c in run.KEY[1:]])
+
+
+def validate(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Filas limpias (tipadas y deduplicadas) y cuarentena de unas filas crudas, como en run.ingest_batch."""
+    _, clean, quarantine = run.split_valid(df)
+    if not clean.empty:
+        clean = run.dedup_last_wins(run.coerce_clean(clean))
+    return clean, quarantine
+
+
+def replay(batch_id: str) -> dict:
+    """Rehace la plata, el oro y la cuarentena de `batch_id` desde su bronce.
+
+    Returns:
+        recuentos: filas de bronce, filas retiradas de clean_ventas, filas del batch en
+        clean_ventas al terminar y cuarentena antes y después
+    """
+    perf = metrics.StageProfiler()
+    ROOT = Path(__file__).resolve().parents[1]
+    OUT = ROOT / "output"
+    DB = OUT / "ut1.db"
+    dataset = parquet_store.Dataset(OUT / "parquet" / "clean_ventas")
+    store = bronze_store.BronzeStore(OUT / "bronze")
+    quarantine_file = OUT / "quality" / "ventas_invalidas.csv"
+
+    with perf.stage("preparacion"):
+        con = sqlite_profile.connect(DB)
+        quarantine_store.migrate_legacy(con)
+        batches.migrate_legacy(con)
+        con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
+        quarantine_store.sync_reasons(con)
+        run.ensure_raw_columns(con)
+        linaje = lineage(con, batch_id)
+        if linaje.empty:
+            raise SystemExit(f"El batch {batch_id} no tiene filas de bronce (¿id correcto? python ingest/replay.py --list)")
+        stamps = linaje["_ingest_ts"].tolist()
+
+    with perf.stage("bronce") as etapa:
+        bronce = of_lineage(read_bronze(con, store, batch_id), linaje, batch_id)
+        etapa.rows += len(bronce)
+    batch = batches.open_batch(con, "replay", replay_of=batch_id)
+    with perf.stage("validacion", rows=len(bronce)):
+        fechas_bronce = _fechas(bronce)
+        clean, quarantine = validate(bronce)
+
+    # filas de clean_ventas que ganaron con el batch: en sus fechas y con uno de sus _ingest_ts
+    with perf.stage("plata_previa") as etapa:
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS replay_fechas (fecha TEXT PRIMARY KEY)")
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS replay_ts (_ingest_ts TEXT PRIMARY KEY)")
+        con.executemany("INSERT OR IGNORE INTO replay_fechas VALUES (?)", [(f,) for f in set(fechas_bronce) - {""}])
+        con.executemany("INSERT OR IGNORE INTO replay_ts VALUES (?)", [(t,) for t in stamps])
+        con.execute("DROP TABLE IF EXISTS temp.replay_clean_ventas")
+        con.execute(
+            "CREATE TEMP TABLE replay_clean_ventas AS"
+            " SELECT fecha, id_cliente, id_producto, unidades, precio_unitario, _ingest_ts FROM clean_ventas"
+            " WHERE fecha IN (SELECT fecha FROM replay_fechas) AND _ingest_ts IN (SELECT _ingest_ts FROM replay_ts)")
+        retiradas = pd.read_sql("SELECT fecha, id_cliente, id_producto FROM replay_clean_ventas", con)
+        etapa.rows += len(retiradas)
+
+        # versiones anteriores de las claves retiradas, por si la del batch ya no es válida
+        previas = pd.DataFrame()
+        if len(retiradas):
+            fechas_retiradas = set(retiradas["fecha"])
+            crudas = set(bronce["fecha"][np.isin(fechas_bronce, list(fechas_retiradas))].dropna())
+            candidatas = read_bronze(con, store, fechas=sorted(crudas | fechas_retiradas), antes_de=min(stamps))
+            if len(candidatas):
+                previas, _ = validate(candidatas)
+                if len(previas):
+                    previas = previas[_claves(previas).isin(_claves(retiradas))]
+        etapa.rows += len(previas)
+
+    with perf.stage("dedup", rows=len(clean) + len(previas)):
+        nuevas = [f for f in (previas, clean) if len(f)]
+        filas = run.dedup_last_wins(arrow_io.concat_frames(nuevas)) if nuevas else clean
+
+    # Parquet plata: sólo las particiones de las filas retiradas o nuevas
+    with perf.stage("parquet", rows=len(filas)), dataset.writer() as parts:
+        parts.add(filas)
+        particiones = {int(f[:4]) * 100 + int(f[5:7]) for f in retiradas["fecha"]}
+        parts.commit(run.dedup_last_wins, drop=pc.field("_ingest_ts").isin(pa.array(stamps, pa.string())),
+                     also=particiones)
+
+    antes = con.execute("SELECT COUNT(*) FROM quarantine_ventas WHERE _batch_id = ?", (batch_id,)).fetchone()[0]
+    with con.transaccion():
+        with perf.stage("upsert", rows=len(retiradas) + len(filas)):
+            for sentencia in run.sql_statements((ROOT / "sql" / "12_replay_batch.sql").read_text(encoding="utf-8")):
+                con.execute(sentencia)
+            if len(filas):
+                run.upsert_clean(filas, con, (ROOT / "sql" / "11_upsert_bulk.sql").read_text(encoding="utf-8"))
+        with perf.stage("cuarentena", rows=len(quarantine)):
+            con.execute("DELETE FROM quarantine_ventas WHERE _batch_id = ?", (batch_id,))
+            if quarantine_file.exists():
+                previa = pd.read_csv(quarantine_file, dtype=str, keep_default_na=False)
+                previa[~previa["_ingest_ts"].isin(stamps)].to_csv(quarantine_file, index=False)
+            else:
+                quarantine_file.write_text(",".join(run.QCOLS) + "\n", encoding="utf-8")
+            run.write_quarantine(quarantine, quarantine_file, con, batch_id)
+        with perf.stage("manifiesto", rows=len(linaje)):
+            por_fichero = quarantine["_source_file"].value_counts()
+            for f in linaje["_source_file"]:
+                n = int(por_fichero.get(f, 0))
+                con.execute("UPDATE ingest_manifest SET rows_quarantine = ?, rows_clean = rows_raw - ?"
+                            " WHERE source_file = ? AND _batch_id = ?", (n, n, f, batch_id))
+            con.commit()
+    con.execute("DROP TABLE temp.replay_clean_ventas")
+    ganan = con.execute("SELECT COUNT(*) FROM clean_ventas WHERE fecha IN (SELECT fecha FROM replay_fechas)"
+                        " AND _ingest_ts IN (SELECT _ingest_ts FROM replay_ts)").fetchone()[0]
+    batches.close_batch(con, batch, len(linaje), len(bronce), len(quarantine))
+    perf.save(DB, batch.batch_id)
+    con.close()
+
+    recuentos = {"bronce": len(bronce), "retiradas": len(retiradas), "plata": ganan,
+                 "cuarentena_antes": antes, "cuarentena": len(quarantine)}
+    print(f"OK · Replay del batch {batch_id} (batch {batch.batch_id}) · {len(linaje)} drops · "
+          f"{perf.total().wall_s:.2f} s")
+    print(f"OK · Bronce: {len(bronce)} filas · plata del batch: {len(retiradas)} -> {ganan} filas · "
+          f"cuarentena: {antes} -> {len(quarantine)} filas")
+    print("OK · Reporte: python ingest/report.py")
+    return recuentos
+
+
+def list_batches(limit: int = 20) -> pd.DataFrame:
+    """Últimos batches de ut1.db con sus recuentos."""
+    ROOT = Path(__file__).resolve().parents[1]
+    con = sqlite3.connect(ROOT / "output" / "ut1.db")
+    con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
+    df = batches.runs(con, limit)
+    con.close()
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rehacer la plata y el oro de un batch desde su bronce")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--batch", help="Batch a rehacer (_batch_id)")
+    grupo.add_argument("--list", action="store_true", help="Listar los últimos batches")
+    args = parser.parse_args()
+
+    if args.list:
+        print(list_batches().to_string(index=False))
+    else:
+        replay(args.batch)
@@ -0,0 +1,147 @@
+"""Regenera output/reporte.md sólo a partir del estado persistido, sin ingerir.
+
+Uso (desde project/):
+  python ingest/report.py                          # agregados si bastan, si no Parquet
+  python ingest/report.py --top 10 --dias 7
+  python ingest/report.py --max-precio 120 --desde 2025-03-01 --hasta 2025-03-31
+  python ingest/report.py --fuente parquet
+
+Con ``--fuente auto`` (por defecto) el reporte sale de los agregados
+materializados de ut1.db (agg_ventas_*, dim_producto) cuando dan el mismo
+resultado que las filas: sin ventana de fechas (el agregado por producto no
+tiene fecha), con los agregados al día (mismas líneas que filas en el Parquet)
+y con las estadísticas de los row groups del Parquet garantizando que ningún
+precio supera el máximo y que no hay nulos que cambien los grupos. Si no, lee
+el Parquet plata con proyección y filtros (run.read_report) y calcula los KPIs
+con kpis.compute; en ningún caso se vuelve a validar ni a cargar SQLite.
+"""
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+try:
+    from . import kpis, parquet_store, quarantine_store, run
+except ImportError:
+    import kpis
+    import parquet_store
+    import quarantine_store
+    import run
+
+FUENTES = ["auto", "agregados", "parquet"]
+
+
+def choose_source(con: sqlite3.Connection, dataset: parquet_store.Dataset, max_precio: float,
+                  desde: Optional[date] = None, hasta: Optional[date] = None) -> tuple[str, str]:
+    """Decide si el reporte puede salir de los agregados.
+
+    Returns:
+        ("agregados" o "parquet", motivo)
+    """
+    if desde or hasta:
+        return "parquet", "ventana de fechas"
+    lineas = con.execute("SELECT TOTAL(lineas) FROM agg_ventas_diarias").fetchone()[0]
+    if not lineas:
+        return "parquet", "agregados vacíos"
+    sin_nombre = con.execute(
+        "SELECT EXISTS (SELECT 1 FROM agg_ventas_producto a LEFT JOIN dim_producto d USING (id_producto)"
+        " WHERE a.id_producto <> '' AND d.id_producto IS NULL)"
+    ).fetchone()[0]
+    if sin_nombre:
+        return "parquet", "productos sin nombre en dim_producto (ut1.db anterior)"
+    if not dataset.exists():
+        return "agregados", "sin Parquet plata"
+    if int(lineas) != dataset.num_rows():
+        return "parquet", "agregados y Parquet con distinto número de filas"
+    precio = dataset.column_stats("precio_unitario")
+    if precio is None or precio[1] is None or precio[1] > max_precio or precio[2]:
+        return "parquet", f"precios por encima de {max_precio:g} o nulos"
+    for columna in ("unidades", "id_producto", "nombre_producto"):
+        stats = dataset.column_stats(columna)
+        if stats is None or stats[2]:
+            return "parquet", f"nulos en {columna}"
+    return "agregados", f"estadísticas del Parquet: precio máximo {precio[1]:g}"
+
+
+def quality_lines(con: sqlite3.Connection, dataset: parquet_store.Dataset) -> list[str]:
+    """Líneas de "Calidad y cobertura" con los totales acumulados del manifiesto."""
+    bronce, cuarentena, drops, ultimo = con.execute(
+        "SELECT TOTAL(rows_raw), TOTAL(rows_quarantine), COUNT(*), MAX(_batch_id) FROM ingest_manifest"
+    ).fetchone()
+    return [
+        f"Filas bronce: {int(bronce)} · Plata: {dataset.num_rows()} · Cuarentena: {int(cuarentena)}",
+        f"Drops en el manifiesto: {drops} · último batch: {ultimo or '—'}",
+    ]
+
+
+def main(fuente: str = "auto", top_n: int = 5, dias: int = 20, max_precio: float = run.MAX_PRECIO_REPORTE,
+         desde: Optional[date] = None, hasta: Optional[date] = None) -> str:
+    """Construye el reporte desde ut1.db y el Parquet plata.
+
+    Args:
+        fuente: "auto", "agregados" (sólo ut1.db) o "parquet"
+        top_n: productos del top
+        dias: días del resumen diario
+        max_precio: precio máximo de las filas del top y del resumen diario
+        desde: si se indica, sólo ventas desde esta fecha (inclusive; fuerza Parquet)
+        hasta: si se indica, sólo ventas hasta esta fecha (inclusive; fuerza Parquet)
+
+    Returns:
+        fuente usada ("agregados" o "parquet")
+    """
+    ROOT = Path(__file__).resolve().parents[1]
+    OUT = ROOT / "output"
+    DB = OUT / "ut1.db"
+    dataset = parquet_store.Dataset(OUT / "parquet" / "clean_ventas")
+
+    t0 = time.perf_counter()
+    con = sqlite3.connect(DB)
+    quarantine_store.migrate_legacy(con)
+    con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
+    quarantine_store.sync_reasons(con)
+    con.executescript((ROOT / "sql" / "20_views.sql").read_text(encoding="utf-8"))
+    if fuente == "auto":
+        fuente, motivo = choose_source(con, dataset, max_precio, desde, hasta)
+    else:
+        motivo = "elegida con --fuente"
+
+    if fuente == "agregados":
+        k = kpis.from_aggregates(con, top_n, dias)
+        origen = "agregados agg_ventas_* (SQLite)"
+    else:
+        k = kpis.compute(*run.read_report(dataset, desde, hasta, max_precio), max_precio=max_precio,
+                         top_n=top_n, dias=dias)
+        origen = "clean_ventas (Parquet)"
+    report = run.render_report(
+        k,
+        calidad=quality_lines(con, dataset),
+        persistencia=run.persistence_lines(dataset, DB),
+        razones=quarantine_store.count(con),
+        fuente=origen,
+        max_precio=max_precio,
+    )
+    con.close()
+
+    (OUT / "reporte.md").write_text(report, encoding="utf-8")
+    print(f"OK · Generado: {OUT / 'reporte.md'} · fuente: {fuente} ({motivo}) · "
+          f"{1000 * (time.perf_counter() - t0):.0f} ms")
+    return fuente
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Regenerar reporte.md desde los agregados o el Parquet plata")
+    parser.add_argument("--fuente", choices=FUENTES, default="auto",
+                        help="Origen de los KPIs (auto: agregados si dan el mismo resultado)")
+    parser.add_argument("--top", type=int, default=5, help="Productos del top")
+    parser.add_argument("--dias", type=int, default=20, help="Días del resumen diario")
+    parser.add_argument("--max-precio", type=float, default=run.MAX_PRECIO_REPORTE,
+                        help="Precio máximo de las filas del top y del resumen diario")
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="Reporte desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=None, help="Reporte hasta esta fecha (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    main(fuente=args.fuente, top_n=args.top, dias=args.dias, max_precio=args.max_precio,
+         desde=args.desde, hasta=args.hasta)
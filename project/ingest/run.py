@@ -1,661 +1,776 @@
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+import tempfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import sqlite3
 
+try:
+    from . import (arrow_io, batches, bronze_store, dedup, kpis, manifest, metrics, parquet_store, prescan,
+                   quarantine_store, sqlite_profile, streaming, validation)
+except ImportError:
+    import arrow_io
+    import batches
+    import bronze_store
+    import dedup
+    import kpis
+    import manifest
+    import metrics
+    import parquet_store
+    import prescan
+    import quarantine_store
+    import sqlite_profile
+    import streaming
+    import validation
+
+
+BASE_COLS = ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario"]
+CLEAN_COLS = BASE_COLS + ["_source_file", "_ingest_ts"]
+RAW_COLS = ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario", "_ingest_ts",
+            "_source_file"]
+QCOLS = ["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_source_file", "_ingest_ts", "_reason"]
+KEY = ["fecha", "id_cliente", "id_producto"]
+# pocas claves distintas (500 clientes, 200 productos en get_data): category de principio a fin
+CATEGORY_COLS = ["id_cliente", "id_producto", "nombre_producto"]
+# columnas que usa el reporte y precio máximo de las filas que entran en sus tablas
+REPORT_COLS = ["fecha", "id_producto", "nombre_producto", "precio_unitario", "importe"]
+MAX_PRECIO_REPORTE = 150
+STAGE_COLS = ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario", "_ingest_ts"]
+STAGE_DDL = (
+    "CREATE TEMP TABLE IF NOT EXISTS stage_clean_ventas("
+    "fecha TEXT, id_cliente TEXT, id_producto TEXT, nombre_producto TEXT, unidades REAL, precio_unitario REAL,"
+    " _ingest_ts TEXT)"
+)
+# con --workers, los drops de al menos este tamaño se parten en rangos de bytes (ver prescan.py)
+MIN_BYTES_RANGO = 32 << 20
 
-def main(regen_data: bool = False, regen_force: bool = False):
-    """Ejecuta la canalización: ingesta -> limpieza -> persistencia -> reporte.
 
-    Args:
-        regen_data: si es True, regenera los datos de ejemplo antes de ejecutar
-            (llama al helper generate_sample en get_data)
-        regen_force: si es True y regen_data es True, fuerza la sobrescritura del archivo de muestra
+def list_drops(data_dir: Path) -> list[Path]:
+    return sorted(data_dir.glob("*.csv")) + sorted(data_dir.glob("*.ndjson")) + sorted(data_dir.glob("*.jsonl"))
+
+
+def lineage_column(valor: str, n: int) -> pd.Categorical:
+    """Columna de linaje constante como category: un código int8 por fila en lugar de la cadena repetida."""
+    return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[valor])
+
+
+def missing_as_none(df: pd.DataFrame) -> pd.DataFrame:
+    """Añade como None las columnas obligatorias (prescan.OBLIGATORIAS) que el drop no trae.
+
+    La validación reproduce validate_row: None es un valor faltante, pero NaN
+    (lo que dejaría pd.concat al unir el drop con otros) cuenta como el texto
+    "nan" y pasaría las reglas de identificadores.
     """
-    ROOT = Path(__file__).resolve().parents[1]
-    DATA = ROOT / "data" / "drops"
-    OUT = ROOT / "output"
-    OUT.mkdir(parents=True, exist_ok=True)
-    (OUT / "parquet").mkdir(parents=True, exist_ok=True)
-    (OUT / "quality").mkdir(parents=True, exist_ok=True)
+    for c in prescan.OBLIGATORIAS:
+        if c not in df.columns:
+            df[c] = None
+    return df
 
-    if regen_data:
-        try:
-            from . import get_data
-        except Exception:
-            import project.ingest.get_data as get_data
-        # wrapper compatible
-        get_data.generate_sample(drop_dir=DATA, force=regen_force)
 
-    # 1) Ingesta
-    files = sorted(DATA.glob("*.csv")) + sorted(DATA.glob("*.ndjson")) + sorted(DATA.glob("*.jsonl"))
-    raw = []
-    for f in files:
-        if f.suffix.lower() == ".csv":
-            df = pd.read_csv(f, dtype=str)
-        else:  # ndjson/jsonl
-            df = pd.read_json(f, lines=True, dtype=str)
-        df["_source_file"] = f.name
-        df["_ingest_ts"] = datetime.now(timezone.utc).isoformat()
-        raw.append(df)
-
-    if raw:
-        raw_df = pd.concat(raw, ignore_index=True)
-    else:
-        cols = ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario", "_source_file", "_ingest_ts"]
-        raw_df = pd.DataFrame(columns=cols)
+def short_fields_as_none(df: pd.DataFrame) -> pd.DataFrame:
+    """En un CSV leído sin filtro de nulos, los campos que faltan en filas cortas pasan a None.
 
-    # 2) Limpieza (coerción de tipos + validación por filas + deduplicación)
-    def to_float_money(x):
-        try:
-            return float(str(x).replace(",", "."))
-        except Exception:
-            return None
+    Los campos vacíos quedan como NaN, igual que con el parser de C.
+    """
+    for c in df.columns:
+        col = df[c].astype(object)
+        faltan = col.isna().to_numpy()
+        col[(col == "").to_numpy()] = np.nan
+        col[faltan] = None
+        df[c] = col
+    return df
+
+
+def read_drop(f: Path, chunk_size: Optional[int] = None, ingest_ts: Optional[str] = None, engine: str = "pandas",
+              scan: Optional[prescan.Prescan] = None, rango: Optional[tuple[int, int]] = None):
+    """Lee un drop como texto y añade el linaje (_source_file, _ingest_ts).
+
+    Genera un único DataFrame, o bloques de `chunk_size` filas si se indica.
+    Todas las filas de un mismo fichero comparten _ingest_ts (por defecto,
+    batches.stamp() al empezar a leerlo); las dos columnas de linaje son
+    category con un único valor (ver lineage_column). Con engine="arrow" los CSV se leen con pyarrow
+    (columnas category, ver arrow_io.py); NDJSON siempre usa pandas. En todos
+    los casos CATEGORY_COLS llegan como category.
+
+    Con el pre-escaneo del fichero (`scan`) los CSV se leen con el delimitador
+    detectado y, si se indica `rango`, sólo se leen esos bytes de datos (más la
+    cabecera en CSV). Si el pre-escaneo ha visto filas con otro número de
+    campos (``scan.ragged``), el CSV se lee con el parser de Python de pandas:
+    los campos que faltan en las filas cortas son None y en las largas los de
+    más se juntan en el último, así que la validación las manda a cuarentena
+    en lugar de romper la lectura. Las columnas obligatorias que no trae el
+    drop también llegan como None (ver missing_as_none).
+    """
+    ingest_ts = ingest_ts or batches.stamp()
+    sep = scan.delimiter if scan is not None and scan.delimiter else ","
+    origen = prescan.read_range(f, scan.data_offset, rango) if rango is not None else f
+    ragged = scan is not None and scan.ragged
+    if engine == "arrow" and f.suffix.lower() == ".csv" and not ragged:
+        for df in arrow_io.read_csv(origen, chunk_size, delimiter=sep):
+            missing_as_none(df)
+            df["_source_file"] = lineage_column(f.name, len(df))
+            df["_ingest_ts"] = lineage_column(ingest_ts, len(df))
+            yield df
+        return
+    if f.suffix.lower() == ".csv":
+        tipos = defaultdict(lambda: str, {c: "category" for c in CATEGORY_COLS})
+        if ragged:
+            n = len(scan.header)
+            reader = pd.read_csv(origen, sep=sep, dtype=str, chunksize=chunk_size, engine="python", na_filter=False,
+                                 on_bad_lines=lambda campos: campos[:n - 1] + [sep.join(campos[n - 1:])])
+        else:
+            reader = pd.read_csv(origen, sep=sep, dtype=tipos, chunksize=chunk_size)
+    else:  # ndjson/jsonl
+        reader = pd.read_json(origen, lines=True, dtype=str, chunksize=chunk_size)
 
-    df = raw_df.copy()
-    for c in ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario"]:
+    if chunk_size is None:
+        chunks = [reader]
+    else:
+        chunks = reader
+    for df in chunks:
+        if ragged:
+            short_fields_as_none(df)
+        for c in CATEGORY_COLS:
+            if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+                df[c] = df[c].astype("category")
+        missing_as_none(df)
+        df["_source_file"] = lineage_column(f.name, len(df))
+        df["_ingest_ts"] = lineage_column(ingest_ts, len(df))
+        yield df
+    if chunk_size is not None:
+        reader.close()
+
+
+def split_valid(raw_df: pd.DataFrame):
+    """Valida las filas crudas y las separa.
+
+    Returns:
+        tuple: (bronce con _reason y _reason_bits, filas limpias sin tipar, cuarentena)
+    """
+    df = raw_df
+    for c in BASE_COLS:
         if c not in df.columns:
             df[c] = None
 
-    # validación a nivel de fila
-    def validate_row(r):
-        reasons = []
-        # fecha
-        try:
-            f = pd.to_datetime(r.get("fecha"), errors="coerce")
-            if pd.isna(f):
-                reasons.append("fecha inválida o faltante")
-        except Exception:
-            reasons.append("fecha inválida")
+    # validación vectorizada: cada regla se evalúa una vez por columna (ver validation.py)
+    bits = validation.REGLAS.validar(df)
+    df["_reason"] = validation.REGLAS.reason_text(bits)
+    df["_reason_bits"] = bits
+    valid_mask = bits == 0
+    return df, df.loc[valid_mask, CLEAN_COLS].copy(), df.loc[~valid_mask]
 
-        # id_cliente
-        idc = r.get("id_cliente")
-        if idc is None or str(idc).strip() == "":
-            reasons.append("id_cliente faltante")
 
-        # id_producto
-        idp = r.get("id_producto")
-        if idp is None or str(idp).strip() == "":
-            reasons.append("id_producto faltante")
+def coerce_clean(clean: pd.DataFrame) -> pd.DataFrame:
+    """Coerción de tipos para el dataset limpio.
 
-        # unidades
-        try:
-            u = float(str(r.get("unidades")))
-            if u < 0:
-                reasons.append("unidades negativas")
-            if u == 0:
-                reasons.append("unidades cero")
-        except Exception:
-            reasons.append("unidades no numéricas")
+    unidades y precio se convierten una vez por valor distinto con los mismos
+    derivados que la validación (float64 en todos los modos, también con
+    columnas category).
+    """
+    clean["fecha"] = pd.to_datetime(clean["fecha"], errors="coerce").dt.date
+    clean["unidades"] = validation.convert(clean["unidades"], "numero")
+    clean["precio_unitario"] = validation.convert(clean["precio_unitario"], "importe")
+    return clean
 
-        # precio
-        try:
-            p = to_float_money(r.get("precio_unitario"))
-            if p is None:
-                reasons.append("precio no numérico o faltante")
-            elif p < 0:
-                reasons.append("precio negativo")
-        except Exception:
-            reasons.append("precio inválido")
 
-        is_valid = len(reasons) == 0
-        return is_valid, "; ".join(reasons)
+def dedup_last_wins(clean: pd.DataFrame) -> pd.DataFrame:
+    """Deduplicación por clave natural, "último gana" por _ingest_ts.
 
-    validated = raw_df.apply(lambda row: validate_row(row), axis=1)
-    valid_mask = [v[0] for v in validated]
-    reasons = [v[1] for v in validated]
+    A igual _ingest_ts gana la última fila leída. Se resuelve con la clave
+    codificada como entero (dedup.last_wins), sin ordenar; las filas que quedan
+    conservan su orden de llegada.
+    """
+    clean = clean[dedup.last_wins(clean, KEY)].copy()
+    clean["importe"] = clean["unidades"] * clean["precio_unitario"]
+    return clean
 
-    df["_reason"] = reasons
-    quarantine = df.loc[[not v for v in valid_mask]].copy()
-    clean = df.loc[valid_mask].copy()
 
-    if not clean.empty:
-        # coercionar tipos para el dataset limpio
-        clean["fecha"] = pd.to_datetime(clean["fecha"], errors="coerce").dt.date
-        clean["unidades"] = pd.to_numeric(clean["unidades"], errors="coerce")
-        clean["precio_unitario"] = clean["precio_unitario"].apply(to_float_money)
+def count_reasons(quarantine: pd.DataFrame) -> Counter:
+    """Número de filas por motivo de cuarentena (de la máscara _reason_bits)."""
+    return Counter(validation.REGLAS.count(quarantine["_reason_bits"].to_numpy()))
 
-        clean = (clean.sort_values("_ingest_ts")
-                     .drop_duplicates(subset=["fecha", "id_cliente", "id_producto"], keep="last"))
-        clean["importe"] = clean["unidades"] * clean["precio_unitario"]
 
-    # 3) Persistencia: Parquet (fuente de reporte) + SQLite (opcional integrado)
-    # Guardar cuarentena con motivo
-    if not quarantine.empty:
-        qcols = [c for c in quarantine.columns if c in ["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_source_file", "_ingest_ts", "_reason"]]
-        quarantine[qcols].to_csv(OUT / "quality" / "ventas_invalidas.csv", index=False)
-    else:
-        (OUT / "quality" / "ventas_invalidas.csv").write_text("fecha,id_cliente,id_producto,unidades,precio_unitario,_source_file,_ingest_ts,_reason\n", encoding="utf-8")
+def new_stats() -> dict:
+    return {"bronce": 0, "plata": 0, "cuarentena": 0, "razones": Counter(), "ficheros": defaultdict(Counter)}
 
-    PARQUET_FILE = OUT / "parquet" / "clean_ventas.parquet"
-    if not clean.empty:
-        clean.to_parquet(PARQUET_FILE, index=False)
 
-    # SQLite
-    DB = OUT / "ut1.db"
-    con = sqlite3.connect(DB)
-    # DDL
-    con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
-    # RAW: escribir sólo las columnas que existen en el esquema para evitar conflictos
-    if not df.empty:
-        df_raw = df[["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_ingest_ts", "_source_file"]].copy()
-        df_raw["_batch_id"] = "demo"
-        df_raw.to_sql("raw_ventas", con, if_exists="append", index=False)
+def tally(stats: dict, df: pd.DataFrame, quarantine: pd.DataFrame, razones: Optional[Counter] = None) -> None:
+    """Acumula en `stats` los recuentos de un bloque, también por fichero (para el manifiesto)."""
+    stats["bronce"] += len(df)
+    stats["cuarentena"] += len(quarantine)
+    stats["razones"].update(count_reasons(quarantine) if razones is None else razones)
+    for clave, filas in (("bronce", df), ("cuarentena", quarantine)):
+        for nombre, n in filas["_source_file"].value_counts(sort=False).items():
+            stats["ficheros"][nombre][clave] += int(n)
 
-    # CLEAN via UPSERT (usa sql/10_upserts.sql)
-    if not clean.empty:
-        upsert_sql = (ROOT / "sql" / "10_upserts.sql").read_text(encoding="utf-8")
-        for _, r in clean.iterrows():
-            con.execute(
-                upsert_sql,
-                {
-                    "fecha": str(r["fecha"]),
-                    "idc": r["id_cliente"],
-                    "idp": r["id_producto"],
-                    "u": float(r["unidades"]),
-                    "p": float(r["precio_unitario"]),
-                    "ts": r["_ingest_ts"],
-                },
-            )
-        con.commit()
 
-    # Vistas
-    con.executescript((ROOT / "sql" / "20_views.sql").read_text(encoding="utf-8"))
-    con.close()
+def write_raw(df: pd.DataFrame, con: sqlite3.Connection, batch_id: str,
+              bronze: Optional[bronze_store.BronzeStore] = None) -> None:
+    """Bronce: en raw_ventas o, con `bronze`, en el bronce compacto (Parquet por batch).
 
-    # 4) Reporte releído desde PARQUET
-    if PARQUET_FILE.exists():
-        clean_rep = pd.read_parquet(PARQUET_FILE)
-    else:
-        clean_rep = pd.DataFrame(columns=["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario", "_ingest_ts", "importe"])  # include nombre_producto for shape
-
-    if not clean_rep.empty:
-        ingresos = float(clean_rep["importe"].sum())
-        trans = int(len(clean_rep))
-        ticket = float(ingresos / trans) if trans > 0 else 0.0
-
-        # filtrar por precio máximo
-        clean_for_report = clean[clean['precio_unitario'] <= 150]
-
-        # top productos (id + nombre si existe)
-        if "nombre_producto" in clean_for_report.columns:
-            top = (clean_for_report.groupby(["id_producto", "nombre_producto"], as_index=False)
-                       .agg(importe=("importe", "sum"))
-                       .sort_values("importe", ascending=False)
-                       .head(5))
-        else:
-            top = (clean_for_report.groupby("id_producto", as_index=False)
-                       .agg(importe=("importe", "sum"))
-                       .sort_values("importe", ascending=False)
-                       .head(5))
-        total_imp = top["importe"].sum() or 1.0
-        top["pct"] = (100 * top["importe"] / total_imp).round(0).astype(int).astype(str) + "%"
+    En los dos casos el _ingest_ts de cada drop queda registrado una vez en batches.
+    """
+    if bronze is not None:
+        bronze.write(df, con, batch_id)
+        return
+    # RAW: escribir sólo las columnas que existen en el esquema para evitar conflictos
+    if not df.empty:
+        batches.lineage_keys(con, df, batch_id)
+        df_raw = df[RAW_COLS].copy()
+        df_raw["_batch_id"] = batch_id
+        df_raw.to_sql("raw_ventas", con, if_exists="append", index=False,
+                      **sqlite_profile.to_sql_options(con, len(df_raw.columns)))
 
-        by_day = (clean_for_report.groupby("fecha", as_index=False)
-                          .agg(importe_total=("importe", "sum"),
-                               transacciones=("importe", "count"))
-                          .sort_values("fecha", ascending=False)
-                          .head(20))
-        periodo_ini = str(clean_rep["fecha"].min())
-        periodo_fin = str(clean_rep["fecha"].max())
-        producto_lider = top.iloc[0]["id_producto"] if not top.empty else "—"
-    else:
-        ingresos = 0.0
-        ticket = 0.0
-        trans = 0
-        top = pd.DataFrame(columns=["id_producto", "importe", "pct"]) if "nombre_producto" not in clean.columns else pd.DataFrame(columns=["id_producto", "nombre_producto", "importe", "pct"]) 
-        by_day = pd.DataFrame(columns=["fecha", "importe_total", "transacciones"])
-        periodo_ini = "—"
-        periodo_fin = "—"
-        producto_lider = "—"
 
-    # preparar insights para conclusiones dinámicas
-    try:
-        if not quarantine.empty and "_reason" in quarantine.columns:
-            razones = quarantine["_reason"].dropna().astype(str).str.split(";")
-            razones = razones.explode().str.strip()
-            top_raz = razones.value_counts().head(3)
-            razones_texto = "\n".join([f"  - {r}: {c} filas" for r, c in top_raz.items()])
-        else:
-            razones_texto = "  - (sin filas en cuarentena)"
-    except Exception:
-        razones_texto = "  - (no disponible)"
+def write_quarantine(quarantine: pd.DataFrame, quarantine_file: Path, con: sqlite3.Connection, batch_id: str) -> None:
+    """Cuarentena: quarantine_ventas en bloque (máscara de motivos) y el CSV con los motivos en texto."""
+    quarantine_store.write(quarantine, con, batch_id)
+    quarantine.reindex(columns=QCOLS).to_csv(quarantine_file, index=False, header=False, mode="a")
 
-    try:
-        count_above_150 = int((clean_rep["precio_unitario"] > 150).sum()) if "precio_unitario" in clean_rep.columns else 0
-    except Exception:
-        count_above_150 = 0
 
-    conclusiones = (
-        "## 7. Conclusiones\n"
-        f"- Reponer stock del producto líder ({producto_lider}) acorde a la demanda observada.\n"
-        "- Analizar las filas en cuarentena y corregir las fuentes/validaciones; causas principales:\n"
-        f"{razones_texto}\n"
-        f"- En el dataset limpio había {count_above_150} filas con precio > 150 € (se filtran en el reporte). Revisar la política de precios.\n"
-        "- Considerar particionado por fecha y compresión en Parquet para mejorar rendimiento y escalabilidad.\n"
-    )
+def sql_statements(script: str):
+    """Sentencias de un script SQL, para ejecutarlas con execute().
 
-    report = (
-        "# Reporte UT1 · Ventas\n"
-        f"**Periodo:** {periodo_ini} a {periodo_fin} · **Fuente:** clean_ventas (Parquet) · **Generado:** {datetime.now(timezone.utc).isoformat()}\n\n"
-        "## 1. Titular\n"
-        f"Ingresos totales {ingresos:.2f} €; producto líder: {producto_lider}.\n\n"
-        "## 2. KPIs\n"
-        f"- **Ingresos netos:** {ingresos:.2f} €\n"
-        f"- **Ticket medio:** {ticket:.2f} €\n"
-        f"- **Transacciones:** {trans}\n\n"
-        "## 3. Top productos\n"
-        f"{(top.to_markdown(index=False) if not top.empty else '_(sin datos)_')}\n\n"
-        "## 4. Resumen por día\n"
-        f"{(by_day.to_markdown(index=False) if not by_day.empty else '_(sin datos)_')}\n\n"
-        "## 5. Calidad y cobertura\n"
-        f"- Filas bronce: {len(df)} · Plata: {len(clean)} · Cuarentena: {len(quarantine)}\n\n"
-        "## 6. Persistencia\n"
-        f"- Parquet: {PARQUET_FILE}\n"
-        f"- SQLite : {DB} (tablas: raw_ventas, clean_ventas; vista: ventas_diarias)\n\n"
-        f"{conclusiones}\n"
-    )
+    A diferencia de executescript(), no confirma la transacción en curso.
+    """
+    sentencia = ""
+    for linea in script.splitlines(keepends=True):
+        sentencia += linea
+        if sqlite3.complete_statement(sentencia):
+            yield sentencia
+            sentencia = ""
 
-    (OUT / "reporte.md").write_text(report, encoding="utf-8")
-    print("OK · Generado:", OUT / "reporte.md")
-    print("OK · Parquet :", PARQUET_FILE if PARQUET_FILE.exists() else "sin datos")
-    print("OK · SQLite  :", DB)
 
+@lru_cache(maxsize=None)
+def cached_statements(script: str) -> tuple[str, ...]:
+    """sql_statements de `script`, partido una sola vez por proceso.
 
-if __name__ == "__main__":
-    import argparse
+    Con los mismos textos, sqlite3 reutiliza en cada conexión las sentencias ya
+    compiladas (caché de ``cached_statements``): en una conexión que se mantiene
+    abierta (ingest/watch.py) el UPSERT no se vuelve a preparar en cada drop.
+    """
+    return tuple(sql_statements(script))
 
-    parser = argparse.ArgumentParser(description="Ejecutar pipeline de ingesta, limpieza y reporte")
-    parser.add_argument("--regen-data", action="store_true", help="Regenerar datos de ejemplo antes de ejecutar")
-    parser.add_argument("--force", action="store_true", help="Forzar sobrescritura al regenerar los datos de ejemplo")
-    args = parser.parse_args()
 
-    main(regen_data=args.regen_data, regen_force=args.force)
+def ensure_raw_columns(con: sqlite3.Connection) -> None:
+    """Añade a un raw_ventas anterior las columnas de RAW_COLS que le faltan (nombre_producto)."""
+    columnas = {fila[1] for fila in con.execute("PRAGMA table_info(raw_ventas)")}
+    for c in RAW_COLS:
+        if c not in columnas:
+            con.execute(f"ALTER TABLE raw_ventas ADD COLUMN {c} TEXT")
+    con.commit()
 
 
-ejecutar = main
-from pathlib import Path
-from datetime import datetime, timezone
-import pandas as pd
-import sqlite3
+def ensure_aggregates(con: sqlite3.Connection, rebuild_sql: str) -> None:
+    """Rellena los agregados materializados si están vacíos y clean_ventas no (ut1.db anteriores)."""
+    vacio = con.execute("SELECT NOT EXISTS (SELECT 1 FROM agg_ventas_diarias)").fetchone()[0]
+    if vacio and con.execute("SELECT EXISTS (SELECT 1 FROM clean_ventas)").fetchone()[0]:
+        for sentencia in sql_statements(rebuild_sql):
+            con.execute(sentencia)
+        con.commit()
 
 
-def main(regen_data: bool = False, regen_force: bool = False):
-    """Ejecuta la canalización: ingesta -> limpieza -> persistencia -> reporte.
+def upsert_clean(clean: pd.DataFrame, con: sqlite3.Connection, upsert_sql: str) -> None:
+    """CLEAN via UPSERT por lotes (usa sql/11_upsert_bulk.sql).
 
-    Args:
-        regen_data: si es True, regenera los datos de ejemplo antes de ejecutar
-            (llama al helper generate_sample en get_data)
-        regen_force: si es True y regen_data es True, fuerza la sobrescritura del archivo de muestra
+    Las filas se cargan con executemany en la tabla temporal stage_clean_ventas;
+    el script suma a los agregados (agg_ventas_*) los deltas de las filas que
+    ganan, actualiza dim_producto y las fusiona en clean_ventas con un único
+    INSERT ... SELECT ... ON CONFLICT.
     """
-    ROOT = Path(__file__).resolve().parents[1]
-    DATA = ROOT / "data" / "drops"
-    OUT = ROOT / "output"
-    OUT.mkdir(parents=True, exist_ok=True)
-    (OUT / "parquet").mkdir(parents=True, exist_ok=True)
-    (OUT / "quality").mkdir(parents=True, exist_ok=True)
+    nombres = clean["nombre_producto"].tolist() if "nombre_producto" in clean.columns else [None] * len(clean)
+    filas = zip(
+        clean["fecha"].astype(str).tolist(),
+        clean["id_cliente"].tolist(),
+        clean["id_producto"].tolist(),
+        nombres,
+        clean["unidades"].astype(float).tolist(),
+        clean["precio_unitario"].astype(float).tolist(),
+        clean["_ingest_ts"].tolist(),
+    )
+    con.execute(STAGE_DDL)
+    con.execute("DELETE FROM stage_clean_ventas")
+    con.executemany(f"INSERT INTO stage_clean_ventas ({', '.join(STAGE_COLS)}) VALUES (?, ?, ?, ?, ?, ?, ?)", filas)
+    for sentencia in cached_statements(upsert_sql):
+        con.execute(sentencia)
+    con.execute("DELETE FROM stage_clean_ventas")
+    con.commit()
 
-    if regen_data:
-        try:
-            from . import get_data
-        except Exception:
-            import project.ingest.get_data as get_data
-        get_data.generate_sample(drop_dir=DATA, force=regen_force)
 
-    # 1) Ingesta
-    files = sorted(DATA.glob("*.csv")) + sorted(DATA.glob("*.ndjson")) + sorted(DATA.glob("*.jsonl"))
-    raw = []
-    for f in files:
-        if f.suffix.lower() == ".csv":
-            df = pd.read_csv(f, dtype=str)
-        else:  # ndjson/jsonl
-            df = pd.read_json(f, lines=True, dtype=str)
-        df["_source_file"] = f.name
-        df["_ingest_ts"] = datetime.now(timezone.utc).isoformat()
-        raw.append(df)
-
-    if raw:
-        raw_df = pd.concat(raw, ignore_index=True)
-    else:
-        cols = ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario", "_source_file", "_ingest_ts"]
-        raw_df = pd.DataFrame(columns=cols)
+def upsert_clean_rows(clean: pd.DataFrame, con: sqlite3.Connection, upsert_sql: str) -> None:
+    """UPSERT fila a fila original (sql/10_upserts.sql); se conserva como referencia para benchmarks."""
+    for _, r in clean.iterrows():
+        con.execute(
+            upsert_sql,
+            {
+                "fecha": str(r["fecha"]),
+                "idc": r["id_cliente"],
+                "idp": r["id_producto"],
+                "u": float(r["unidades"]),
+                "p": float(r["precio_unitario"]),
+                "ts": r["_ingest_ts"],
+            },
+        )
+    con.commit()
 
-    # 2) Limpieza (coerción de tipos + validación por filas + deduplicación)
-    def to_float_money(x):
-        try:
-            return float(str(x).replace(",", "."))
-        except Exception:
-            return None
 
-    df = raw_df.copy()
-    for c in ["fecha", "id_cliente", "id_producto", "nombre_producto", "unidades", "precio_unitario"]:
-        if c not in df.columns:
-            df[c] = None
+def process_drop(f: Path, ingest_ts: str, engine: str = "pandas", scan: Optional[prescan.Prescan] = None,
+                 rango: Optional[tuple[int, int]] = None) -> dict:
+    """Lee, valida y tipa un drop completo (o un rango de bytes); pensado para ejecutarse en otro proceso.
 
-    # Realizaremos validación a nivel de fila y mantendremos una columna _reason para la cuarentena
-    def validate_row(r):
-        reasons = []
-        # fecha
-        try:
-            f = pd.to_datetime(r.get("fecha"), errors="coerce")
-            if pd.isna(f):
-                reasons.append("fecha inválida o faltante")
-        except Exception:
-            reasons.append("fecha inválida")
+    Devuelve sólo lo que necesita el proceso principal: bronce (RAW_COLS),
+    filas limpias ya tipadas, cuarentena (QCOLS y _reason_bits) y el recuento de motivos.
+    """
+    raw_df = next(read_drop(f, ingest_ts=ingest_ts, engine=engine, scan=scan, rango=rango))
+    df, clean, quarantine = split_valid(raw_df)
+    return {
+        "raw": df[RAW_COLS],
+        "clean": coerce_clean(clean),
+        "quarantine": quarantine.reindex(columns=QCOLS + ["_reason_bits"]),
+        "razones": count_reasons(quarantine),
+    }
+
+
+def split_tasks(files, workers: int, scans: Optional[dict] = None) -> list[tuple]:
+    """Tareas (fichero, _ingest_ts, pre-escaneo, rango) del pool, en el orden de `files`.
+
+    Los drops de al menos MIN_BYTES_RANGO bytes que se pueden partir por líneas
+    se reparten en hasta `workers` rangos de bytes (Prescan.ranges); todos los
+    rangos de un fichero comparten su _ingest_ts y van seguidos, así que el
+    orden de las filas es el mismo que leyendo el fichero entero.
+    """
+    scans = scans or {}
+    tareas = []
+    for f in files:
+        ts = batches.stamp()
+        scan = scans.get(f)
+        if scan is None or not scan.splittable or scan.size_bytes < MIN_BYTES_RANGO:
+            tareas.append((f, ts, scan, None))
+            continue
+        partes = min(workers, -(-scan.size_bytes // MIN_BYTES_RANGO))
+        tareas += [(f, ts, scan, rango) for rango in scan.ranges(partes)]
+    return tareas
+
+
+def process_drops(files, workers: int, engine: str = "pandas", scans: Optional[dict] = None):
+    """Procesa los drops en un pool de `workers` procesos.
+
+    Los _ingest_ts se asignan aquí, en el orden de `files`, y los resultados
+    se devuelven en ese mismo orden, así que "último gana" no depende de qué
+    proceso termine antes. Los drops grandes se parten en rangos (split_tasks).
+    """
+    tareas = split_tasks(files, workers, scans)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [pool.submit(process_drop, f, ts, engine, scan, rango) for f, ts, scan, rango in tareas]
+        for futuro in futuros:
+            yield futuro.result()
 
-        # id_cliente
-        idc = r.get("id_cliente")
-        if idc is None or str(idc).strip() == "":
-            reasons.append("id_cliente faltante")
 
-        # id_producto
-        idp = r.get("id_producto")
-        if idp is None or str(idp).strip() == "":
-            reasons.append("id_producto faltante")
+def ingest_batch(files, con, upsert_sql, quarantine_file: Path, dataset: parquet_store.Dataset, batch_id: str,
+                 engine: str = "pandas", perf: Optional[metrics.StageProfiler] = None, scans: Optional[dict] = None,
+                 bronze: Optional[bronze_store.BronzeStore] = None) -> dict:
+    """Modo por defecto: todo el drop en memoria.
 
-        # unidades
-        try:
-            u = float(str(r.get("unidades")))
-            if u < 0:
-                reasons.append("unidades negativas")
-            if u == 0:
-                reasons.append("unidades cero")
-        except Exception:
-            reasons.append("unidades no numéricas")
+    SQLite recibe sólo las filas nuevas (el UPSERT resuelve "último gana"); del
+    dataset Parquet plata se reescriben sólo las particiones que tocan.
+    """
+    perf = perf or metrics.StageProfiler()
+    scans = scans or {}
+    raw = list(perf.iterate("lectura", (df for f in files for df in read_drop(f, engine=engine, scan=scans.get(f)))))
+    with perf.stage("lectura"):
+        if raw:
+            raw_df = arrow_io.concat_frames(raw)
+        else:
+            raw_df = pd.DataFrame(columns=BASE_COLS + ["_source_file", "_ingest_ts"])
+    del raw
+
+    stats = new_stats()
+    with perf.stage("validacion", rows=len(raw_df)):
+        df, clean, quarantine = split_valid(raw_df)
+        if not clean.empty:
+            clean = coerce_clean(clean)
+    if not clean.empty:
+        with perf.stage("dedup", rows=len(clean)):
+            clean = dedup_last_wins(clean)
 
-        # precio
-        try:
-            p = to_float_money(r.get("precio_unitario"))
-            if p is None:
-                reasons.append("precio no numérico o faltante")
-            elif p < 0:
-                reasons.append("precio negativo")
-        except Exception:
-            reasons.append("precio inválido")
+    # Guardar cuarentena con motivo
+    with perf.stage("cuarentena", rows=len(quarantine)):
+        write_quarantine(quarantine, quarantine_file, con, batch_id)
+    with perf.stage("parquet", rows=len(clean)), dataset.writer() as parts:
+        parts.add(clean)
+        parts.commit(dedup_last_wins)
+
+    with perf.stage("bronce", rows=len(df)):
+        write_raw(df, con, batch_id, bronze)
+    if not clean.empty:
+        with perf.stage("upsert", rows=len(clean)):
+            upsert_clean(clean, con, upsert_sql)
 
-        is_valid = len(reasons) == 0
-        return is_valid, "; ".join(reasons)
+    tally(stats, df, quarantine)
+    return stats
 
-    # Aplicar validación
-    validated = raw_df.apply(lambda row: validate_row(row), axis=1)
-    valid_mask = [v[0] for v in validated]
-    reasons = [v[1] for v in validated]
 
-    df["_reason"] = reasons
-    quarantine = df.loc[[not v for v in valid_mask]].copy()
-    clean = df.loc[valid_mask].copy()
+def ingest_parallel(files, con, upsert_sql, quarantine_file: Path, dataset: parquet_store.Dataset, batch_id: str, workers: int,
+                    engine: str = "pandas", perf: Optional[metrics.StageProfiler] = None, scans: Optional[dict] = None,
+                    bronze: Optional[bronze_store.BronzeStore] = None) -> dict:
+    """Modo paralelo: un fichero (o un rango de bytes de un CSV grande) por proceso; la deduplicación global se hace aquí.
 
+    La lectura y la validación ocurren en el pool: en las métricas cuentan
+    juntas como la espera de cada resultado ("procesos").
+    """
+    perf = perf or metrics.StageProfiler()
+    stats = new_stats()
+
+    cleans = []
+    for res in perf.iterate("procesos", process_drops(files, workers, engine, scans), rows=lambda r: len(r["raw"])):
+        with perf.stage("cuarentena", rows=len(res["quarantine"])):
+            write_quarantine(res["quarantine"], quarantine_file, con, batch_id)
+        with perf.stage("bronce", rows=len(res["raw"])):
+            write_raw(res["raw"], con, batch_id, bronze)
+        cleans.append(res["clean"])
+        tally(stats, res["raw"], res["quarantine"], res["razones"])
+
+    with perf.stage("dedup"):
+        clean = arrow_io.concat_frames(cleans) if cleans else pd.DataFrame(columns=CLEAN_COLS)
+    del cleans
     if not clean.empty:
-        # coercionar tipos para el dataset limpio
-        clean["fecha"] = pd.to_datetime(clean["fecha"], errors="coerce").dt.date
-        clean["unidades"] = pd.to_numeric(clean["unidades"], errors="coerce")
-        clean["precio_unitario"] = clean["precio_unitario"].apply(to_float_money)
+        with perf.stage("dedup", rows=len(clean)):
+            clean = dedup_last_wins(clean)
+        with perf.stage("parquet", rows=len(clean)), dataset.writer() as parts:
+            parts.add(clean)
+            parts.commit(dedup_last_wins)
+        with perf.stage("upsert", rows=len(clean)):
+            upsert_clean(clean, con, upsert_sql)
+    return stats
+
+
+def ingest_chunked(files, con, upsert_sql, quarantine_file: Path, dataset: parquet_store.Dataset, batch_id: str,
+                   chunk_size: int, engine: str = "pandas", perf: Optional[metrics.StageProfiler] = None,
+                   scans: Optional[dict] = None, bronze: Optional[bronze_store.BronzeStore] = None) -> dict:
+    """Modo streaming: validación, cuarentena y bronce bloque a bloque.
+
+    Las filas limpias se reparten por clave en cubos en disco (streaming.SpillDedup)
+    y se fusionan al final cubo a cubo, así que la deduplicación entre bloques y
+    ficheros es la misma que en memoria. Cada cubo fusionado va a SQLite y a las
+    particiones del dataset plata, que se reescriben al final.
+
+    En las métricas, "dedup" incluye la lectura de cada cubo y "spill" su escritura.
+    """
+    perf = perf or metrics.StageProfiler()
+    stats = new_stats()
+    scans = scans or {}
+    filas = sum(scans[f].rows for f in files) if all(f in scans for f in files) else None
+
+    dataset.root.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="spill_", dir=dataset.root.parent) as tmp:
+        spill = streaming.SpillDedup(Path(tmp), streaming.n_buckets_for(files, chunk_size, filas), KEY)
+        for f in files:
+            for chunk in perf.iterate("lectura", read_drop(f, chunk_size, engine=engine, scan=scans.get(f))):
+                with perf.stage("validacion", rows=len(chunk)):
+                    df, clean, quarantine = split_valid(chunk)
+                    clean = coerce_clean(clean)
+                with perf.stage("cuarentena", rows=len(quarantine)):
+                    write_quarantine(quarantine, quarantine_file, con, batch_id)
+                with perf.stage("bronce", rows=len(df)):
+                    write_raw(df, con, batch_id, bronze)
+                with perf.stage("spill", rows=len(clean)):
+                    spill.add(clean)
+                tally(stats, df, quarantine)
+
+        # fusión final: cada cubo se deduplica y se añade a SQLite y a sus particiones
+        with dataset.writer() as parts:
+            for clean in perf.iterate("dedup", spill.merged(dedup_last_wins)):
+                with perf.stage("upsert", rows=len(clean)):
+                    upsert_clean(clean, con, upsert_sql)
+                with perf.stage("parquet", rows=len(clean)):
+                    parts.add(clean)
+            with perf.stage("parquet"):
+                parts.commit(dedup_last_wins)
+    return stats
+
+
+def prepare_quarantine(quarantine_file: Path, fresh: bool, files: list[Path]) -> None:
+    """Deja el CSV de cuarentena listo para añadir las filas de esta ejecución.
+
+    En una carga completa se reinicia (sólo cabecera); en una incremental se
+    conservan las filas anteriores salvo las de los drops que se van a ingerir
+    (`files`, nuevos o modificados). Así, si una ejecución anterior se cortó
+    tras escribir la cuarentena y antes de confirmar el manifiesto, sus filas
+    no se duplican al reintentar.
+    """
+    if fresh or not quarantine_file.exists():
+        quarantine_file.write_text(",".join(QCOLS) + "\n", encoding="utf-8")
+    elif files:
+        previa = pd.read_csv(quarantine_file, dtype=str, keep_default_na=False)
+        restos = previa["_source_file"].isin([f.name for f in files])
+        if restos.any():
+            previa[~restos].to_csv(quarantine_file, index=False)
 
-        clean = (clean.sort_values("_ingest_ts")
-                     .drop_duplicates(subset=["fecha", "id_cliente", "id_producto"], keep="last"))
-        clean["importe"] = clean["unidades"] * clean["precio_unitario"]
 
-    # 3) Persistencia: Parquet (fuente de reporte) + SQLite (opcional integrado)
-    # Guardar cuarentena con motivo
-    if not quarantine.empty:
-        # keep relevant cols and reason
-        qcols = [c for c in quarantine.columns if c in ["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_source_file", "_ingest_ts", "_reason"]]
-        quarantine[qcols].to_csv(OUT / "quality" / "ventas_invalidas.csv", index=False)
-    else:
-        # asegurar que exista un fichero vacío con cabecera
-        (OUT / "quality" / "ventas_invalidas.csv").write_text("fecha,id_cliente,id_producto,unidades,precio_unitario,_source_file,_ingest_ts,_reason\n", encoding="utf-8")
-    PARQUET_FILE = OUT / "parquet" / "clean_ventas.parquet"
-    if not clean.empty:
-        clean.to_parquet(PARQUET_FILE, index=False)
+def read_report(dataset: parquet_store.Dataset, desde: Optional[date] = None, hasta: Optional[date] = None,
+                max_precio: float = MAX_PRECIO_REPORTE) -> tuple[pa.Table, pa.Table]:
+    """Relee del Parquet plata sólo lo que necesita el reporte.
 
-    # SQLite
-    DB = OUT / "ut1.db"
-    con = sqlite3.connect(DB)
-    # Ejecutar DDL (esquema)
-    con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
-    # Insertar RAW
-    if not df.empty:
-        # Only persist the columns defined in the raw_ventas table (avoid schema mismatch)
-        df_raw = df[["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_ingest_ts", "_source_file"]].copy()
-        df_raw["_batch_id"] = "demo"  # simplificado
-        df_raw.to_sql("raw_ventas", con, if_exists="append", index=False)
-    # Actualizar/insertar CLEAN mediante UPSERT
-    if not clean.empty:
-        upsert_sql = (ROOT / "sql" / "10_upserts.sql").read_text(encoding="utf-8")
-        for _, r in clean.iterrows():
-            con.execute(
-                upsert_sql,
-                {
-                    "fecha": str(r["fecha"]),
-                    "idc": r["id_cliente"],
-                    "idp": r["id_producto"],
-                    "u": float(r["unidades"]),
-                    "p": float(r["precio_unitario"]),
-                    "ts": r["_ingest_ts"],
-                },
-            )
-        con.commit()
-    # Crear vistas
-    con.executescript((ROOT / "sql" / "20_views.sql").read_text(encoding="utf-8"))
-    con.close()
+    Proyecta REPORT_COLS y empuja al dataset la ventana [desde, hasta] y el filtro
+    de precio, así que un reporte mensual no descomprime el resto del histórico.
 
-    # 4) Generar reporte leyendo desde PARQUET
-    if PARQUET_FILE.exists():
-        clean_rep = pd.read_parquet(PARQUET_FILE)
-    else:
-        clean_rep = pd.DataFrame(columns=["fecha", "id_cliente", "id_producto", "unidades", "precio_unitario", "_ingest_ts", "importe"])
+    Returns:
+        (filas con precio <= max_precio, resto de filas con fecha, precio e importe);
+        las segundas sólo cuentan en los totales y en el aviso de precios altos
+    """
+    precio = pc.field("precio_unitario")
+    filas = dataset.scan(REPORT_COLS, precio <= max_precio, desde, hasta)
+    resto = dataset.scan(["fecha", "precio_unitario", "importe"], (precio > max_precio) | precio.is_null(), desde, hasta)
+    return filas, resto
 
-    if not clean_rep.empty:
-        ingresos = float(clean_rep["importe"].sum())
-        trans = int(len(clean_rep))
-        ticket = float(ingresos / trans) if trans > 0 else 0.0
 
-        clean = clean[clean['precio_unitario'] <= 150]  # filtrar filas con precio por encima de 150
+def persistence_lines(dataset: parquet_store.Dataset, db: Path,
+                      bronze: Optional[bronze_store.BronzeStore] = None) -> list[str]:
+    """Líneas de la sección "Persistencia" del reporte (`bronze`: bronce compacto, si se usa)."""
+    lineas = [
+        f"Parquet: {dataset.root} (particionado por año/mes, {dataset.compression})",
+        f"SQLite : {db} (tablas: raw_ventas, clean_ventas, quarantine_ventas; vistas: ventas_diarias, quarantine_motivos)",
+    ]
+    if bronze is not None:
+        lineas.append(f"Bronce : {bronze.root} (Parquet por batch, {bronze.compression}; linaje en batches y bronze_parts)")
+    return lineas
 
-        # calcular top productos incluyendo nombre si está disponible
-        if "nombre_producto" in clean.columns:
-            top = (clean.groupby(["id_producto", "nombre_producto"], as_index=False)
-                       .agg(importe=("importe", "sum"))
-                       .sort_values("importe", ascending=False)
-                       .head(5))  # limitar a los 5 productos principales
-        else:
-            top = (clean.groupby("id_producto", as_index=False)
-                       .agg(importe=("importe", "sum"))
-                       .sort_values("importe", ascending=False)
-                       .head(5))  # limitar a los 5 productos principales
+
+def render_report(k: kpis.KPIs, calidad: list[str], persistencia: list[str], razones: Counter,
+                  fuente: str = "clean_ventas (Parquet)", max_precio: float = MAX_PRECIO_REPORTE) -> str:
+    """Reporte en Markdown a partir de los KPIs.
+
+    Args:
+        k: métricas calculadas por kpis.compute o kpis.from_aggregates
+        calidad: líneas de la sección "Calidad y cobertura"
+        persistencia: líneas de la sección "Persistencia"
+        razones: motivos de cuarentena con su número de filas
+        fuente: origen de los datos, para la cabecera
+        max_precio: precio máximo de las filas del top y del resumen diario
+
+    Returns:
+        texto del reporte
+    """
+    top = pd.DataFrame(k.top_productos, columns=kpis.Producto._fields)
+    if not top.empty:
         total_imp = top["importe"].sum() or 1.0
         top["pct"] = (100 * top["importe"] / total_imp).round(0).astype(int).astype(str) + "%"
-
-        by_day = (clean.groupby("fecha", as_index=False)
-                          .agg(importe_total=("importe", "sum"),
-                               transacciones=("importe", "count"))
-                          .sort_values("fecha", ascending=False)
-                          .head(20))  # limitar a 20 filas
-        periodo_ini = str(clean_rep["fecha"].min())
-        periodo_fin = str(clean_rep["fecha"].max())
-        producto_lider = top.iloc[0]["id_producto"] if not top.empty else "—"
-    else:
-        ingresos = 0.0
-        ticket = 0.0
-        trans = 0
-        top = pd.DataFrame(columns=["id_producto", "importe", "pct"]) if "nombre_producto" not in clean.columns else pd.DataFrame(columns=["id_producto", "nombre_producto", "importe", "pct"]) 
-        by_day = pd.DataFrame(columns=["fecha", "importe_total", "transacciones"])
-        periodo_ini = "—"
-        periodo_fin = "—"
-        producto_lider = "—"
+    by_day = pd.DataFrame(k.por_dia, columns=kpis.Dia._fields)
+    periodo_ini, periodo_fin = map(str, k.periodo) if k.periodo else ("—", "—")
 
     # preparar insights para conclusiones dinámicas
-    try:
-        # contar causas principales en cuarentena
-        if not quarantine.empty and "_reason" in quarantine.columns:
-            razones = quarantine["_reason"].dropna().astype(str).str.split(";")
-            razones = razones.explode().str.strip()
-            top_raz = razones.value_counts().head(3)
-            razones_texto = "\n".join([f"  - {r}: {c} filas" for r, c in top_raz.items()])
-        else:
-            razones_texto = "  - (sin filas en cuarentena)"
-    except Exception:
-        razones_texto = "  - (no disponible)"
-
-    try:
-        # contar cuántas filas tenían precio > 150 en el conjunto limpio (antes de filtrar)
-        count_above_150 = int((clean_rep["precio_unitario"] > 150).sum()) if "precio_unitario" in clean_rep.columns else 0
-    except Exception:
-        count_above_150 = 0
+    if razones:
+        top_raz = pd.Series(razones).sort_values(ascending=False, kind="stable").head(3)
+        razones_texto = "\n".join([f"  - {r}: {c} filas" for r, c in top_raz.items()])
+    else:
+        razones_texto = "  - (sin filas en cuarentena)"
 
     conclusiones = (
         "## 7. Conclusiones\n"
-        f"- Reponer stock del producto líder ({producto_lider}) acorde a la demanda observada.\n"
+        f"- Reponer stock del producto líder ({k.producto_lider}) acorde a la demanda observada.\n"
         "- Analizar las filas en cuarentena y corregir las fuentes/validaciones; causas principales:\n"
         f"{razones_texto}\n"
-        f"- En el dataset limpio había {count_above_150} filas con precio > 150 € (se filtran en el reporte). Revisar la política de precios.\n"
-        "- Considerar particionado por fecha y compresión en Parquet para mejorar rendimiento y escalabilidad.\n"
+        f"- En el dataset limpio había {k.precio_alto} filas con precio > {max_precio:g} € (se filtran en el reporte). Revisar la política de precios.\n"
     )
 
-<<<<<<< HEAD
-<<<<<<< HEAD
-# Límites razonables para validación
-MAX_UNIDADES = 100  # máximo 100 unidades por transacción
-MAX_PRECIO = 1000.0  # máximo 1000€ por unidad
-MIN_FECHA = pd.to_datetime("2025-01-01").date()  # no ventas antes de 2025
-MAX_FECHA = datetime.now(timezone.utc).date()  # no ventas futuras
-
-valid = (
-    # Validaciones existentes
-=======
-valid = (
->>>>>>> 7bdfc871baa9bcef1032f7aef3e635b35571e00b
-    df["fecha"].notna()
-    & df["unidades"].notna() & (df["unidades"] >= 0)
-    & df["precio_unitario"].notna() & (df["precio_unitario"] >= 0)
-    & df["id_cliente"].notna() & (df["id_cliente"] != "")
-    & df["id_producto"].notna() & (df["id_producto"] != "")
-<<<<<<< HEAD
-    # Nuevas validaciones de rango
-    & (df["unidades"] <= MAX_UNIDADES)  # límite superior de unidades
-    & (df["precio_unitario"] <= MAX_PRECIO)  # límite superior de precio
-    & (df["fecha"] >= MIN_FECHA)  # fecha mínima
-    & (df["fecha"] <= MAX_FECHA)  # no ventas futuras
-    # Validación de formato de IDs
-    & df["id_cliente"].str.match(r'^C\d{3}$').fillna(False)  # formato CXXX
-    & df["id_producto"].str.match(r'^P\d{3}$').fillna(False)  # formato PXXX
-=======
->>>>>>> 7bdfc871baa9bcef1032f7aef3e635b35571e00b
-)
-
-quarantine = df.loc[~valid].copy()
-clean = df.loc[valid].copy()
-
-if not clean.empty:
-    clean = (clean.sort_values("_ingest_ts")
-                  .drop_duplicates(subset=["fecha","id_cliente","id_producto"], keep="last"))
-    clean["importe"] = clean["unidades"] * clean["precio_unitario"]
-
-# 3) Persistencia: Parquet (fuente de reporte) + SQLite (opcional integrado)
-quarantine.to_csv(OUT / "quality" / "ventas_invalidas.csv", index=False)
-PARQUET_FILE = OUT / "parquet" / "clean_ventas.parquet"
-if not clean.empty:
-    clean.to_parquet(PARQUET_FILE, index=False)
-
-# SQLite
-DB = OUT / "ut1.db"
-con = sqlite3.connect(DB)
-# DDL
-con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
-# RAW
-if not df.empty:
-    df_raw = df[["fecha","id_cliente","id_producto","unidades","precio_unitario","_ingest_ts","_source_file"]].copy()
-    df_raw["_batch_id"] = "demo"  # simplificado
-    df_raw.to_sql("raw_ventas", con, if_exists="append", index=False)
-# CLEAN via UPSERT
-if not clean.empty:
-    upsert_sql = (ROOT / "sql" / "10_upserts.sql").read_text(encoding="utf-8")
-    for _, r in clean.iterrows():
-        con.execute(
-            upsert_sql,
-            {
-                "fecha": str(r["fecha"]),
-                "idc": r["id_cliente"],
-                "idp": r["id_producto"],
-                "u": float(r["unidades"]),
-                "p": float(r["precio_unitario"]),
-                "ts": r["_ingest_ts"],
-            },
-        )
-    con.commit()
-# Vistas
-con.executescript((ROOT / "sql" / "20_views.sql").read_text(encoding="utf-8"))
-con.close()
-
-# 4) Reporte releído desde PARQUET
-if PARQUET_FILE.exists():
-    clean_rep = pd.read_parquet(PARQUET_FILE)
-else:
-    clean_rep = pd.DataFrame(columns=["fecha","id_cliente","id_producto","unidades","precio_unitario","_ingest_ts","importe"])
-
-if not clean_rep.empty:
-    ingresos = float(clean_rep["importe"].sum())
-    trans = int(len(clean_rep))
-    ticket = float(ingresos / trans) if trans > 0 else 0.0
-
-    top = (clean_rep.groupby("id_producto", as_index=False)
-                    .agg(importe=("importe","sum"))
-                    .sort_values("importe", ascending=False))
-    total_imp = top["importe"].sum() or 1.0
-    top["pct"] = (100*top["importe"]/total_imp).round(0).astype(int).astype(str) + "%"
-
-    by_day = (clean_rep.groupby("fecha", as_index=False)
-                        .agg(importe_total=("importe","sum"),
-                             transacciones=("importe","count")))
-    periodo_ini = str(clean_rep["fecha"].min())
-    periodo_fin = str(clean_rep["fecha"].max())
-    producto_lider = top.iloc[0]["id_producto"] if not top.empty else "—"
-else:
-    ingresos = 0.0; ticket = 0.0; trans = 0
-    top = pd.DataFrame(columns=["id_producto","importe","pct"])
-    by_day = pd.DataFrame(columns=["fecha","importe_total","transacciones"])
-    periodo_ini = "—"; periodo_fin = "—"; producto_lider = "—"
-
-report = (
-    "# Reporte UT1 · Ventas\n"
-    f"**Periodo:** {periodo_ini} a {periodo_fin} · **Fuente:** clean_ventas (Parquet) · **Generado:** {datetime.now(timezone.utc).isoformat()}\n\n"
-    "## 1. Titular\n"
-    f"Ingresos totales {ingresos:.2f} €; producto líder: {producto_lider}.\n\n"
-    "## 2. KPIs\n"
-    f"- **Ingresos netos:** {ingresos:.2f} €\n"
-    f"- **Ticket medio:** {ticket:.2f} €\n"
-    f"- **Transacciones:** {trans}\n\n"
-    "## 3. Top productos\n"
-    f"{(top.to_markdown(index=False) if not top.empty else '_(sin datos)_')}\n\n"
-    "## 4. Resumen por día\n"
-    f"{(by_day.to_markdown(index=False) if not by_day.empty else '_(sin datos)_')}\n\n"
-=======
-    report = (
+    return (
         "# Reporte UT1 · Ventas\n"
-        f"**Periodo:** {periodo_ini} a {periodo_fin} · **Fuente:** clean_ventas (Parquet) · **Generado:** {datetime.now(timezone.utc).isoformat()}\n\n"
+        f"**Periodo:** {periodo_ini} a {periodo_fin} · **Fuente:** {fuente} · **Generado:** {datetime.now(timezone.utc).isoformat()}\n\n"
         "## 1. Titular\n"
-        f"Ingresos totales {ingresos:.2f} €; producto líder: {producto_lider}.\n\n"
+        f"Ingresos totales {k.ingresos:.2f} €; producto líder: {k.producto_lider}.\n\n"
         "## 2. KPIs\n"
-        f"- **Ingresos netos:** {ingresos:.2f} €\n"
-        f"- **Ticket medio:** {ticket:.2f} €\n"
-        f"- **Transacciones:** {trans}\n\n"
+        f"- **Ingresos netos:** {k.ingresos:.2f} €\n"
+        f"- **Ticket medio:** {k.ticket_medio:.2f} €\n"
+        f"- **Transacciones:** {k.transacciones}\n\n"
         "## 3. Top productos\n"
         f"{(top.to_markdown(index=False) if not top.empty else '_(sin datos)_')}\n\n"
         "## 4. Resumen por día\n"
         f"{(by_day.to_markdown(index=False) if not by_day.empty else '_(sin datos)_')}\n\n"
->>>>>>> 6eab657 (feat: traducir get_data y run; añadir nombres de productos y reporte dinámico; actualizar output/reporte.md)
-    "## 5. Calidad y cobertura\n"
-    f"- Filas bronce: {len(df)} · Plata: {len(clean)} · Cuarentena: {len(quarantine)}\n\n"
+        "## 5. Calidad y cobertura\n"
+        + "".join(f"- {linea}\n" for linea in calidad) + "\n"
         "## 6. Persistencia\n"
-        f"- Parquet: {PARQUET_FILE}\n"
-        f"- SQLite : {DB} (tablas: raw_ventas, clean_ventas; vista: ventas_diarias)\n\n"
+        + "".join(f"- {linea}\n" for linea in persistencia) + "\n"
         f"{conclusiones}\n"
     )
 
-    (OUT / "reporte.md").write_text(report, encoding="utf-8")
+
+def main(regen_data: bool = False, regen_force: bool = False, chunk_size: Optional[int] = None, workers: Optional[int] = None,
+         engine: str = "pandas", full_refresh: bool = False, sqlite_profile_name: str = "default",
+         parquet_compression: str = "zstd", row_group_size: int = 128_000,
+         desde: Optional[date] = None, hasta: Optional[date] = None, profile: bool = False, bronze: str = "sqlite",
+         pipeline: bool = False):
+    """Ejecuta la canalización: ingesta -> limpieza -> persistencia -> reporte.
+
+    Args:
+        regen_data: si es True, regenera los datos de ejemplo antes de ejecutar
+            (llama al helper generate_sample en get_data)
+        regen_force: si es True y regen_data es True, fuerza la sobrescritura del archivo de muestra
+        chunk_size: si se indica, procesa los drops en bloques de este número de filas
+            (memoria acotada por el bloque en lugar de por el tamaño del drop)
+        workers: si se indica, parsea y valida cada drop en un pool de este número de procesos
+        engine: lector de CSV, "pandas" (texto) o "arrow" (pyarrow.csv, columnas category)
+        full_refresh: si es True, ignora el manifiesto y recarga todos los drops desde cero
+        sqlite_profile_name: perfil de escritura de SQLite ("default", "wal", "fast"; ver sqlite_profile.py)
+        parquet_compression: códec de las particiones Parquet de plata (ver parquet_store.py)
+        row_group_size: filas máximas por row group en Parquet
+        desde: si se indica, el reporte sólo incluye ventas desde esta fecha (inclusive)
+        hasta: si se indica, el reporte sólo incluye ventas hasta esta fecha (inclusive)
+        profile: si es True, perfila cada etapa con cProfile y guarda el perfil de la
+            más lenta en output/profile_<etapa>.pstats
+        bronze: dónde se guardan las filas crudas, "sqlite" (raw_ventas) o "parquet"
+            (output/bronze por batch con el linaje en la tabla batches; ver bronze_store.py)
+        pipeline: si es True, lectura, validación y escrituras se solapan en hilos unidos por
+            colas acotadas; el Parquet plata y el UPSERT se escriben a la vez (ver pipeline.py)
+
+    Las métricas por etapa (tiempo, CPU, pico de RSS, filas) se guardan en la
+    tabla run_metrics de ut1.db y en output/run_metrics.json (ver metrics.py).
+    """
+    perf = metrics.StageProfiler(profile)
+    ROOT = Path(__file__).resolve().parents[1]
+    DATA = ROOT / "data" / "drops"
+    OUT = ROOT / "output"
+    OUT.mkdir(parents=True, exist_ok=True)
+    (OUT / "parquet").mkdir(parents=True, exist_ok=True)
+    (OUT / "quality").mkdir(parents=True, exist_ok=True)
+
+    if regen_data:
+        try:
+            from . import get_data
+        except Exception:
+            import project.ingest.get_data as get_data
+        # wrapper compatible
+        get_data.generate_sample(drop_dir=DATA, force=regen_force)
+
+    PARQUET_DIR = OUT / "parquet" / "clean_ventas"
+    LEGACY_PARQUET = OUT / "parquet" / "clean_ventas.parquet"  # formato monolítico anterior
+    dataset = parquet_store.Dataset(PARQUET_DIR, parquet_compression, row_group_size)
+    QUARANTINE_FILE = OUT / "quality" / "ventas_invalidas.csv"
+    BRONZE_DIR = OUT / "bronze"
+    store = bronze_store.BronzeStore(BRONZE_DIR, parquet_compression) if bronze == "parquet" else None
+
+    # SQLite
+    DB = OUT / "ut1.db"
+    with perf.stage("preparacion"):
+        con = sqlite_profile.connect(DB, sqlite_profile_name)
+        # DDL
+        quarantine_store.migrate_legacy(con)
+        batches.migrate_legacy(con)
+        con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
+        quarantine_store.sync_reasons(con)
+        ensure_raw_columns(con)
+        upsert_sql = (ROOT / "sql" / "11_upsert_bulk.sql").read_text(encoding="utf-8")
+        ensure_aggregates(con, (ROOT / "sql" / "21_agg_rebuild.sql").read_text(encoding="utf-8"))
+
+        # Manifiesto: sólo se ingieren drops nuevos o modificados (ver manifest.py).
+        # Sin entradas previas (o con --full-refresh) se recarga todo desde cero.
+        fresh = full_refresh or con.execute("SELECT COUNT(*) FROM ingest_manifest").fetchone()[0] == 0
+        if fresh:
+            manifest.reset(con)
+            dataset.reset()
+            bronze_store.BronzeStore(BRONZE_DIR).reset()
+            LEGACY_PARQUET.unlink(missing_ok=True)
+        elif LEGACY_PARQUET.exists() and not dataset.exists():
+            dataset.migrate_legacy(LEGACY_PARQUET, dedup_last_wins)
+        pendientes, omitidos = manifest.plan(con, list_drops(DATA))
+        # pre-escaneo (mmap): filas, delimitador y rangos; los drops ilegibles no se ingieren y
+        # siguen pendientes en el manifiesto hasta que se corrijan. Los avisos de forma sólo se
+        # muestran: esas filas acaban en cuarentena
+        with perf.stage("prescan") as etapa:
+            scans = {h.path: prescan.scan(h.path) for h in pendientes}
+            etapa.rows += sum(s.rows for s in scans.values())
+        rechazados = [h.path for h in pendientes if not scans[h.path].readable]
+        for f in rechazados:
+            print(f"AVISO · {f.name} no se ingiere: {'; '.join(scans[f].errors)}")
+        pendientes = [h for h in pendientes if scans[h.path].readable]
+        for h in pendientes:
+            if scans[h.path].problems:
+                print(f"AVISO · {h.path.name}: {'; '.join(scans[h.path].problems)}")
+        files = [h.path for h in pendientes]
+        # bronce y cuarentena previos de estos drops: versiones modificadas o restos de una
+        # ejecución cortada antes de confirmar el manifiesto
+        manifest.forget(con, files)
+        prepare_quarantine(QUARANTINE_FILE, fresh, files)
+        batch = batches.open_batch(con)  # batch_runs: id monótono de esta ejecución (ver batches.py)
+        batch_id = batch.batch_id
+
+    # 1) Ingesta + 2) Limpieza + 3) Persistencia: Parquet (fuente de reporte) + SQLite
+    with con.transaccion():
+        if not files:
+            stats = new_stats()
+        elif workers:
+            stats = ingest_parallel(files, con, upsert_sql, QUARANTINE_FILE, dataset, batch_id, workers, engine, perf, scans,
+                                    store)
+        elif chunk_size:
+            stats = ingest_chunked(files, con, upsert_sql, QUARANTINE_FILE, dataset, batch_id, chunk_size, engine, perf,
+                                   scans, store)
+        elif pipeline:
+            try:
+                from . import pipeline as etapas
+            except ImportError:
+                import pipeline as etapas
+            stats = etapas.ingest_pipelined(files, con, upsert_sql, QUARANTINE_FILE, dataset, batch_id, engine, perf,
+                                            scans, store)
+        else:
+            stats = ingest_batch(files, con, upsert_sql, QUARANTINE_FILE, dataset, batch_id, engine, perf, scans, store)
+
+        with perf.stage("manifiesto", rows=len(pendientes)):
+            stats["plata"] = dataset.num_rows()
+            for h in pendientes:
+                por_fichero = stats["ficheros"][h.path.name]
+                manifest.record(con, h, batch_id, por_fichero["bronce"], por_fichero["cuarentena"])
+            con.commit()
+    if store is not None:
+        store.prune(con)  # ficheros de bronce de drops reingeridos, ya sin linaje (con la transacción confirmada)
+    batches.close_batch(con, batch, len(pendientes), stats["bronce"], stats["cuarentena"])
+
+    # Vistas
+    with perf.stage("vistas"):
+        con.executescript((ROOT / "sql" / "20_views.sql").read_text(encoding="utf-8"))
+        con.execute("PRAGMA optimize")  # estadísticas de los índices para el planificador
+        # totales acumulados para el reporte, como ingest/report.py: los de stats son sólo de este batch
+        bronce, cuarentena = con.execute(
+            "SELECT TOTAL(rows_raw), TOTAL(rows_quarantine) FROM ingest_manifest").fetchone()
+        razones = quarantine_store.count(con)
+        con.close()
+
+    # 4) Reporte releído desde PARQUET (sólo columnas y filas necesarias, ver read_report)
+    with perf.stage("reporte") as etapa:
+        filas, resto = read_report(dataset, desde, hasta)
+        etapa.rows += len(filas) + len(resto)
+        k = kpis.compute(filas, resto, max_precio=MAX_PRECIO_REPORTE)
+        report = render_report(
+            k,
+            calidad=[
+                f"Filas bronce: {int(bronce)} · Plata: {stats['plata']} · Cuarentena: {int(cuarentena)}",
+                f"Drops ingeridos: {len(pendientes)} · sin cambios (omitidos): {len(omitidos)} · batch: {batch_id}",
+            ] + [f"Drop ilegible (no ingerido): {f.name} · {'; '.join(scans[f].errors)}" for f in rechazados]
+            + [f"Drop con avisos: {h.path.name} · {'; '.join(scans[h.path].problems)}"
+               for h in pendientes if scans[h.path].problems],
+            persistencia=persistence_lines(dataset, DB, store),
+            razones=razones,
+        )
+        (OUT / "reporte.md").write_text(report, encoding="utf-8")
+
+    perf.save(DB, batch_id)
+    perf.write_json(OUT / "run_metrics.json", batch_id, params={
+        "engine": engine, "chunk_size": chunk_size, "workers": workers, "full_refresh": full_refresh,
+        "sqlite_profile": sqlite_profile_name, "parquet_compression": parquet_compression,
+        "row_group_size": row_group_size, "bronze": bronze, "pipeline": pipeline, "drops": len(pendientes),
+    })
+    lenta = perf.slowest()
     print("OK · Generado:", OUT / "reporte.md")
-    print("OK · Parquet :", PARQUET_FILE if PARQUET_FILE.exists() else "sin datos")
+    print("OK · Parquet :", PARQUET_DIR if dataset.exists() else "sin datos")
     print("OK · SQLite  :", DB)
+    print(f"OK · Métricas: {OUT / 'run_metrics.json'} · {perf.total().wall_s:.2f} s · "
+          f"etapa más lenta: {lenta.stage} ({lenta.wall_s:.2f} s)")
+    if profile:
+        print("OK · Perfil  :", perf.dump_slowest(OUT))
 
 
 if __name__ == "__main__":
@@ -664,9 +779,33 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ejecutar pipeline de ingesta, limpieza y reporte")
     parser.add_argument("--regen-data", action="store_true", help="Regenerar datos de ejemplo antes de ejecutar")
     parser.add_argument("--force", action="store_true", help="Forzar sobrescritura al regenerar los datos de ejemplo")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Procesar los drops en bloques de N filas (memoria acotada)")
+    parser.add_argument("--workers", type=int, default=None, help="Parsear y validar los drops en N procesos (un fichero por proceso)")
+    parser.add_argument("--full-refresh", action="store_true", help="Ignorar el manifiesto y recargar todos los drops desde cero")
+    parser.add_argument("--sqlite-profile", choices=list(sqlite_profile.PERFILES), default="default",
+                        help="Perfil de escritura de SQLite: durabilidad (default) o velocidad (wal, fast)")
+    parser.add_argument("--engine", choices=["pandas", "arrow"], default="pandas", help="Lector de CSV (arrow: pyarrow.csv con columnas category)")
+    parser.add_argument("--parquet-compression", choices=parquet_store.COMPRESIONES, default="zstd",
+                        help="Códec de las particiones Parquet de plata")
+    parser.add_argument("--bronze", choices=bronze_store.MODOS, default="sqlite",
+                        help="Bronce en raw_ventas (sqlite) o compacto en Parquet por batch con linaje normalizado (parquet)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Solapar lectura, validación y escrituras en hilos con colas acotadas")
+    parser.add_argument("--row-group-size", type=int, default=128_000, help="Filas máximas por row group en Parquet")
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="Reporte desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=None, help="Reporte hasta esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfilar cada etapa con cProfile y guardar el perfil de la más lenta (output/profile_<etapa>.pstats)")
     args = parser.parse_args()
+    if args.workers and args.chunk_size:
+        parser.error("--workers y --chunk-size no se pueden combinar")
+    if args.pipeline and (args.workers or args.chunk_size):
+        parser.error("--pipeline no se puede combinar con --workers ni con --chunk-size")
 
-    main(regen_data=args.regen_data, regen_force=args.force)
+    main(regen_data=args.regen_data, regen_force=args.force, chunk_size=args.chunk_size, workers=args.workers, engine=args.engine, full_refresh=args.full_refresh,
+         sqlite_profile_name=args.sqlite_profile, parquet_compression=args.parquet_compression,
+         row_group_size=args.row_group_size, desde=args.desde, hasta=args.hasta, profile=args.profile,
+         bronze=args.bronze, pipeline=args.pipeline)
 
-ejecutar = main
 
+ejecutar = main
@@ -0,0 +1,90 @@
+"""Perfiles de escritura de SQLite para la etapa de persistencia (``--sqlite-profile``).
+
+- ``default``: durabilidad por defecto de SQLite (journal DELETE, synchronous
+  FULL); cada carga (bronce, UPSERT) confirma su propia transacción.
+- ``wal``: WAL + ``synchronous=NORMAL``, caché de 64 MiB, temporales en
+  memoria, mmap y una única transacción para toda la ingesta. Ante un corte de
+  luz puede perderse la última transacción, pero la base no se corrompe.
+- ``fast``: como ``wal`` pero con journal en memoria y ``synchronous=OFF``.
+  Un fallo a mitad puede dejar la base inservible: sólo para entornos en los
+  que ``ut1.db`` se puede reconstruir (CI, benchmarks, ``--full-refresh``).
+
+La transacción única se consigue con una conexión (``Conexion``) cuyo
+``commit()`` se difiere dentro de ``transaccion()``: ``DataFrame.to_sql`` y
+``run.upsert_clean`` confirman al terminar y, sin esto, cada llamada sería una
+transacción (y un fsync) distinta.
+"""
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+# máximo de parámetros por sentencia (SQLITE_MAX_VARIABLE_NUMBER por defecto)
+MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+@dataclass(frozen=True)
+class PerfilEscritura:
+    pragmas: dict = field(default_factory=dict)
+    method: Optional[str] = None  # método de DataFrame.to_sql ("multi": un INSERT con muchas filas)
+    una_transaccion: bool = False
+
+
+_RAPIDO = {
+    "cache_size": -65536,  # KiB (negativo) → 64 MiB
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 2**20,
+}
+
+PERFILES = {
+    "default": PerfilEscritura({"journal_mode": "DELETE", "synchronous": "FULL"}),
+    "wal": PerfilEscritura({"journal_mode": "WAL", "synchronous": "NORMAL", **_RAPIDO},
+                           method="multi", una_transaccion=True),
+    "fast": PerfilEscritura({"journal_mode": "MEMORY", "synchronous": "OFF", **_RAPIDO},
+                            method="multi", una_transaccion=True),
+}
+
+
+class Conexion(sqlite3.Connection):
+    """sqlite3.Connection con perfil de escritura y transacción única opcional."""
+
+    perfil = PERFILES["default"]
+    _diferida = False
+
+    def commit(self):
+        if not self._diferida:
+            super().commit()
+
+    @contextmanager
+    def transaccion(self):
+        """Agrupa en una transacción todas las cargas del bloque si el perfil lo pide."""
+        if not self.perfil.una_transaccion:
+            yield self
+            return
+        self._diferida = True
+        try:
+            yield self
+        except BaseException:
+            self._diferida = False
+            self.rollback()
+            raise
+        self._diferida = False
+        self.commit()
+
+
+def connect(db: Path, perfil: str = "default") -> Conexion:
+    """Abre ``db`` aplicando los PRAGMA del perfil indicado."""
+    con = sqlite3.connect(db, factory=Conexion)
+    con.perfil = PERFILES[perfil]
+    for nombre, valor in con.perfil.pragmas.items():
+        con.execute(f"PRAGMA {nombre}={valor}")
+    return con
+
+
+def to_sql_options(con: sqlite3.Connection, n_columns: int) -> dict:
+    """chunksize/method de DataFrame.to_sql según el perfil de la conexión."""
+    perfil = getattr(con, "perfil", PERFILES["default"])
+    if perfil.method == "multi":
+        return {"method": "multi", "chunksize": max(1, MAX_VARIABLES // n_columns)}
+    return {}
@@ -0,0 +1,104 @@
+"""Deduplicación "último gana" fuera de memoria para la ingesta por bloques.
+
+En modo ``--chunk-size`` las filas limpias de cada bloque no se acumulan en
+memoria: se reparten por hash de la clave natural ``(fecha, id_cliente,
+id_producto)`` en cubos que se vuelcan a disco (Arrow IPC, append barato).
+Todas las versiones de una misma clave caen en el mismo cubo, así que al
+final basta con fusionar cubo a cubo aplicando la misma deduplicación que el
+modo en memoria. El pico de memoria queda acotado por el tamaño de bloque y
+el de un cubo, no por el tamaño del drop.
+"""
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    from .arrow_io import DICT_STRING
+except ImportError:
+    from arrow_io import DICT_STRING
+
+# Esquema de las filas limpias ya tipadas (ver run.coerce_clean); ids y nombre
+# van como diccionario (category en pandas) también en los cubos y en Parquet
+CLEAN_SCHEMA = pa.schema([
+    ("fecha", pa.date32()),
+    ("id_cliente", DICT_STRING),
+    ("id_producto", DICT_STRING),
+    ("nombre_producto", DICT_STRING),
+    ("unidades", pa.float64()),
+    ("precio_unitario", pa.float64()),
+    ("_source_file", pa.string()),
+    ("_ingest_ts", pa.string()),
+])
+
+# tamaño medio aproximado de una fila de drop (CSV de get_data ≈ 55 bytes)
+BYTES_POR_FILA = 50
+MAX_CUBOS = 256
+
+
+def n_buckets_for(files: list[Path], chunk_size: int, rows: Optional[int] = None) -> int:
+    """Número de cubos para que cada uno quepa aproximadamente en un bloque.
+
+    Con `rows` (filas contadas por prescan) se usa ese número; si no, se estima
+    a partir del tamaño de los ficheros.
+    """
+    if rows is None:
+        rows = sum(f.stat().st_size for f in files) / BYTES_POR_FILA
+    return int(min(MAX_CUBOS, max(1, np.ceil(rows / chunk_size))))
+
+
+class SpillDedup:
+    """Spill indexado por clave: reparte filas en cubos en disco y los fusiona al final.
+
+    Args:
+        directory: directorio temporal donde escribir los cubos
+        n_buckets: número de cubos (particiones por hash de la clave)
+        key: columnas de la clave natural
+    """
+
+    def __init__(self, directory: Path, n_buckets: int, key: list[str]):
+        self.directory = Path(directory)
+        self.n_buckets = n_buckets
+        self.key = key
+        self._writers: dict[int, pa.ipc.RecordBatchStreamWriter] = {}
+        self.rows = 0
+
+    def _path(self, bucket: int) -> Path:
+        return self.directory / f"bucket_{bucket:03d}.arrows"
+
+    def add(self, clean: pd.DataFrame) -> None:
+        """Añade un bloque de filas limpias (columnas de CLEAN_SCHEMA)."""
+        if clean.empty:
+            return
+        table = pa.Table.from_pandas(clean[CLEAN_SCHEMA.names], schema=CLEAN_SCHEMA, preserve_index=False)
+        buckets = pd.util.hash_pandas_object(clean[self.key], index=False).to_numpy() % self.n_buckets
+        # ordenar por cubo conserva el orden relativo de las filas dentro de cada cubo
+        orden = np.argsort(buckets, kind="stable")
+        cubos, inicios = np.unique(buckets[orden], return_index=True)
+        limites = list(inicios[1:]) + [len(orden)]
+        for cubo, ini, fin in zip(cubos, inicios, limites):
+            writer = self._writers.get(int(cubo))
+            if writer is None:
+                writer = pa.ipc.new_stream(str(self._path(int(cubo))), CLEAN_SCHEMA)
+                self._writers[int(cubo)] = writer
+            writer.write_table(table.take(orden[ini:fin]))
+        self.rows += len(clean)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def merged(self, dedup: Callable[[pd.DataFrame], pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Cierra los cubos y devuelve, cubo a cubo, las filas deduplicadas con `dedup`."""
+        self.close()
+        for cubo in range(self.n_buckets):
+            path = self._path(cubo)
+            if not path.exists():
+                continue
+            with pa.ipc.open_stream(str(path)) as reader:
+                frame = reader.read_all().to_pandas()
+            path.unlink()
+            yield dedup(frame)
@@ -0,0 +1,292 @@
+"""Modo watch: ingiere los drops a medida que llegan a data/drops.
+
+Uso (desde project/):
+  python ingest/watch.py                               # hasta Ctrl+C
+  python ingest/watch.py --interval 0.1 --settle 0.2   # menos espera por drop
+  python ingest/watch.py --max-drops 10 --timeout 120 --bronze parquet
+
+Proceso de larga duración en lugar de una ejecución de run.py por carga:
+
+- el directorio se sondea cada ``--interval`` s (``run.list_drops`` y un
+  ``stat`` por fichero, sin leerlo). inotify exigiría una dependencia más y
+  con cientos de drops el sondeo cuesta menos de un milisegundo;
+- antirrebote: un drop está completo cuando su tamaño y su mtime no cambian
+  entre dos sondeos y su mtime tiene al menos ``--settle`` s. Si aun así el
+  pre-escaneo no lo puede leer (vacío, binario o no UTF-8) se avisa y se
+  espera a que vuelva a cambiar; con avisos de forma (p. ej. una línea
+  cortada) se ingiere y esas filas van a cuarentena, y si el drop cambia
+  después se reingiere. La forma de no esperar es escribir el drop con otro
+  nombre (``.part``, que no se lista) y renombrarlo al terminar;
+- los drops completos de un mismo sondeo forman un batch que pasa por
+  ``run.ingest_batch`` (validación, dedup, cuarentena, Parquet plata, bronce y
+  UPSERT por lotes) y por el manifiesto, igual que una ejecución incremental;
+- la conexión a ``ut1.db`` (perfil ``wal`` por defecto) se abre una vez:
+  esquema, motivos, agregados y vistas se preparan al arrancar, y el UPSERT se
+  parte una sola vez para que sqlite3 reutilice sus sentencias ya compiladas
+  (``run.cached_statements``).
+
+Latencia: por drop, desde que llega (su mtime, o el sondeo anterior si el
+fichero es más antiguo, p. ej. al moverlo) hasta que se confirma la
+transacción que lo carga y sus filas son visibles en clean_ventas para
+cualquier otra conexión. Se guarda en ``watch_latency`` separando la espera
+del antirrebote de la ingesta. Los drops que ya estaban al arrancar se
+ingieren como atrasados, sin latencia.
+
+reporte.md no se regenera en cada drop: ``python ingest/report.py``. No se
+debe ejecutar run.py a la vez sobre el mismo ``output``.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+try:
+    from . import (batches, bronze_store, manifest, metrics, parquet_store, prescan, quarantine_store, run,
+                   sqlite_profile)
+    from . import pipeline as etapas
+except ImportError:
+    import batches
+    import bronze_store
+    import manifest
+    import metrics
+    import parquet_store
+    import pipeline as etapas
+    import prescan
+    import quarantine_store
+    import run
+    import sqlite_profile
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class Llegada(NamedTuple):
+    """Drop ingerido por el watcher; instantes en segundos desde la época."""
+    path: Path
+    batch_id: str
+    rows: int
+    landed: Optional[float]  # None: ya estaba al arrancar
+    ready: float
+    visible: float
+
+    @property
+    def latency_s(self) -> Optional[float]:
+        return None if self.landed is None else self.visible - self.landed
+
+
+class Watcher:
+    """Sondea `drops_dir` e ingiere en `out_dir` con una conexión a ut1.db siempre abierta.
+
+    Args:
+        drops_dir: directorio de drops (data/drops)
+        out_dir: directorio de salida (output): ut1.db, Parquet plata, bronce y cuarentena
+        sqlite_profile_name: perfil de escritura de SQLite (ver sqlite_profile.py)
+        engine: lector de CSV, "pandas" o "arrow"
+        bronze: "sqlite" (raw_ventas) o "parquet" (bronce compacto)
+        settle: segundos sin cambios para dar un drop por completo
+        parquet_compression: códec del Parquet plata y del bronce compacto
+        pipeline: si es True, cada batch pasa por pipeline.ingest_pipelined (Parquet plata
+            y UPSERT a la vez) en lugar de run.ingest_batch
+    """
+
+    def __init__(self, drops_dir: Path, out_dir: Path, sqlite_profile_name: str = "wal", engine: str = "pandas",
+                 bronze: str = "sqlite", settle: float = 0.5, parquet_compression: str = "zstd",
+                 pipeline: bool = False):
+        self.drops_dir = drops_dir
+        self.out_dir = out_dir
+        self.db = out_dir / "ut1.db"
+        self.sqlite_profile_name = sqlite_profile_name
+        self.engine = engine
+        self.settle = settle
+        self.ingest_files = etapas.ingest_pipelined if pipeline else run.ingest_batch
+        self.dataset = parquet_store.Dataset(out_dir / "parquet" / "clean_ventas", parquet_compression)
+        self.store = bronze_store.BronzeStore(out_dir / "bronze", parquet_compression) if bronze == "parquet" else None
+        self.quarantine_file = out_dir / "quality" / "ventas_invalidas.csv"
+        self.con: Optional[sqlite_profile.Conexion] = None
+        self.upsert_sql = ""
+        self._firmas: dict[Path, tuple[int, int]] = {}  # (tamaño, mtime_ns) en el último sondeo
+        self._hechos: dict[Path, tuple[int, int]] = {}  # firma ya ingerida, omitida o rechazada
+        self._llegadas: dict[Path, Optional[float]] = {}
+        self._ultimo_sondeo: Optional[float] = None
+
+    def open(self) -> None:
+        """Abre ut1.db y deja preparados esquema, motivos, agregados, vistas y el UPSERT."""
+        (self.out_dir / "parquet").mkdir(parents=True, exist_ok=True)
+        (self.out_dir / "quality").mkdir(parents=True, exist_ok=True)
+        self.con = sqlite_profile.connect(self.db, self.sqlite_profile_name)
+        quarantine_store.migrate_legacy(self.con)
+        batches.migrate_legacy(self.con)
+        self.con.executescript((ROOT / "sql" / "00_schema.sql").read_text(encoding="utf-8"))
+        quarantine_store.sync_reasons(self.con)
+        run.ensure_raw_columns(self.con)
+        run.ensure_aggregates(self.con, (ROOT / "sql" / "21_agg_rebuild.sql").read_text(encoding="utf-8"))
+        self.con.executescript((ROOT / "sql" / "20_views.sql").read_text(encoding="utf-8"))
+        self.upsert_sql = (ROOT / "sql" / "11_upsert_bulk.sql").read_text(encoding="utf-8")
+        run.cached_statements(self.upsert_sql)
+
+    def close(self) -> None:
+        if self.con is not None:
+            self.con.execute("PRAGMA optimize")
+            self.con.close()
+            self.con = None
+
+    def poll(self) -> list[Path]:
+        """Drops nuevos o modificados que ya están completos (antirrebote), en orden de llegada."""
+        ahora = time.time()
+        firmas, listos = {}, []
+        for i, f in enumerate(run.list_drops(self.drops_dir)):
+            try:
+                st = f.stat()
+            except FileNotFoundError:  # renombrado o borrado entre el listado y el stat
+                continue
+            firma = firmas[f] = (st.st_size, st.st_mtime_ns)
+            if self._hechos.get(f) == firma:
+                continue
+            if f not in self._llegadas:
+                self._llegadas[f] = None if self._ultimo_sondeo is None else max(st.st_mtime, self._ultimo_sondeo)
+            if self._firmas.get(f) == firma and ahora - st.st_mtime >= self.settle:
+                listos.append((0 if self._llegadas[f] is None else st.st_mtime_ns, i, f))
+        for f in set(self._llegadas) - set(firmas):
+            del self._llegadas[f]
+        self._firmas = firmas
+        self._ultimo_sondeo = ahora
+        return [f for *_, f in sorted(listos)]
+
+    def _hecho(self, f: Path) -> None:
+        """No vuelve a tratar `f` hasta que cambie."""
+        self._hechos[f] = self._firmas[f]
+        self._llegadas.pop(f, None)
+
+    def ingest(self, files: list[Path]) -> list[Llegada]:
+        """Ingiere `files` en un batch y registra la latencia de cada drop."""
+        listo = time.time()
+        con = self.con
+        perf = metrics.StageProfiler()
+        with perf.stage("preparacion"):
+            pendientes, omitidos = manifest.plan(con, files)
+            for f in omitidos:
+                self._hecho(f)
+            with perf.stage("prescan") as etapa:
+                scans = {h.path: prescan.scan(h.path) for h in pendientes}
+                etapa.rows += sum(s.rows for s in scans.values())
+            for h in pendientes:
+                if not scans[h.path].readable:
+                    print(f"AVISO · {h.path.name} no se ingiere: {'; '.join(scans[h.path].errors)}")
+                    self._hecho(h.path)
+                elif scans[h.path].problems:
+                    print(f"AVISO · {h.path.name}: {'; '.join(scans[h.path].problems)}")
+            pendientes = [h for h in pendientes if scans[h.path].readable]
+            if not pendientes:
+                return []
+            files = [h.path for h in pendientes]
+            manifest.forget(con, files)
+            run.prepare_quarantine(self.quarantine_file, False, files)
+            batch = batches.open_batch(con)
+
+        with con.transaccion():
+            stats = self.ingest_files(files, con, self.upsert_sql, self.quarantine_file, self.dataset, batch.batch_id,
+                                      self.engine, perf, scans, self.store)
+            with perf.stage("manifiesto", rows=len(pendientes)):
+                for h in pendientes:
+                    por_fichero = stats["ficheros"][h.path.name]
+                    manifest.record(con, h, batch.batch_id, por_fichero["bronce"], por_fichero["cuarentena"])
+                con.commit()
+        visible = time.time()
+        if self.store is not None:
+            self.store.prune(con)
+        batches.close_batch(con, batch, len(pendientes), stats["bronce"], stats["cuarentena"])
+
+        llegadas = [Llegada(f, batch.batch_id, stats["ficheros"][f.name]["bronce"], self._llegadas.get(f), listo,
+                            visible) for f in files]
+        for f in files:
+            self._hecho(f)
+        con.executemany(
+            "INSERT OR REPLACE INTO watch_latency"
+            " (_batch_id, source_file, rows_raw, landed_at, wait_s, ingest_s, latency_s) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(ll.batch_id, ll.path.name, ll.rows,
+              None if ll.landed is None else datetime.fromtimestamp(ll.landed, timezone.utc).isoformat(),
+              None if ll.landed is None else ll.ready - ll.landed, ll.visible - ll.ready, ll.latency_s)
+             for ll in llegadas],
+        )
+        con.commit()
+        perf.save(self.db, batch.batch_id)
+        return llegadas
+
+    def run(self, interval: float = 0.2, max_drops: Optional[int] = None, timeout: Optional[float] = None,
+            stop: Optional[threading.Event] = None) -> list[Llegada]:
+        """Sondea cada `interval` s hasta `stop`, `max_drops` drops ingeridos o `timeout` s.
+
+        Returns:
+            drops ingeridos, en orden
+        """
+        fin = None if timeout is None else time.monotonic() + timeout
+        llegadas: list[Llegada] = []
+        while not (stop is not None and stop.is_set()):
+            listos = self.poll()
+            if listos:
+                for ll in self.ingest(listos):
+                    llegadas.append(ll)
+                    if ll.landed is None:
+                        print(f"OK · {ll.path.name} · {ll.rows} filas · atrasado (ya estaba al arrancar)")
+                    else:
+                        print(f"OK · {ll.path.name} · {ll.rows} filas · latencia {ll.latency_s:.2f} s "
+                              f"(espera {ll.ready - ll.landed:.2f} s, ingesta {ll.visible - ll.ready:.2f} s)")
+            if max_drops is not None and len(llegadas) >= max_drops:
+                break
+            if fin is not None and time.monotonic() >= fin:
+                break
+            if stop is not None:
+                stop.wait(interval)
+            else:
+                time.sleep(interval)
+        return llegadas
+
+
+def summary(llegadas: list[Llegada]) -> str:
+    """Percentiles de la latencia de los drops que llegaron con el watcher en marcha."""
+    latencias = np.array([ll.latency_s for ll in llegadas if ll.latency_s is not None])
+    if not len(latencias):
+        return f"{len(llegadas)} drops ingeridos · sin latencias (todos atrasados)"
+    p50, p95 = np.percentile(latencias, [50, 95])
+    return (f"{len(llegadas)} drops ingeridos · latencia p50 {p50:.2f} s · p95 {p95:.2f} s · "
+            f"máx. {latencias.max():.2f} s ({len(latencias)} drops)")
+
+
+def watch(interval: float = 0.2, settle: float = 0.5, max_drops: Optional[int] = None, timeout: Optional[float] = None,
+          sqlite_profile_name: str = "wal", engine: str = "pandas", bronze: str = "sqlite",
+          pipeline: bool = False) -> list[Llegada]:
+    """Vigila data/drops e ingiere en output hasta Ctrl+C, `max_drops` o `timeout`."""
+    watcher = Watcher(ROOT / "data" / "drops", ROOT / "output", sqlite_profile_name, engine, bronze, settle,
+                      pipeline=pipeline)
+    watcher.open()
+    print(f"OK · Vigilando {watcher.drops_dir} (cada {interval} s, antirrebote {settle} s) · Ctrl+C para terminar")
+    llegadas: list[Llegada] = []
+    try:
+        llegadas = watcher.run(interval, max_drops, timeout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    print("OK ·", summary(llegadas))
+    return llegadas
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingerir los drops a medida que llegan a data/drops")
+    parser.add_argument("--interval", type=float, default=0.2, help="Segundos entre sondeos del directorio")
+    parser.add_argument("--settle", type=float, default=0.5, help="Segundos sin cambios para dar un drop por completo")
+    parser.add_argument("--max-drops", type=int, default=None, help="Terminar tras ingerir N drops")
+    parser.add_argument("--timeout", type=float, default=None, help="Terminar tras N segundos")
+    parser.add_argument("--sqlite-profile", choices=list(sqlite_profile.PERFILES), default="wal",
+                        help="Perfil de escritura de SQLite (wal por defecto: una transacción por batch sin fsync extra)")
+    parser.add_argument("--engine", choices=["pandas", "arrow"], default="pandas", help="Lector de CSV")
+    parser.add_argument("--bronze", choices=bronze_store.MODOS, default="sqlite",
+                        help="Bronce en raw_ventas (sqlite) o compacto en Parquet por batch (parquet)")
+    parser.add_argument("--pipeline", action="store_true", help="Escribir el Parquet plata y el UPSERT a la vez")
+    args = parser.parse_args()
+    watch(args.interval, args.settle, args.max_drops, args.timeout, args.sqlite_profile, args.engine, args.bronze,
+          args.pipeline)
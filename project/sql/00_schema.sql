@@ -1,6 +1,7 @@
 -- Tablas ejemplo (SQLite u otro motor adaptando tipos)
+-- (nombre_producto se añade a un raw_ventas anterior con ALTER TABLE, ver run.ensure_raw_columns)
 CREATE TABLE IF NOT EXISTS raw_ventas(
-  fecha TEXT, id_cliente TEXT, id_producto TEXT,
+  fecha TEXT, id_cliente TEXT, id_producto TEXT, nombre_producto TEXT,
   unidades TEXT, precio_unitario TEXT,
   _ingest_ts TEXT, _source_file TEXT, _batch_id TEXT
 );
@@ -12,6 +13,112 @@ CREATE TABLE IF NOT EXISTS clean_ventas(
   PRIMARY KEY (fecha, id_cliente, id_producto)
 );
 
+-- Cuarentena: campos crudos y máscara de motivos (bit i = i-ésima regla de
+-- validation.REGLAS; textos en quarantine_reasons, ver ingest/quarantine_store.py)
 CREATE TABLE IF NOT EXISTS quarantine_ventas(
-  _reason TEXT, _row TEXT, _ingest_ts TEXT, _source_file TEXT, _batch_id TEXT
+  fecha TEXT, id_cliente TEXT, id_producto TEXT,
+  unidades TEXT, precio_unitario TEXT,
+  _reason_bits INTEGER NOT NULL,
+  _ingest_ts TEXT, _source_file TEXT, _batch_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS quarantine_reasons(
+  bit INTEGER PRIMARY KEY,
+  mask INTEGER NOT NULL,
+  reason TEXT NOT NULL
+);
+
+-- Batches (ver ingest/batches.py): una fila por ejecución de run.py o replay.py
+-- en batch_runs; linaje en batches, una fila por batch, drop e _ingest_ts (el
+-- instante de ingesta de cada drop, una sola vez) en los dos modos de bronce;
+-- batch_key AUTOINCREMENT no reutiliza claves borradas (ver batches.migrate_legacy)
+CREATE TABLE IF NOT EXISTS batch_runs(
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  _batch_id TEXT NOT NULL UNIQUE,
+  kind TEXT NOT NULL, replay_of TEXT,
+  started_at TEXT NOT NULL, finished_at TEXT,
+  drops INTEGER, rows_raw INTEGER, rows_clean INTEGER, rows_quarantine INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS batches(
+  batch_key INTEGER PRIMARY KEY AUTOINCREMENT,
+  _batch_id TEXT NOT NULL, _source_file TEXT NOT NULL, _ingest_ts TEXT NOT NULL,
+  rows INTEGER NOT NULL DEFAULT 0,
+  UNIQUE (_batch_id, _source_file, _ingest_ts)
+);
+
+-- Bronce compacto (--bronze parquet, ver ingest/bronze_store.py): índice de los
+-- ficheros Parquet por batch con las filas crudas (rutas relativas a output/bronze)
+
+CREATE TABLE IF NOT EXISTS bronze_parts(
+  path TEXT PRIMARY KEY,
+  _batch_id TEXT NOT NULL,
+  rows INTEGER NOT NULL, bytes INTEGER NOT NULL,
+  key_min INTEGER NOT NULL, key_max INTEGER NOT NULL
+);
+
+-- Agregados materializados de clean_ventas, mantenidos por deltas en el UPSERT
+-- (sql/11_upsert_bulk.sql); sql/21_agg_rebuild.sql los recalcula desde cero.
+CREATE TABLE IF NOT EXISTS agg_ventas_diarias(
+  fecha TEXT PRIMARY KEY,
+  importe_total REAL NOT NULL, unidades REAL NOT NULL, lineas INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_ventas_producto(
+  id_producto TEXT PRIMARY KEY,
+  importe_total REAL NOT NULL, unidades REAL NOT NULL, lineas INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_ventas_mensuales(
+  mes TEXT PRIMARY KEY,
+  importe_total REAL NOT NULL, unidades REAL NOT NULL, lineas INTEGER NOT NULL
+);
+
+-- Último nombre conocido de cada producto (clean_ventas no guarda el nombre);
+-- lo usa el reporte construido desde los agregados (ingest/report.py)
+CREATE TABLE IF NOT EXISTS dim_producto(
+  id_producto TEXT PRIMARY KEY,
+  nombre_producto TEXT NOT NULL
+);
+
+-- Índices (IF NOT EXISTS: se crean también en un ut1.db existente en la siguiente ejecución)
+-- clean_ventas: la PK ya sirve rangos de fecha; los índices de cobertura incluyen
+-- unidades y precio para que ventas_diarias y el top de productos no lean la tabla.
+-- Variante WITHOUT ROWID: sql/01_clean_ventas_without_rowid.sql (tools/migrate_db.py).
+CREATE INDEX IF NOT EXISTS idx_clean_ventas_fecha ON clean_ventas(fecha, unidades, precio_unitario);
+CREATE INDEX IF NOT EXISTS idx_clean_ventas_producto ON clean_ventas(id_producto, unidades, precio_unitario);
+CREATE INDEX IF NOT EXISTS idx_clean_ventas_cliente ON clean_ventas(id_cliente);
+-- bronce y cuarentena: linaje (manifiesto, replay por batch) y rangos de fecha
+CREATE INDEX IF NOT EXISTS idx_raw_ventas_batch ON raw_ventas(_batch_id);
+CREATE INDEX IF NOT EXISTS idx_raw_ventas_source ON raw_ventas(_source_file);
+CREATE INDEX IF NOT EXISTS idx_raw_ventas_fecha ON raw_ventas(fecha);
+CREATE INDEX IF NOT EXISTS idx_batches_source ON batches(_source_file);
+CREATE INDEX IF NOT EXISTS idx_bronze_parts_keys ON bronze_parts(key_min, key_max);
+CREATE INDEX IF NOT EXISTS idx_quarantine_ventas_batch ON quarantine_ventas(_batch_id);
+CREATE INDEX IF NOT EXISTS idx_quarantine_ventas_source ON quarantine_ventas(_source_file);
+-- recuento por motivo (vista quarantine_motivos) sin leer la tabla
+CREATE INDEX IF NOT EXISTS idx_quarantine_ventas_reason ON quarantine_ventas(_reason_bits);
+
+-- Manifiesto de drops ingeridos (ingesta incremental, ver ingest/manifest.py)
+CREATE TABLE IF NOT EXISTS ingest_manifest(
+  source_file TEXT PRIMARY KEY,
+  size_bytes INTEGER, mtime REAL, sha256 TEXT,
+  _batch_id TEXT,
+  rows_raw INTEGER, rows_clean INTEGER, rows_quarantine INTEGER,
+  ingested_at TEXT
+);
+
+-- Métricas por etapa de cada ejecución de run.py (ver ingest/metrics.py)
+CREATE TABLE IF NOT EXISTS run_metrics(
+  _batch_id TEXT, stage TEXT, seq INTEGER,
+  wall_s REAL, cpu_s REAL, peak_rss_mb REAL, rows INTEGER, calls INTEGER,
+  PRIMARY KEY (_batch_id, stage)
+);
+
+-- Latencia de cada drop en el modo watch (ver ingest/watch.py): llegada (mtime al verlo
+-- por primera vez), espera hasta darlo por completo e ingesta hasta que sus filas son visibles
+CREATE TABLE IF NOT EXISTS watch_latency(
+  _batch_id TEXT, source_file TEXT, rows_raw INTEGER,
+  landed_at TEXT, wait_s REAL, ingest_s REAL, latency_s REAL,
+  PRIMARY KEY (_batch_id, source_file)
 );
@@ -0,0 +1,19 @@
+-- Variante WITHOUT ROWID de clean_ventas: la tabla se guarda ordenada por la clave
+-- natural (sin rowid ni índice aparte para la PK), más compacta y con lecturas por
+-- rango de fecha sin saltos. SQLite no permite convertir una tabla existente, así
+-- que se reconstruye. Requiere que ninguna fila tenga la clave a NULL (en una
+-- tabla WITHOUT ROWID la PK es NOT NULL); ver tools/migrate_db.py.
+-- Después hay que volver a ejecutar 00_schema.sql (índices) y 20_views.sql.
+BEGIN;
+DROP VIEW IF EXISTS ventas_diarias;
+CREATE TABLE clean_ventas_new(
+  fecha TEXT, id_cliente TEXT, id_producto TEXT,
+  unidades REAL, precio_unitario REAL,
+  _ingest_ts TEXT,
+  PRIMARY KEY (fecha, id_cliente, id_producto)
+) WITHOUT ROWID;
+INSERT INTO clean_ventas_new (fecha, id_cliente, id_producto, unidades, precio_unitario, _ingest_ts)
+SELECT fecha, id_cliente, id_producto, unidades, precio_unitario, _ingest_ts FROM clean_ventas;
+DROP TABLE clean_ventas;
+ALTER TABLE clean_ventas_new RENAME TO clean_ventas;
+COMMIT;
@@ -0,0 +1,62 @@
+-- UPSERT por lotes: las filas limpias se cargan antes en la tabla temporal
+-- stage_clean_ventas (executemany) y se fusionan con una sola sentencia.
+-- Misma política "último gana" que 10_upserts.sql.
+-- Antes de fusionar se calculan los deltas (valor nuevo - valor anterior) de las
+-- filas que van a insertarse o actualizarse y se suman a los agregados.
+
+-- 1) Deltas por clave (sólo filas que ganan: nuevas o con _ingest_ts posterior)
+DROP TABLE IF EXISTS temp.delta_clean_ventas;
+CREATE TEMP TABLE delta_clean_ventas AS
+SELECT s.fecha, s.id_producto,
+       COALESCE(s.unidades*s.precio_unitario, 0) - COALESCE(c.unidades*c.precio_unitario, 0) AS importe,
+       COALESCE(s.unidades, 0) - COALESCE(c.unidades, 0) AS unidades,
+       (c.fecha IS NULL) AS lineas
+FROM stage_clean_ventas s
+LEFT JOIN clean_ventas c
+  ON c.fecha = s.fecha AND c.id_cliente = s.id_cliente AND c.id_producto = s.id_producto
+WHERE c.fecha IS NULL OR s._ingest_ts > c._ingest_ts;
+
+-- 2) Agregados (WHERE 1 evita que SQLite lea ON CONFLICT como parte de un JOIN)
+INSERT INTO agg_ventas_diarias AS a (fecha, importe_total, unidades, lineas)
+SELECT fecha, SUM(importe), SUM(unidades), SUM(lineas)
+FROM delta_clean_ventas WHERE 1 GROUP BY fecha
+ON CONFLICT(fecha) DO UPDATE SET
+  importe_total = a.importe_total + excluded.importe_total,
+  unidades = a.unidades + excluded.unidades,
+  lineas = a.lineas + excluded.lineas;
+
+-- filas sin id_producto (NULL, la validación las deja pasar) bajo la clave ''
+INSERT INTO agg_ventas_producto AS a (id_producto, importe_total, unidades, lineas)
+SELECT COALESCE(id_producto, ''), SUM(importe), SUM(unidades), SUM(lineas)
+FROM delta_clean_ventas WHERE 1 GROUP BY COALESCE(id_producto, '')
+ON CONFLICT(id_producto) DO UPDATE SET
+  importe_total = a.importe_total + excluded.importe_total,
+  unidades = a.unidades + excluded.unidades,
+  lineas = a.lineas + excluded.lineas;
+
+INSERT INTO agg_ventas_mensuales AS a (mes, importe_total, unidades, lineas)
+SELECT substr(fecha, 1, 7), SUM(importe), SUM(unidades), SUM(lineas)
+FROM delta_clean_ventas WHERE 1 GROUP BY substr(fecha, 1, 7)
+ON CONFLICT(mes) DO UPDATE SET
+  importe_total = a.importe_total + excluded.importe_total,
+  unidades = a.unidades + excluded.unidades,
+  lineas = a.lineas + excluded.lineas;
+
+DROP TABLE temp.delta_clean_ventas;
+
+INSERT INTO dim_producto AS d (id_producto, nombre_producto)
+SELECT id_producto, nombre_producto
+FROM stage_clean_ventas
+WHERE id_producto IS NOT NULL AND nombre_producto IS NOT NULL
+GROUP BY id_producto
+ON CONFLICT(id_producto) DO UPDATE SET nombre_producto = excluded.nombre_producto;
+
+-- 3) Fusión en clean_ventas
+INSERT INTO clean_ventas AS c (fecha,id_cliente,id_producto,unidades,precio_unitario,_ingest_ts)
+SELECT fecha,id_cliente,id_producto,unidades,precio_unitario,_ingest_ts
+FROM stage_clean_ventas WHERE 1 ORDER BY fecha, id_cliente, id_producto
+ON CONFLICT(fecha,id_cliente,id_producto) DO UPDATE SET
+  unidades = excluded.unidades,
+  precio_unitario = excluded.precio_unitario,
+  _ingest_ts = excluded._ingest_ts
+WHERE excluded._ingest_ts > c._ingest_ts;
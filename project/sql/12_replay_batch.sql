@@ -0,0 +1,47 @@
+-- Replay de un batch (ingest/replay.py): retira de clean_ventas las filas que
+-- ganaron con el batch, copiadas antes en la tabla temporal replay_clean_ventas
+-- (clave, unidades, precio y _ingest_ts). Se restan sus importes de los
+-- agregados y se borran las filas; después las filas rehechas entran con el
+-- UPSERT por lotes (11_upsert_bulk.sql), que vuelve a sumar sus deltas.
+
+-- 1) Agregados: restar las filas retiradas
+INSERT INTO agg_ventas_diarias AS a (fecha, importe_total, unidades, lineas)
+SELECT fecha, -TOTAL(unidades*precio_unitario), -TOTAL(unidades), -COUNT(*)
+FROM replay_clean_ventas WHERE 1 GROUP BY fecha
+ON CONFLICT(fecha) DO UPDATE SET
+  importe_total = a.importe_total + excluded.importe_total,
+  unidades = a.unidades + excluded.unidades,
+  lineas = a.lineas + excluded.lineas;
+
+INSERT INTO agg_ventas_producto AS a (id_producto, importe_total, unidades, lineas)
+SELECT COALESCE(id_producto, ''), -TOTAL(unidades*precio_unitario), -TOTAL(unidades), -COUNT(*)
+FROM replay_clean_ventas WHERE 1 GROUP BY COALESCE(id_producto, '')
+ON CONFLICT(id_producto) DO UPDATE SET
+  importe_total = a.importe_total + excluded.importe_total,
+  unidades = a.unidades + excluded.unidades,
+  lineas = a.lineas + excluded.lineas;
+
+INSERT INTO agg_ventas_mensuales AS a (mes, importe_total, unidades, lineas)
+SELECT substr(fecha, 1, 7), -TOTAL(unidades*precio_unitario), -TOTAL(unidades), -COUNT(*)
+FROM replay_clean_ventas WHERE 1 GROUP BY substr(fecha, 1, 7)
+ON CONFLICT(mes) DO UPDATE SET
+  importe_total = a.importe_total + excluded.importe_total,
+  unidades = a.unidades + excluded.unidades,
+  lineas = a.lineas + excluded.lineas;
+
+-- 2) Fuera de clean_ventas: se recorre por la clave primaria sólo en las fechas del
+-- batch; IS en los ids porque id_producto puede ser nulo, y el _ingest_ts distingue
+-- las filas de otros batches con la misma clave nula
+CREATE INDEX temp.idx_replay_clean_ventas ON replay_clean_ventas(fecha, id_cliente, id_producto);
+DELETE FROM clean_ventas
+WHERE fecha IN (SELECT fecha FROM replay_clean_ventas)
+  AND EXISTS (
+    SELECT 1 FROM replay_clean_ventas r
+    WHERE r.fecha = clean_ventas.fecha AND r.id_cliente IS clean_ventas.id_cliente
+      AND r.id_producto IS clean_ventas.id_producto AND r._ingest_ts = clean_ventas._ingest_ts
+  );
+
+-- 3) Agregados sin líneas (el UPSERT posterior los vuelve a crear si les llegan filas)
+DELETE FROM agg_ventas_diarias WHERE lineas = 0;
+DELETE FROM agg_ventas_producto WHERE lineas = 0;
+DELETE FROM agg_ventas_mensuales WHERE lineas = 0;
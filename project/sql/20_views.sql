@@ -1,5 +1,19 @@
--- Vista simple de ventas diarias
-CREATE VIEW IF NOT EXISTS ventas_diarias AS
-SELECT fecha, SUM(unidades*precio_unitario) AS importe_total, COUNT(*) AS lineas
-FROM clean_ventas
-GROUP BY fecha;
+-- Vista simple de ventas diarias (lee el agregado materializado agg_ventas_diarias)
+DROP VIEW IF EXISTS ventas_diarias;
+CREATE VIEW ventas_diarias AS
+SELECT fecha, importe_total, lineas
+FROM agg_ventas_diarias;
+
+-- Filas en cuarentena por motivo: cada combinación de motivos (índice de
+-- _reason_bits) se cuenta una vez y se reparte en sus bits; "primera" es el
+-- rowid de la primera fila con el motivo, para listarlos en orden de aparición
+DROP VIEW IF EXISTS quarantine_motivos;
+CREATE VIEW quarantine_motivos AS
+SELECT r.bit, r.reason, SUM(q.filas) AS filas, MIN(q.primera) AS primera
+FROM (
+  SELECT _reason_bits, COUNT(*) AS filas, MIN(rowid) AS primera
+  FROM quarantine_ventas
+  GROUP BY _reason_bits
+) AS q
+JOIN quarantine_reasons AS r ON q._reason_bits & r.mask
+GROUP BY r.bit, r.reason;
@@ -0,0 +1,17 @@
+-- Recalcula desde cero los agregados materializados a partir de clean_ventas
+-- (ut1.db anteriores a los agregados, o tras tocar clean_ventas a mano).
+DELETE FROM agg_ventas_diarias;
+DELETE FROM agg_ventas_producto;
+DELETE FROM agg_ventas_mensuales;
+
+INSERT INTO agg_ventas_diarias (fecha, importe_total, unidades, lineas)
+SELECT fecha, TOTAL(unidades*precio_unitario), TOTAL(unidades), COUNT(*)
+FROM clean_ventas GROUP BY fecha;
+
+INSERT INTO agg_ventas_producto (id_producto, importe_total, unidades, lineas)
+SELECT COALESCE(id_producto, ''), TOTAL(unidades*precio_unitario), TOTAL(unidades), COUNT(*)
+FROM clean_ventas GROUP BY COALESCE(id_producto, '');
+
+INSERT INTO agg_ventas_mensuales (mes, importe_total, unidades, lineas)
+SELECT substr(fecha, 1, 7), TOTAL(unidades*precio_unitario), TOTAL(unidades), COUNT(*)
+FROM clean_ventas GROUP BY substr(fecha, 1, 7);
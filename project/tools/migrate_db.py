@@ -0,0 +1,68 @@
+"""Migra un ut1.db existente al esquema actual (índices, agregados y, opcionalmente, WITHOUT ROWID).
+
+Uso (desde project/):
+  python tools/migrate_db.py                        # tablas e índices de 00_schema.sql, agregados y ANALYZE
+  python tools/migrate_db.py --rebuild-aggregates   # recalcula los agregados agg_ventas_* desde cero
+  python tools/migrate_db.py --without-rowid        # además reconstruye clean_ventas WITHOUT ROWID
+  python tools/migrate_db.py --db /ruta/a/ut1.db
+
+Los índices también se crean solos en la siguiente ejecución de ingest/run.py;
+la reconstrucción WITHOUT ROWID sólo se hace con esta herramienta porque exige
+que clean_ventas no tenga claves a NULL (y que las futuras cargas tampoco).
+batches se reconstruye con batch_key AUTOINCREMENT si viene del esquema anterior
+(ver batches.migrate_legacy).
+"""
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SQL = ROOT / "sql"
+sys.path.insert(0, str(ROOT / "ingest"))
+import batches  # noqa: E402
+import quarantine_store  # noqa: E402
+
+
+def is_without_rowid(con: sqlite3.Connection) -> bool:
+    fila = con.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'clean_ventas'").fetchone()
+    return fila is not None and "WITHOUT ROWID" in fila[0].upper()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Migrar ut1.db al esquema actual")
+    ap.add_argument("--db", type=Path, default=ROOT / "output" / "ut1.db")
+    ap.add_argument("--rebuild-aggregates", action="store_true", help="Recalcular los agregados desde clean_ventas")
+    ap.add_argument("--without-rowid", action="store_true", help="Reconstruir clean_ventas como tabla WITHOUT ROWID")
+    args = ap.parse_args()
+
+    con = sqlite3.connect(args.db)
+    quarantine_store.migrate_legacy(con)
+    batches.migrate_legacy(con)
+    con.executescript((SQL / "00_schema.sql").read_text(encoding="utf-8"))
+    quarantine_store.sync_reasons(con)
+    if args.without_rowid and not is_without_rowid(con):
+        nulos = con.execute(
+            "SELECT COUNT(*) FROM clean_ventas WHERE fecha IS NULL OR id_cliente IS NULL OR id_producto IS NULL"
+        ).fetchone()[0]
+        if nulos:
+            sys.exit(f"clean_ventas tiene {nulos} filas con la clave a NULL; no se puede convertir a WITHOUT ROWID")
+        con.executescript((SQL / "01_clean_ventas_without_rowid.sql").read_text(encoding="utf-8"))
+        con.executescript((SQL / "00_schema.sql").read_text(encoding="utf-8"))
+        print("clean_ventas reconstruida WITHOUT ROWID")
+    agregados_vacios = con.execute("SELECT NOT EXISTS (SELECT 1 FROM agg_ventas_diarias)").fetchone()[0]
+    if args.rebuild_aggregates or agregados_vacios:
+        con.executescript((SQL / "21_agg_rebuild.sql").read_text(encoding="utf-8"))
+    con.executescript((SQL / "20_views.sql").read_text(encoding="utf-8"))
+    con.execute("ANALYZE")
+    con.commit()
+
+    indices = [n for (n,) in con.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%' ORDER BY name")]
+    con.close()
+    print("OK ·", args.db)
+    print("Índices:", ", ".join(indices))
+
+
+if __name__ == "__main__":
+    main()